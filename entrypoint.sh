@@ -10,5 +10,6 @@ echo "База данных доступна!"
 # Применяем миграции
 python manage.py migrate
 
-# Запускаем Django
-python manage.py runserver 0.0.0.0:8000
+# Запускаем Django через ASGI: поток событий /api/schedule/process/<id>/events отдаётся сразу
+# и не занимает поток (число процессов — WEB_CONCURRENCY)
+exec uvicorn mirea_scheduler.asgi:application --host 0.0.0.0 --port 8000
@@ -0,0 +1,252 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from issue_analizer.models import ScheduleEvent, ScheduleIssue
+from issue_analizer.services.event_table import EventTable
+from issue_analizer.services.issue_writer import IssueWriter
+from issue_analizer.services.rule_engine import RuleEngine
+from issue_analizer.services.schedule_analyzer import ScheduleAnalyzer
+from issue_analizer.services.schedule_service import ScheduleService
+from issue_analizer.services.synthetic_schedule import SyntheticSchedule
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк разбора iCal, анализа, записи в БД и /api/issueslist на синтетическом расписании. "
+        "Все изменения в БД откатываются; результаты сохраняются в JSON для сравнения между коммитами."
+    )
+
+    SUITES = ("parse", "analyze", "persist", "api")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=100, help="Число групп (календарей)")
+        parser.add_argument("--teachers", type=int, default=300, help="Число преподавателей")
+        parser.add_argument("--rooms", type=int, default=200, help="Число аудиторий")
+        parser.add_argument("--weeks", type=int, default=16, help="Число недель в семестре")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=3, help="Повторов каждого замера")
+        parser.add_argument("--requests", type=int, default=50, help="Запросов к API в каждом замере")
+        parser.add_argument("--only", nargs="+", choices=self.SUITES, help="Запустить только эти наборы")
+        parser.add_argument("--output", default="benchmark.json", help="Файл результатов (- — stdout)")
+        parser.add_argument("--compare", help="Файл прошлых результатов для сравнения медиан")
+        parser.add_argument("--allow-writes", action="store_true",
+                            help="Подтверждение для persist и api: на время замеров все проблемы в БД "
+                                 "удаляются и заблокированы (затем откатываются)")
+
+    def handle(self, *args, **options):
+        suites = options["only"] or self.SUITES
+        if ("persist" in suites or "api" in suites) and not (options["allow_writes"] or self.is_test_database()):
+            raise CommandError(
+                f"Наборы persist и api удаляют проблемы в БД {connection.settings_dict['NAME']!r} и держат "
+                "блокировку до конца замеров: запустите на тестовой БД (имя test_*), добавьте --allow-writes "
+                "или выберите --only parse analyze"
+            )
+        self.output_is_file = options["output"] != "-"
+        self.repeat = max(1, options["repeat"])
+        self.results = {}
+        self.rules = {}  # Время правил анализа, с
+
+        schedule = SyntheticSchedule(groups=options["groups"], teachers=options["teachers"],
+                                     rooms=options["rooms"], weeks=options["weeks"], seed=options["seed"])
+        self.log(f"🧪 Генерация: групп {options['groups']}, недель {options['weeks']}")
+        calendars = [calendar for _, calendar in schedule.calendars()]
+        events = [event for calendar in calendars for event in ScheduleService.parse_ical(calendar, fast=True)]
+        table = EventTable(events)
+        issues = ScheduleAnalyzer.find_issues(table) + ScheduleAnalyzer.find_conflicts(table)
+        dataset = {
+            "calendars": len(calendars),
+            "bytes": sum(len(calendar.encode()) for calendar in calendars),
+            "events": len(events),
+            "issues": len(issues),
+        }
+        self.log(f"🧪 Календарей: {dataset['calendars']}, занятий: {dataset['events']}, проблем: {dataset['issues']}")
+
+        if "parse" in suites:
+            self.bench_parse(calendars, len(events))
+        if "analyze" in suites:
+            self.bench_analyze(events, table)
+        if "persist" in suites or "api" in suites:
+            # Замеры записи и API работают с синтетическими данными и откатываются целиком
+            with transaction.atomic():
+                ScheduleIssue.objects.all().delete()
+                ScheduleEvent.objects.all().delete()
+                if "persist" in suites:
+                    self.bench_persist(issues)
+                else:
+                    IssueWriter(batch_size=settings.SCHEDULE_WRITE_BATCH_SIZE).sync(issues)
+                if "api" in suites:
+                    # Кэш ответов отключён: замеряется запрос к БД и сериализация
+                    with override_settings(SCHEDULE_RESPONSE_CACHE=False):
+                        self.bench_api(schedule, options["requests"])
+                transaction.set_rollback(True)
+
+        report = {
+            "meta": {
+                "commit": self.git_commit(),
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "repeat": self.repeat,
+                "params": {name: options[name] for name in ("groups", "teachers", "rooms", "weeks", "seed")},
+                "dataset": dataset,
+            },
+            "results": self.results,
+            "rules": self.rules,
+        }
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"] == "-":
+            self.stdout.write(content)
+        else:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(content + "\n")
+            self.log(f"💾 Результаты сохранены в {options['output']}")
+
+        if options["compare"]:
+            self.compare(options["compare"], report)
+
+    @staticmethod
+    def is_test_database():
+        """Тестовая БД Django (test_*) или SQLite в памяти: её данные не жалко"""
+        name = str(connection.settings_dict["NAME"] or "")
+        return name.startswith("test_") or name == ":memory:" or "mode=memory" in name
+
+    def bench_parse(self, calendars, events):
+        """Разбор всех календарей: icalendar, построчный парсер и сразу в EventTable"""
+        parsers = {
+            "parse_icalendar": lambda calendar: ScheduleService.parse_ical(calendar),
+            "parse_fast": lambda calendar: ScheduleService.parse_ical(calendar, fast=True),
+            "parse_fast_table": lambda calendar: ScheduleService.parse_ical_table(calendar, fast=True),
+        }
+        for name, parse in parsers.items():
+            self.measure(name, lambda: [parse(calendar) for calendar in calendars], items=events)
+
+    def bench_analyze(self, events, table):
+        self.measure("analyze_python", lambda: ScheduleAnalyzer.find_issues(events, engine="python"))
+        self.measure("analyze_table", lambda: ScheduleAnalyzer.find_issues(table, engine="python"))
+        self.measure("analyze_numpy", lambda: ScheduleAnalyzer.find_issues(table, engine="numpy"))
+        self.measure("find_conflicts", lambda: ScheduleAnalyzer.find_conflicts(table))
+
+        # Время каждого правила за один прогон (python по EventTable и конфликты)
+        rules = RuleEngine()
+        ScheduleAnalyzer.find_issues(table, engine="python", rules=rules)
+        ScheduleAnalyzer.find_conflicts(table, rules=rules)
+        self.rules = rules.report()
+        for name, seconds in self.rules.items():
+            self.log(f"⏱ rule_{name}: {seconds:.4f} с")
+
+    def bench_persist(self, issues):
+        writer = IssueWriter(batch_size=settings.SCHEDULE_WRITE_BATCH_SIZE)
+
+        def create():
+            savepoint = transaction.savepoint()
+            try:
+                return writer.sync(issues)[0]
+            finally:
+                transaction.savepoint_rollback(savepoint)
+
+        self.measure("persist_create", create, items=len(issues))
+        writer.sync(issues)
+        # Повторная синхронизация без изменений: только чтение отпечатков и сравнение
+        self.measure("persist_unchanged", lambda: writer.sync(issues), items=len(issues))
+
+    def bench_api(self, schedule, requests):
+        client = Client()
+        group = schedule.group_name(0)
+        teacher = schedule.teachers[0].split()[0]
+        first_page = client.get("/api/issueslist").json()
+        cases = {
+            "api_list": "/api/issueslist",
+            "api_list_next_page": first_page.get("next") or "/api/issueslist",
+            "api_list_group": f"/api/issueslist?group={group}",
+            "api_list_teacher": f"/api/issueslist?teacher={teacher}",
+        }
+        for name, url in cases.items():
+            self.measure_requests(name, client, url, requests)
+
+    def measure(self, name, function, items=None, **extra):
+        """Замер function: repeat запусков. items — объём работы (по умолчанию длина результата)"""
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            value = function()
+            timings.append(time.perf_counter() - started)
+        if items is None and isinstance(value, list):
+            items = len(value)
+        result = self.stats(timings)
+        if items is not None:
+            result["items"] = items
+            result["items_per_second"] = round(items / result["median"], 1) if result["median"] else None
+        result.update(extra)
+        self.results[name] = result
+        self.log(f"⏱ {name}: {result['median']:.4f} с" + (f" ({items} шт.)" if items is not None else ""))
+
+    def measure_requests(self, name, client, url, requests):
+        """Задержка отдельных запросов к API через тестовый клиент Django"""
+        timings = []
+        for _ in range(max(1, requests)):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f"{url}: HTTP {response.status_code}")
+        result = self.stats(timings)
+        result["url"] = url
+        self.results[name] = result
+        self.log(f"⏱ {name}: p50 {result['median'] * 1000:.1f} мс, p95 {result['p95'] * 1000:.1f} мс")
+
+    @staticmethod
+    def stats(timings):
+        timings = sorted(timings)
+        result = {
+            "runs": len(timings),
+            "min": timings[0],
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+            "max": timings[-1],
+        }
+        if len(timings) >= 20:
+            percentiles = statistics.quantiles(timings, n=100)
+            result["p95"], result["p99"] = percentiles[94], percentiles[98]
+        else:
+            result["p95"] = result["p99"] = timings[-1]
+        return {key: round(value, 6) if isinstance(value, float) else value for key, value in result.items()}
+
+    def compare(self, path, report):
+        """Сравнение медиан с прошлым прогоном: > 1 — стало медленнее"""
+        with open(path, encoding="utf-8") as file:
+            previous = json.load(file)
+        if previous["meta"]["params"] != report["meta"]["params"]:
+            self.log("⚠️ Параметры синтетического расписания отличаются, сравнение неточное")
+        self.log(f"📊 Сравнение с {previous['meta'].get('commit') or path}:")
+        for name, result in report["results"].items():
+            before = previous["results"].get(name)
+            if not before or not before["median"]:
+                continue
+            ratio = result["median"] / before["median"]
+            self.log(f"   {name}: {before['median']:.4f} → {result['median']:.4f} с (x{ratio:.2f})")
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def log(self, message):
+        """Ход замеров; при выводе JSON в stdout — в stderr"""
+        if self.output_is_file:
+            self.stdout.write(message)
+        else:
+            self.stderr.write(message, style_func=str)
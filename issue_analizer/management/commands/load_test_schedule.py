@@ -0,0 +1,375 @@
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import redis
+import requests
+from celery import current_app
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from issue_analizer import tasks
+from issue_analizer.management.commands.benchmark_schedule import Command as BenchmarkCommand
+from issue_analizer.services.fake_upstream import FakeScheduleAPI
+from issue_analizer.services.ical_cache import ICalCache
+from issue_analizer.services.refresh_coordinator import RefreshCoordinator
+from issue_analizer.services.refresh_metrics import RefreshMetrics
+from issue_analizer.services.refresh_planner import RefreshPlanner
+from issue_analizer.services.response_cache import IssueListCache
+from issue_analizer.services.schedule_catalog import ScheduleCatalog
+from issue_analizer.services.synthetic_schedule import SyntheticSchedule
+from issue_analizer.services.task_progress import TaskProgress
+
+
+class CallCounter:
+    """Счётчики запросов к БД и команд Redis из всех потоков процесса на время теста"""
+
+    def __init__(self):
+        self.counts = {"db_queries": 0, "redis_commands": 0, "redis_roundtrips": 0}
+        self._lock = threading.Lock()
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counts[name] += value
+
+    @contextmanager
+    def install(self):
+        def count_query(execute, sql, params, many, context):
+            self.add("db_queries")
+            return execute(sql, params, many, context)
+
+        def on_connection(sender, connection, **kwargs):
+            connection.execute_wrappers.append(count_query)
+
+        original_command = redis.Redis.execute_command
+        original_pipeline = redis.client.Pipeline.execute
+
+        def execute_command(client, *args, **options):
+            self.add("redis_commands")
+            self.add("redis_roundtrips")
+            return original_command(client, *args, **options)
+
+        def execute_pipeline(pipe, *args, **kwargs):
+            self.add("redis_commands", len(pipe.command_stack))
+            self.add("redis_roundtrips")
+            return original_pipeline(pipe, *args, **kwargs)
+
+        # Новые соединения (в том числе в потоках клиентов) и уже открытые в этом потоке
+        connection_created.connect(on_connection)
+        for connection in connections.all():
+            connection.execute_wrappers.append(count_query)
+        redis.Redis.execute_command = execute_command
+        redis.client.Pipeline.execute = execute_pipeline
+        try:
+            yield self
+        finally:
+            redis.Redis.execute_command = original_command
+            redis.client.Pipeline.execute = original_pipeline
+            connection_created.disconnect(on_connection)
+            for connection in connections.all():
+                if count_query in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(count_query)
+
+
+class RedisSnapshot:
+    """Ключи приложения в Redis, которые тест перезаписывает: каталог замены API (ссылки на
+    127.0.0.1), метрики, популярность запросов, блокировки и ход задач. После теста ключи
+    возвращаются в прежнее состояние вместе с оставшимся TTL.
+
+    Кэши, описывающие данные в БД, не восстанавливаются: в БД после теста синтетические
+    проблемы. Кэш календарей удаляется (следующее обновление загрузит все календари заново),
+    у кэша /api/issueslist увеличивается поколение.
+    """
+
+    PATTERNS = (
+        ScheduleCatalog.KEY,
+        IssueListCache.POPULAR_KEY,
+        RefreshMetrics.LAST_KEY,
+        RefreshMetrics.TOTALS_KEY,
+        RefreshCoordinator.ACTIVE_KEY + "*",
+        RefreshCoordinator.WAITERS_KEY + "*",
+        RefreshPlanner.CHANGES_KEY,
+        TaskProgress.KEY_PREFIX + "*",
+    )
+    DISCARDED = (ICalCache.KEY_PREFIX + "*",)
+    BATCH = 500
+
+    def __init__(self, redis_client, patterns=PATTERNS, discarded=DISCARDED):
+        self.redis = redis_client
+        self.patterns = patterns
+        self.discarded = discarded
+
+    def keys(self, patterns=None):
+        patterns = self.patterns if patterns is None else patterns
+        return sorted({key for pattern in patterns for key in self.redis.scan_iter(match=pattern, count=1000)})
+
+    def save(self):
+        """{ключ: (DUMP, TTL в мс)}"""
+        saved = {}
+        keys = self.keys()
+        for start in range(0, len(keys), self.BATCH):
+            batch = keys[start:start + self.BATCH]
+            with self.redis.pipeline(transaction=False) as pipe:
+                for key in batch:
+                    pipe.dump(key)
+                    pipe.pttl(key)
+                values = pipe.execute()
+            for key, value, ttl in zip(batch, values[::2], values[1::2]):
+                if value is not None and ttl != -2:
+                    saved[key] = (value, max(ttl, 0))
+        return saved
+
+    def restore(self, saved):
+        """Удаляет ключи, созданные тестом, возвращает сохранённые и сбрасывает кэши данных"""
+        keys = self.keys((*self.patterns, *self.discarded))
+        for start in range(0, len(keys), self.BATCH):
+            self.redis.delete(*keys[start:start + self.BATCH])
+        items = list(saved.items())
+        for start in range(0, len(items), self.BATCH):
+            with self.redis.pipeline(transaction=False) as pipe:
+                for key, (value, ttl) in items[start:start + self.BATCH]:
+                    pipe.restore(key, ttl, value, replace=True)
+                pipe.execute()
+        IssueListCache(self.redis).bump()
+
+    @contextmanager
+    def preserve(self):
+        saved = self.save()
+        try:
+            yield saved
+        finally:
+            self.restore(saved)
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест: локальная замена API МИРЭА, обновления расписания и одновременные запросы "
+        "к /api/issueslist и /api/schedule/process. Отчёт: пропускная способность, перцентили задержек, "
+        "число запросов к БД и команд Redis. Проблемы в БД перезаписываются синтетическими, "
+        "ключи приложения в Redis после теста восстанавливаются, кэши календарей и ответов сбрасываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=100, help="Число групп (календарей)")
+        parser.add_argument("--teachers", type=int, default=300, help="Число преподавателей")
+        parser.add_argument("--rooms", type=int, default=200, help="Число аудиторий")
+        parser.add_argument("--weeks", type=int, default=16, help="Число недель в семестре")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--page-size", type=int, default=100, help="Записей на странице каталога")
+        parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа замены API, с")
+        parser.add_argument("--jitter", type=float, default=0.05, help="Случайная добавка к задержке, с")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов с ошибкой")
+        parser.add_argument("--error-status", type=int, default=503, help="Код ошибки (0 — разрыв соединения)")
+        parser.add_argument("--host", default="127.0.0.1", help="Адрес замены API")
+        parser.add_argument("--port", type=int, default=0, help="Порт замены API (0 — свободный)")
+        parser.add_argument("--duration", type=float, default=30, help="Длительность нагрузки, с")
+        parser.add_argument("--refreshes", type=int, default=2, help="Полных обновлений во время нагрузки")
+        parser.add_argument("--changes", type=int, default=10, help="Календарей, меняющихся перед каждым обновлением")
+        parser.add_argument("--clients", type=int, default=8, help="Потоков, запрашивающих /api/issueslist")
+        parser.add_argument("--posters", type=int, default=1, help="Потоков, запускающих /api/schedule/process")
+        parser.add_argument("--post-interval", type=float, default=2.0, help="Пауза между запусками обработки, с")
+        parser.add_argument("--base-url", help="Нагружать запущенный сервер (http://host:port) вместо тестового "
+                                               "клиента Django; обновления — через POST /api/schedule/process")
+        parser.add_argument("--celery", action="store_true",
+                            help="Отправлять задачи воркерам Celery (им нужен SCHEDULE_API_URL замены API)")
+        parser.add_argument("--output", default="load_test.json", help="Файл отчёта (- — stdout)")
+        parser.add_argument("--allow-writes", action="store_true",
+                            help="Подтверждение: проблемы в БД будут заменены синтетическими")
+
+    def handle(self, *args, **options):
+        if not options["allow_writes"]:
+            raise CommandError("Тест перезаписывает проблемы в БД синтетическими данными: добавьте --allow-writes")
+        self.output_is_file = options["output"] != "-"
+        self.options = options
+        self.samples = {}  # {эндпоинт: [(секунды, код ответа)]}
+        self.samples_lock = threading.Lock()
+        self.stop = threading.Event()
+
+        schedule = SyntheticSchedule(groups=options["groups"], teachers=options["teachers"],
+                                     rooms=options["rooms"], weeks=options["weeks"], seed=options["seed"])
+        self.groups = [schedule.group_name(index) for index in range(schedule.groups)]
+        self.teachers = [teacher.split()[0] for teacher in schedule.teachers]
+        upstream = FakeScheduleAPI(schedule, page_size=options["page_size"], latency=options["latency"],
+                                   jitter=options["jitter"], error_rate=options["error_rate"],
+                                   error_status=options["error_status"], seed=options["seed"])
+        counter = CallCounter()
+        always_eager = current_app.conf.task_always_eager
+        snapshot = RedisSnapshot(tasks.redis_client)
+
+        with snapshot.preserve() as saved, upstream.start(options["host"], options["port"]), \
+                override_settings(SCHEDULE_API_URL=upstream.url):
+            self.log(f"🧷 Ключей Redis сохранено до конца теста: {len(saved)}")
+            self.log(f"🌐 Замена API МИРЭА: {upstream.url} (каталог: {len(upstream.catalog())} записей)")
+            current_app.conf.task_always_eager = not options["celery"]
+            try:
+                with counter.install():
+                    cold = None
+                    if not options["base_url"]:
+                        cold = self.refresh(upstream, changes=0)
+                        self.log(f"⏱ Первое обновление: {cold['seconds']:.2f} с")
+                    started = time.monotonic()
+                    refreshes = self.run_load(upstream)
+                    elapsed = time.monotonic() - started
+            finally:
+                current_app.conf.task_always_eager = always_eager
+            upstream_stats = dict(upstream.stats)
+
+        report = {
+            "meta": {
+                "commit": BenchmarkCommand.git_commit(),
+                "created_at": timezone.now().isoformat(),
+                "params": {name: value for name, value in options.items()
+                           if name not in ("output", "allow_writes", "verbosity", "settings", "pythonpath",
+                                           "traceback", "no_color", "force_color", "skip_checks")},
+                "duration": round(elapsed, 3),
+            },
+            "upstream": upstream_stats,
+            "refresh": {"cold": cold, "runs": refreshes},
+            "endpoints": {name: self.endpoint_stats(samples, elapsed) for name, samples in self.samples.items()},
+            # В режиме --base-url и с воркерами Celery учитываются только вызовы этого процесса
+            "calls": {name: {"total": value, "per_second": round(value / elapsed, 1) if elapsed else None}
+                      for name, value in counter.counts.items()},
+        }
+        for name, result in report["endpoints"].items():
+            self.log(f"📈 {name}: {result['requests']} запросов, {result['throughput']} в с, "
+                     f"p50 {result['p50'] * 1000:.1f} мс, p95 {result['p95'] * 1000:.1f} мс, "
+                     f"p99 {result['p99'] * 1000:.1f} мс, ошибок {result['errors']}")
+        self.log("🔢 " + ", ".join(f"{name}: {value}" for name, value in counter.counts.items()))
+
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"] == "-":
+            self.stdout.write(content)
+        else:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(content + "\n")
+            self.log(f"💾 Отчёт сохранён в {options['output']}")
+
+    def run_load(self, upstream):
+        """Нагрузка на duration секунд: обновления, клиенты списка и запуска обработки. Возвращает обновления"""
+        refreshes = []
+        threads = [threading.Thread(target=self.refresh_loop, args=(upstream, refreshes))]
+        threads += [threading.Thread(target=self.list_client, args=(seed,)) for seed in range(self.options["clients"])]
+        threads += [threading.Thread(target=self.process_client, args=(seed,)) for seed in range(self.options["posters"])]
+        for thread in threads:
+            thread.start()
+        self.stop.wait(self.options["duration"])
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        return refreshes
+
+    def refresh_loop(self, upstream, refreshes):
+        """Полные обновления подряд (перед каждым меняется часть календарей)"""
+        try:
+            for _ in range(self.options["refreshes"]):
+                if self.stop.is_set():
+                    break
+                result = self.refresh(upstream, self.options["changes"])
+                refreshes.append(result)
+                self.log(f"⏱ Обновление: {result['seconds']:.2f} с ({result['status']})")
+        finally:
+            connections.close_all()
+
+    def refresh(self, upstream, changes):
+        """Одно полное обновление через координатор (как POST /api/schedule/process без фильтров)"""
+        upstream.change(changes)
+        started = time.monotonic()
+        if self.options["base_url"]:
+            response = requests.post(self.options["base_url"] + "/api/schedule/process", timeout=60)
+            status = self.wait_task(response.json()["task_id"])
+            return {"seconds": round(time.monotonic() - started, 3), "status": status}
+
+        coordinator = tasks.refresh_coordinator()
+        task_id = str(uuid.uuid4())
+        while not coordinator.claim(task_id):
+            time.sleep(0.1)  # Идёт обновление, запущенное через API
+        result = tasks.update_schedule_task.apply_async(task_id=task_id)
+        result.get(propagate=False)
+        return {"seconds": round(time.monotonic() - started, 3), "status": result.status,
+                "stages": RefreshMetrics.load(tasks.redis_client)["last"].get("stages")}
+
+    def wait_task(self, task_id):
+        """Ожидает задачу запущенного сервера, опрашивая статус"""
+        while True:
+            data = requests.get(f"{self.options['base_url']}/api/schedule/process/{task_id}/", timeout=60).json()
+            if data["status"] in ("SUCCESS", "FAILURE", "REVOKED"):
+                return data["status"]
+            time.sleep(0.5)
+
+    def list_client(self, seed):
+        """Чтение списка проблем: без фильтра, по группе, по преподавателю и следующая страница"""
+        rng = random.Random(seed)
+        session = self.session()
+        try:
+            while not self.stop.is_set():
+                kind = rng.choice(("list", "group", "teacher", "next_page"))
+                params = {}
+                if kind == "group":
+                    params["group"] = rng.choice(self.groups)
+                elif kind == "teacher":
+                    params["teacher"] = rng.choice(self.teachers)
+                status, data = self.request("issueslist", session, "get", "/api/issueslist", params)
+                if kind == "next_page" and status == 200 and data.get("next"):
+                    self.request("issueslist_next_page", session, "get", data["next"])
+        finally:
+            connections.close_all()
+
+    def process_client(self, seed):
+        """Запуски обработки: точечные по группе или преподавателю (одинаковые объединяются)"""
+        rng = random.Random(1000 + seed)
+        session = self.session()
+        try:
+            while not self.stop.wait(self.options["post_interval"]):
+                params = rng.choice(({"group": rng.choice(self.groups)}, {"teacher": rng.choice(self.teachers)}))
+                self.request("process", session, "post", "/api/schedule/process", params)
+        finally:
+            connections.close_all()
+
+    def session(self):
+        return requests.Session() if self.options["base_url"] else Client()
+
+    def request(self, name, session, method, path, params=None):
+        """Запрос с замером задержки. Возвращает (код ответа, JSON или {})"""
+        started = time.monotonic()
+        try:
+            if self.options["base_url"]:
+                url = path if path.startswith("http") else self.options["base_url"] + path
+                response = getattr(session, method)(url, params=params, timeout=60)
+                status = response.status_code
+            else:
+                if method == "post" and params:
+                    # POST-параметры фильтра передаются в строке запроса, как их читает ScheduleProcessingView
+                    path += "?" + urlencode(params)
+                    params = None
+                response = getattr(session, method)(path, params)
+                status = response.status_code
+            data = response.json() if status < 400 else {}
+        except Exception as e:
+            self.log(f"⚠️ {name}: {e}")
+            status, data = 599, {}
+        with self.samples_lock:
+            self.samples.setdefault(name, []).append((time.monotonic() - started, status))
+        return status, data
+
+    @staticmethod
+    def endpoint_stats(samples, elapsed):
+        result = BenchmarkCommand.stats([seconds for seconds, _ in samples])
+        result["p50"] = result["median"]
+        result["requests"] = len(samples)
+        result["errors"] = sum(1 for _, status in samples if status >= 400)
+        result["throughput"] = round(len(samples) / elapsed, 1) if elapsed else None
+        return result
+
+    def log(self, message):
+        """Ход теста; при выводе JSON в stdout — в stderr"""
+        if self.output_is_file:
+            self.stdout.write(message)
+        else:
+            self.stderr.write(message, style_func=str)
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IssueStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=255)),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('count', models.IntegerField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'category', '-count'], name='issue_stat_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'category', 'key'), name='issue_stat_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', models.CharField(max_length=255)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('location', models.CharField(max_length=255)),
+                ('teacher', models.CharField(blank=True, max_length=255, null=True)),
+                ('group', models.CharField(max_length=255)),
+                ('discipline', models.CharField(max_length=255)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group'], name='event_group_idx'), models.Index(fields=['teacher'], name='event_teacher_idx'), models.Index(fields=['start_time'], name='event_start_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleIssue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField(blank=True)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('last_updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fingerprint', models.CharField(blank=True, db_index=True, max_length=40)),
+                ('issue_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='issue_analizer.issuecategory')),
+                ('related_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_event', to='issue_analizer.scheduleevent')),
+                ('related_event_2', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_event_2', to='issue_analizer.scheduleevent')),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Поиск подстроки: icontains в PostgreSQL — это UPPER(поле) LIKE '%...%', ускоряется только
+# триграммным GIN-индексом по UPPER(поле). В других СУБД (SQLite в тестах) индексы не создаются.
+TRIGRAM_INDEXES = {
+    "event_group_trgm_idx": "group",
+    "event_teacher_trgm_idx": "teacher",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    table = schema_editor.quote_name(apps.get_model("issue_analizer", "ScheduleEvent")._meta.db_table)
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(name)} "
+            f"ON {table} USING gin (UPPER({schema_editor.quote_name(column)}) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class PostgresTrigramExtension(TrigramExtension):
+    """pg_trgm: при откате Django не проверяет СУБД, поэтому в SQLite откат пропускаем"""
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("issue_analizer", "0001_initial"),
+    ]
+
+    operations = [
+        PostgresTrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
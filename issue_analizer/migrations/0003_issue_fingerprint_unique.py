@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:55
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_issues(apps, schema_editor):
+    """Оставляет по одной проблеме на отпечаток (самую раннюю), иначе ограничение не создать"""
+    ScheduleIssue = apps.get_model("issue_analizer", "ScheduleIssue")
+    duplicates = (
+        ScheduleIssue.objects.exclude(fingerprint="").values("fingerprint")
+        .annotate(first_id=Min("id"), total=Count("id")).filter(total__gt=1)
+    )
+    for row in duplicates.iterator():
+        ScheduleIssue.objects.filter(fingerprint=row["fingerprint"]).exclude(id=row["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue_analizer', '0002_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_issues, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='scheduleissue',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint', ''), _negated=True), fields=('fingerprint',), name='issue_fingerprint_unique'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import re
+
 from django.utils.timezone import now
 from django.db import models
 
@@ -19,10 +21,36 @@ class ScheduleEvent(models.Model):
     group = models.CharField(max_length=255)  # Название группы
     discipline = models.CharField(max_length=255)  # Дисциплина
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["group"], name="event_group_idx"),
+            models.Index(fields=["teacher"], name="event_teacher_idx"),
+            models.Index(fields=["start_time"], name="event_start_time_idx"),
+            # Триграммные индексы для поиска подстроки (icontains) создаются только в PostgreSQL
+            # миграцией 0002_trigram_indexes
+        ]
+
     def __str__(self):
         return f"{self.summary} ({self.group}) - {self.start_time}"
 
 
+class ScheduleIssueQuerySet(models.QuerySet):
+    # Полный шифр группы, например ИВБО-01-23
+    GROUP_CODE = re.compile(r"^[А-ЯЁA-Z]{2,5}-\d{2}-\d{2}$", re.IGNORECASE)
+
+    def for_filters(self, group=None, teacher=None):
+        """Проблемы по группе и преподавателю первого занятия (поиск подстроки без учёта регистра)"""
+        queryset = self
+        if group and self.GROUP_CODE.match(group.strip()):
+            # Полный шифр — точное совпадение по B-tree индексу вместо поиска подстроки
+            queryset = queryset.filter(related_event__group=group.strip().upper())
+        elif group:
+            queryset = queryset.filter(related_event__group__icontains=group)
+        if teacher:
+            queryset = queryset.filter(related_event__teacher__icontains=teacher)
+        return queryset
+
+
 class ScheduleIssue(models.Model):
     """Ошибка в расписании"""
     issue_type = models.ForeignKey(IssueCategory, on_delete=models.CASCADE)  # Тип ошибки
@@ -31,6 +59,40 @@ class ScheduleIssue(models.Model):
     description = models.TextField(blank=True)  # Описание проблемы
     detected_at = models.DateTimeField(auto_now_add=True)  # Когда обнаружена ошибка
     last_updated = models.DateTimeField(default=now) # Дата последнего обновления
+    fingerprint = models.CharField(max_length=40, blank=True, db_index=True)  # Отпечаток для инкрементального обновления
+
+    objects = ScheduleIssueQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Пересекающиеся обновления (группа и её преподаватель) не должны записать проблему дважды
+            models.UniqueConstraint(
+                fields=["fingerprint"], condition=~models.Q(fingerprint=""), name="issue_fingerprint_unique"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.issue_type} - {self.description}"
+
+
+class IssueStat(models.Model):
+    """Число проблем в разрезе (категория, группа, преподаватель, корпус, неделя).
+
+    Пересчитывается при каждой записи проблем; /api/issues/stats читает только эту таблицу.
+    """
+    dimension = models.CharField(max_length=20)  # Разрез: category, group, teacher, building, week
+    key = models.CharField(max_length=255)  # Значение разреза (для week — понедельник недели, YYYY-MM-DD)
+    category = models.CharField(max_length=100, blank=True)  # Категория проблем ("" — все категории)
+    count = models.IntegerField()
+    computed_at = models.DateTimeField(default=now)  # Когда пересчитано
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "category", "key"], name="issue_stat_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["dimension", "category", "-count"], name="issue_stat_top_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.key} ({self.category or 'все'}): {self.count}"
@@ -19,3 +19,44 @@ class IssueSerializer(serializers.ModelSerializer):
         model = ScheduleIssue
         fields = ("id", "issue_type", "description", "detected_at", "related_event", "related_event_2")
 
+
+class IssueValuesSerializer:
+    """Быстрая сериализация проблем без экземпляров моделей и ModelSerializer.
+
+    Строки читаются одним запросом с JOIN через values(), JSON совпадает с IssueSerializer.
+    """
+    ISSUE_FIELDS = ("id", "description", "detected_at")
+    EVENT_FIELDS = EventSerializer.Meta.fields
+    EVENT_RELATIONS = ("related_event", "related_event_2")
+    _datetime = serializers.DateTimeField()  # Формат дат как у DRF (ISO 8601, текущий часовой пояс)
+
+    @classmethod
+    def values(cls, queryset):
+        """values()-запрос со всеми нужными полями, включая поля связанных занятий"""
+        fields = [*cls.ISSUE_FIELDS, "issue_type__name"]
+        for relation in cls.EVENT_RELATIONS:
+            fields.extend(f"{relation}__{field}" for field in cls.EVENT_FIELDS)
+        return queryset.values(*fields)
+
+    @classmethod
+    def to_representation(cls, row):
+        """Строка values() → словарь в формате IssueSerializer"""
+        to_datetime = cls._datetime.to_representation
+        data = {
+            "id": row["id"],
+            "issue_type": row["issue_type__name"],
+            "description": row["description"],
+            "detected_at": to_datetime(row["detected_at"]),
+        }
+        for relation in cls.EVENT_RELATIONS:
+            event = {field: row[f"{relation}__{field}"] for field in cls.EVENT_FIELDS}
+            event["start_time"] = to_datetime(event["start_time"])
+            event["end_time"] = to_datetime(event["end_time"])
+            data[relation] = event
+        return data
+
+    @classmethod
+    def serialize(cls, queryset):
+        """Сериализует queryset (или уже выполненный values()-запрос) списком"""
+        rows = queryset if isinstance(queryset, list) else cls.values(queryset)
+        return [cls.to_representation(row) for row in rows]
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from functools import lru_cache
+
+from .rule_engine import PairRule, register
+
+LONG_BREAK = "Длинное окно"
+IMPOSSIBLE_TRANSITION = "Невозможный переход"
+
+PAIR_CATEGORIES = (LONG_BREAK, IMPOSSIBLE_TRANSITION)
+
+
+@lru_cache(maxsize=4096)
+def gap_text(seconds):
+    """Перерыв в виде текста (одинаковые интервалы встречаются часто — форматируем один раз)"""
+    return str(timedelta(seconds=seconds))
+
+
+@register
+class LongWindowRule(PairRule):
+    """Окно между соседними занятиями дольше min_gap"""
+    name = "long_window"
+    category = LONG_BREAK
+    min_gap = timedelta(hours=2)
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.limit = int(self.min_gap.total_seconds())
+
+    def matches(self, table, first, second, gap):
+        return gap > self.limit
+
+    def mask(self, pairs):
+        return pairs.gap > self.limit
+
+    def describe(self, table, first, second, gap):
+        return f"Окно между занятиями: {gap_text(gap)}"
+
+
+@register
+class ImpossibleTransitionRule(PairRule):
+    """Смена аудитории, на которую перерыва меньше min_travel"""
+    name = "impossible_transition"
+    category = IMPOSSIBLE_TRANSITION
+    min_travel = timedelta(minutes=10)
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.limit = int(self.min_travel.total_seconds())
+
+    def matches(self, table, first, second, gap):
+        return table.location[first] != table.location[second] and gap < self.limit
+
+    def mask(self, pairs):
+        return (pairs.first("location") != pairs.second("location")) & (pairs.gap < self.limit)
+
+    def describe(self, table, first, second, gap):
+        return (f"Невозможно успеть из {table.text('location', first)} в {table.text('location', second)} "
+                f"за {gap_text(gap)}.")
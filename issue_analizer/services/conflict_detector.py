@@ -0,0 +1,78 @@
+from .rule_engine import OverlapRule, register
+
+TEACHER_CONFLICT = "Конфликт преподавателя"
+ROOM_CONFLICT = "Конфликт аудитории"
+GROUP_OVERLAP = "Наложение занятий"
+
+CONFLICT_CATEGORIES = (TEACHER_CONFLICT, ROOM_CONFLICT, GROUP_OVERLAP)
+
+
+@register
+class TeacherConflictRule(OverlapRule):
+    """Преподаватель одновременно ведёт занятия в разных аудиториях"""
+    name = "teacher_conflict"
+    category = TEACHER_CONFLICT
+    key = "teacher"
+    identity = ("location",)
+
+    def describe(self, table, first, second):
+        return (f"Преподаватель {table.text('teacher', first)} одновременно ведёт занятия "
+                f"в {table.text('location', first)} и {table.text('location', second)}")
+
+
+@register
+class RoomConflictRule(OverlapRule):
+    """Аудитория одновременно занята разными преподавателями.
+
+    Дистанционные занятия (СДО, онлайн) и занятия без аудитории идут не в аудитории:
+    их «место» общее у многих преподавателей, такие пары пропускаются.
+    """
+    name = "room_conflict"
+    category = ROOM_CONFLICT
+    key = "location"
+    identity = ("teacher",)
+    virtual_markers = ("сдо", "онлайн", "дистанц")  # Пометки дистанционного занятия в LOCATION (без учёта регистра)
+
+    def is_virtual_location(self, table, index):
+        location = table.text("location", index).strip().casefold()
+        return not location or any(marker in location for marker in self.virtual_markers)
+
+    def matches(self, table, first, second):
+        # Ключ пары общий: достаточно проверить одно занятие
+        return not self.is_virtual_location(table, first)
+
+    def describe(self, table, first, second):
+        return (f"Аудитория {table.text('location', first)} занята одновременно: "
+                f"{table.text('teacher', first) or 'без преподавателя'} и "
+                f"{table.text('teacher', second) or 'без преподавателя'}")
+
+
+@register
+class GroupOverlapRule(OverlapRule):
+    """У группы пересекаются разные занятия.
+
+    Параллельные занятия подгрупп — не наложение: группа делится на лабораторных работах
+    (вид split_kinds) и на занятиях с пометкой подгруппы, а одна дисциплина в одно время
+    у разных преподавателей — это её подгруппы. Такие пары пропускаются.
+    """
+    name = "group_overlap"
+    category = GROUP_OVERLAP
+    key = "group"
+    identity = ("location", "teacher", "discipline")
+    split_kinds = ("ЛАБ",)  # Виды занятий (начало SUMMARY), которые проходят по подгруппам
+    subgroup_markers = ("подгруп", "п/г")  # Пометки подгруппы в SUMMARY (без учёта регистра)
+
+    def is_subgroup_lesson(self, table, index):
+        summary = table.text("summary", index)
+        kind = summary.split(" ", 1)[0].upper()
+        lowered = summary.casefold()
+        return kind in self.split_kinds or any(marker in lowered for marker in self.subgroup_markers)
+
+    def matches(self, table, first, second):
+        if table.discipline[first] == table.discipline[second]:
+            return False
+        return not (self.is_subgroup_lesson(table, first) or self.is_subgroup_lesson(table, second))
+
+    def describe(self, table, first, second):
+        return (f"У группы {table.text('group', first)} пересекаются занятия: "
+                f"{table.text('summary', first)} и {table.text('summary', second)}")
@@ -0,0 +1,240 @@
+from array import array
+from datetime import datetime
+
+# Поля занятия в порядке хранения
+EVENT_FIELDS = ("summary", "start", "end", "location", "teacher", "group", "discipline")
+STRING_FIELDS = ("summary", "location", "teacher", "group", "discipline")
+RELATED_FIELDS = tuple(f"related_{field}_2" for field in EVENT_FIELDS)  # Поля второго занятия в проблеме
+
+
+class IssueRef:
+    """Найденная проблема: ссылки на два занятия таблицы вместо копии их полей"""
+    __slots__ = ("category", "first", "second", "description")
+
+    def __init__(self, category, first, second, description):
+        self.category = category
+        self.first = first
+        self.second = second
+        self.description = description
+
+
+class EventTable:
+    """Компактное колоночное представление занятий.
+
+    Строковые поля хранятся как индексы в пуле интернированных строк, время — как целые
+    секунды Unix, день — как порядковый номер локальной даты начала. Словари занятий
+    создаются только по запросу (row, __iter__, issue).
+    """
+    __slots__ = (
+        "strings", "_string_ids", "tzinfos", "_tz_ids",
+        "summary", "location", "teacher", "group", "discipline",
+        "start", "end", "day", "tz",
+    )
+
+    def __init__(self, events=()):
+        self.strings = []
+        self._string_ids = {}
+        self.tzinfos = []
+        self._tz_ids = {}
+        for field in STRING_FIELDS:
+            setattr(self, field, array("l"))
+        self.start = array("q")
+        self.end = array("q")
+        self.day = array("l")
+        self.tz = array("h")
+        self.extend(events)
+
+    def __len__(self):
+        return len(self.start)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def intern(self, value):
+        """Индекс строки в пуле (строка добавляется при первом появлении)"""
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def string_id(self, value):
+        """Индекс строки в пуле или None, если такой строки в таблице нет"""
+        return self._string_ids.get(value)
+
+    def _intern_tz(self, tzinfo):
+        tz_id = self._tz_ids.get(tzinfo)
+        if tz_id is None:
+            tz_id = self._tz_ids[tzinfo] = len(self.tzinfos)
+            self.tzinfos.append(tzinfo)
+        return tz_id
+
+    def append(self, summary, start, end, location, teacher, group, discipline):
+        """Добавляет занятие (аргументы в порядке EVENT_FIELDS)"""
+        self.summary.append(self.intern(summary))
+        self.location.append(self.intern(location))
+        self.teacher.append(self.intern(teacher))
+        self.group.append(self.intern(group))
+        self.discipline.append(self.intern(discipline))
+        self.start.append(int(start.timestamp()))
+        self.end.append(int(end.timestamp()))
+        self.day.append(start.date().toordinal())
+        self.tz.append(self._intern_tz(start.tzinfo))
+
+    def extend(self, events, groups=None, window=None):
+        """Добавляет занятия из списка словарей или другой таблицы.
+
+        groups — фильтр по группам, window — (первый день, день после последнего) по дате начала.
+        """
+        if not isinstance(events, EventTable):
+            for event in events:
+                if groups is not None and event["group"] not in groups:
+                    continue
+                if window is not None and not window[0] <= event["start"].date() < window[1]:
+                    continue
+                self.append(*(event[field] for field in EVENT_FIELDS))
+            return
+
+        # Таблица: переносим колонки, переводя индексы строк и часовых поясов в свой пул
+        strings = [self.intern(value) for value in events.strings]
+        tzinfos = [self._intern_tz(tzinfo) for tzinfo in events.tzinfos]
+        first_day, last_day = (window[0].toordinal(), window[1].toordinal()) if window else (None, None)
+        for index in range(len(events)):
+            if groups is not None and events.strings[events.group[index]] not in groups:
+                continue
+            if window is not None and not first_day <= events.day[index] < last_day:
+                continue
+            for field in STRING_FIELDS:
+                getattr(self, field).append(strings[getattr(events, field)[index]])
+            self.start.append(events.start[index])
+            self.end.append(events.end[index])
+            self.day.append(events.day[index])
+            self.tz.append(tzinfos[events.tz[index]])
+
+    def columns(self):
+        """Колонки таблицы списками чисел (для сериализации; часовые пояса — в tzinfos)"""
+        return {field: getattr(self, field).tolist() for field in (*STRING_FIELDS, "start", "end", "day", "tz")}
+
+    @classmethod
+    def from_columns(cls, strings, tzinfos, columns):
+        """Таблица из пула строк, часовых поясов и колонок (результата columns)"""
+        table = cls()
+        for value in strings:
+            table.intern(value)
+        for tz_id, tzinfo in enumerate(tzinfos):
+            # Без интернирования: индексы поясов в колонке tz должны сохраниться
+            table.tzinfos.append(tzinfo)
+            table._tz_ids.setdefault(tzinfo, tz_id)
+        for field, values in columns.items():
+            getattr(table, field).extend(values)
+        return table
+
+    def text(self, field, index):
+        """Значение строкового поля занятия"""
+        return self.strings[getattr(self, field)[index]]
+
+    def time(self, timestamp, index):
+        """Восстанавливает datetime в часовом поясе занятия"""
+        return datetime.fromtimestamp(timestamp, self.tzinfos[self.tz[index]])
+
+    def row(self, index):
+        """Занятие в виде словаря, как его возвращает ScheduleService.parse_ical"""
+        return {
+            "summary": self.text("summary", index),
+            "start": self.time(self.start[index], index),
+            "end": self.time(self.end[index], index),
+            "location": self.text("location", index),
+            "teacher": self.text("teacher", index),
+            "group": self.text("group", index),
+            "discipline": self.text("discipline", index),
+        }
+
+    def groups(self):
+        """Множество групп в таблице"""
+        return {self.strings[string_id] for string_id in set(self.group)}
+
+    def issue(self, ref):
+        """Материализует IssueRef в словарь проблемы в формате ScheduleAnalyzer.find_issues"""
+        issue = {"category": ref.category}
+        issue.update(self.row(ref.first))
+        issue.update(zip(RELATED_FIELDS, self.row(ref.second).values()))
+        issue["description"] = ref.description
+        return issue
+
+
+class EventRows:
+    """Список словарей занятий в интерфейсе EventTable для правил анализа, без перекодирования.
+
+    Колонки строятся при первом обращении: строковые поля — сами строки, время — секунды
+    Unix, день — порядковый номер даты начала. Проблемы собираются из исходных словарей.
+    """
+
+    _EPOCH_DAY = datetime(1970, 1, 1).toordinal()
+
+    def __init__(self, events):
+        self.events = events if isinstance(events, list) else list(events)
+        self._offsets = {}
+
+    def _seconds(self, moment):
+        """Секунды Unix без datetime.timestamp (он медленный для часовых поясов pytz)"""
+        day = moment.toordinal()
+        key = (moment.tzinfo, day)  # Смещение пояса не меняется в течение дня (кроме ночи перехода)
+        offset = self._offsets.get(key)
+        if offset is None:
+            utcoffset = moment.utcoffset()
+            offset = self._offsets[key] = int(utcoffset.total_seconds()) if utcoffset else 0
+        return (day - self._EPOCH_DAY) * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second - offset
+
+    def __getattr__(self, field):
+        if field in STRING_FIELDS:
+            column = [event[field] for event in self.events]
+        elif field in ("start", "end"):
+            column = [self._seconds(event[field]) for event in self.events]
+        elif field == "day":
+            column = [event["start"].toordinal() for event in self.events]
+        else:
+            raise AttributeError(field)
+        setattr(self, field, column)
+        return column
+
+    def __len__(self):
+        return len(self.events)
+
+    def text(self, field, index):
+        return self.events[index][field]
+
+    def string_id(self, value):
+        """Значение строковой колонки: строки хранятся как есть"""
+        return value
+
+    def row(self, index):
+        event = self.events[index]
+        return {field: event[field] for field in EVENT_FIELDS}
+
+    issue = EventTable.issue
+
+
+def event_groups(events):
+    """Множество групп для списка словарей или EventTable"""
+    if isinstance(events, EventTable):
+        return events.groups()
+    return {event["group"] for event in events}
+
+
+def select_groups(events, groups):
+    """Оставляет только занятия указанных групп (для списка словарей или EventTable)"""
+    if isinstance(events, EventTable):
+        table = EventTable()
+        table.extend(events, groups=groups)
+        return table
+    return [event for event in events if event["group"] in groups]
+
+
+def select_window(events, window):
+    """Оставляет только занятия, начинающиеся в окне (первый день, день после последнего)"""
+    if isinstance(events, EventTable):
+        table = EventTable()
+        table.extend(events, window=window)
+        return table
+    return [event for event in events if window[0] <= event["start"].date() < window[1]]
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from .schedule_service import ScheduleService
+
+
+class FakeScheduleAPI:
+    """Локальная замена API расписания МИРЭА для нагрузочных тестов и работы без сети.
+
+    Отдаёт постраничный каталог (/schedule/api/search: data и nextPageToken) и календари
+    групп и преподавателей из SyntheticSchedule. Поддерживает ETag и 304, задержку ответа
+    и внедрение ошибок. Запускается в фоновом потоке: start() / stop().
+    """
+
+    SEARCH_PATH = "/schedule/api/search"
+
+    def __init__(self, schedule, page_size=100, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 teachers=True, seed=0):
+        """latency и jitter — задержка ответа и её случайная добавка, с; error_rate — доля запросов,
+        на которые отвечается error_status (0 — соединение закрывается без ответа)
+        """
+        self.schedule = schedule
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.teachers = teachers
+        self.revisions = {}  # Номер версии календаря: меняется вызовом change()
+        self.stats = {"requests": 0, "catalog": 0, "calendars": 0, "not_modified": 0, "errors": 0, "bytes": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calendars = {}
+        self._teacher_events = None
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self):
+        """Адрес каталога (для SCHEDULE_API_URL)"""
+        return self.base_url + self.SEARCH_PATH
+
+    def start(self, host="127.0.0.1", port=0):
+        """Запускает сервер в фоновом потоке (port=0 — свободный порт)"""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                api.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self if self._server else self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def catalog(self):
+        """Все записи каталога: группы (scheduleTarget=1), затем преподаватели (2)"""
+        entries = [
+            {"id": index + 1, "targetTitle": self.schedule.group_name(index), "fullTitle": self.schedule.group_name(index),
+             "scheduleTarget": ScheduleService.GROUP_TARGET,
+             "iCalLink": f"{self.base_url}/schedule/ical/1/{index}"}
+            for index in range(self.schedule.groups)
+        ]
+        if self.teachers:
+            entries.extend(
+                {"id": 100000 + index, "targetTitle": teacher, "fullTitle": teacher,
+                 "scheduleTarget": ScheduleService.TEACHER_TARGET,
+                 "iCalLink": f"{self.base_url}/schedule/ical/2/{quote(teacher)}"}
+                for index, teacher in enumerate(self.schedule.teachers)
+            )
+        return entries
+
+    def change(self, count):
+        """Меняет содержимое count случайных календарей групп (новый ETag и хэш)"""
+        with self._lock:
+            for index in self._rng.sample(range(self.schedule.groups), min(count, self.schedule.groups)):
+                key = ("1", str(index))
+                self.revisions[key] = self.revisions.get(key, 0) + 1
+                self._calendars.pop(key, None)
+
+    def calendar(self, target, key):
+        """(содержимое, ETag) календаря или None"""
+        with self._lock:
+            if (target, key) not in self._calendars:
+                content = self._render(target, key)
+                if content is None:
+                    return None
+                revision = self.revisions.get((target, key), 0)
+                if revision:
+                    # Меняется только содержимое: занятия те же, но календарь считается изменившимся
+                    content = content.replace("END:VCALENDAR", f"X-REVISION:{revision}\r\nEND:VCALENDAR")
+                content = content.encode()
+                self._calendars[(target, key)] = (content, f'"{hashlib.sha1(content).hexdigest()}"')
+            return self._calendars[(target, key)]
+
+    def _render(self, target, key):
+        if target == "1" and key.isdigit() and int(key) < self.schedule.groups:
+            return self.schedule.calendar(int(key))
+        if target == "2" and self.teachers:
+            teacher = unquote(key)
+            if self._teacher_events is None:
+                # Календари преподавателей собираются из календарей групп за один проход
+                self._teacher_events = {}
+                for index in range(self.schedule.groups):
+                    for event in self.schedule.events(index):
+                        self._teacher_events.setdefault(event["teacher"], []).append(event)
+            if teacher in self.schedule.teachers:
+                events = sorted(self._teacher_events.get(teacher, ()), key=lambda event: (event["start"], event["group"]))
+                return self.schedule.render(teacher, events, uid=f"t{self.schedule.teachers.index(teacher)}")
+        return None
+
+    def handle(self, request):
+        """Обработка GET-запроса: задержка, внедрённая ошибка, каталог или календарь"""
+        with self._lock:
+            self.stats["requests"] += 1
+            failed = self.error_rate and self._rng.random() < self.error_rate
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if failed:
+            with self._lock:
+                self.stats["errors"] += 1
+            if not self.error_status:
+                request.close_connection = True
+                return
+            return self._send(request, self.error_status, b"injected error", "text/plain")
+
+        parts = urlsplit(request.path)
+        if parts.path == self.SEARCH_PATH:
+            return self._send_page(request, parse_qs(parts.query).get("pageToken", [""])[0])
+
+        segments = parts.path.strip("/").split("/")
+        calendar = None
+        if len(segments) == 4 and segments[:2] == ["schedule", "ical"]:
+            calendar = self.calendar(segments[2], segments[3])
+        if calendar is None:
+            return self._send(request, 404, b"not found", "text/plain")
+
+        content, etag = calendar
+        with self._lock:
+            self.stats["calendars"] += 1
+        if request.headers.get("If-None-Match") == etag:
+            with self._lock:
+                self.stats["not_modified"] += 1
+            return self._send(request, 304, b"", None, etag=etag)
+        self._send(request, 200, content, "text/calendar; charset=utf-8", etag=etag)
+
+    def _send_page(self, request, token):
+        catalog = self.catalog()
+        start = int(token) if token.isdigit() else 0
+        if token and not token.isdigit():
+            return self._send(request, 400, b"bad pageToken", "text/plain")
+        page = {"data": catalog[start:start + self.page_size]}
+        if start + self.page_size < len(catalog):
+            page["nextPageToken"] = str(start + self.page_size)
+        with self._lock:
+            self.stats["catalog"] += 1
+        self._send(request, 200, json.dumps(page, ensure_ascii=False).encode(), "application/json")
+
+    def _send(self, request, status, body, content_type, etag=None):
+        request.send_response(status)
+        if content_type:
+            request.send_header("Content-Type", content_type)
+        if etag:
+            request.send_header("ETag", etag)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+        with self._lock:
+            self.stats["bytes"] += len(body)
@@ -0,0 +1,164 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+
+import pytz
+import redis
+
+from .event_table import EventTable
+
+
+@dataclass
+class CacheEntry:
+    """Закэшированный календарь: валидаторы HTTP, хэш содержимого и разобранные занятия
+    (список словарей или EventTable)"""
+    etag: str = None
+    last_modified: str = None
+    content_hash: str = None
+    events: list = field(default_factory=list)
+    expand: bool = False  # Повторяющиеся занятия развёрнуты (RRULE/RDATE/EXDATE)
+
+    def conditional_headers(self):
+        """Заголовки для условного GET-запроса"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def content_hash(content):
+    """Хэш содержимого календаря"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        return date.fromisoformat(value["d"])
+    return value
+
+
+def _encode_tz(tzinfo):
+    """Часовой пояс колонки tz: имя пояса или постоянное смещение (ValueError — не сериализуется)"""
+    if tzinfo is None:
+        return None
+    zone = getattr(tzinfo, "zone", None) or getattr(tzinfo, "key", None)  # pytz или zoneinfo
+    if zone:
+        return {"zone": zone}
+    offset = tzinfo.utcoffset(None)
+    if offset is None:
+        raise ValueError(f"Часовой пояс без имени и постоянного смещения: {tzinfo!r}")
+    return {"offset": offset.total_seconds()}
+
+
+def _decode_tz(value):
+    if value is None:
+        return None
+    if "zone" in value:
+        return pytz.timezone(value["zone"])
+    return timezone(timedelta(seconds=value["offset"]))
+
+
+def _encode_table(table):
+    """EventTable колонками: без словаря на каждое занятие"""
+    return {
+        "strings": table.strings,
+        "tzinfos": [_encode_tz(tzinfo) for tzinfo in table.tzinfos],
+        "columns": table.columns(),
+    }
+
+
+def _decode_events(data, compact):
+    """Занятия записи кэша: EventTable при compact, иначе список словарей"""
+    if "table" in data:
+        table = data["table"]
+        table = EventTable.from_columns(table["strings"], [_decode_tz(tz) for tz in table["tzinfos"]],
+                                        table["columns"])
+        return table if compact else list(table)
+    events = ({key: _decode_value(value) for key, value in event.items()} for event in data["events"])
+    return EventTable(events) if compact else list(events)
+
+
+class ICalCache:
+    """Постоянный кэш iCal-календарей в Redis (ключ — ссылка на календарь)"""
+
+    KEY_PREFIX = "ical_cache:"
+    TTL = 7 * 24 * 3600  # Неделя: календари без изменений продлевают срок при каждой проверке
+
+    def __init__(self, redis_client, ttl=None):
+        self.redis = redis_client
+        self.ttl = ttl or self.TTL
+
+    def __getstate__(self):
+        # Клиент Redis не сериализуется: передаём параметры подключения (для пула процессов)
+        pool = self.redis.connection_pool
+        return {
+            "ttl": self.ttl,
+            "connection_class": pool.connection_class,
+            "connection_kwargs": pool.connection_kwargs,
+        }
+
+    def __setstate__(self, state):
+        self.ttl = state["ttl"]
+        self.redis = redis.Redis(connection_pool=redis.ConnectionPool(
+            connection_class=state["connection_class"], **state["connection_kwargs"]
+        ))
+
+    def key(self, url):
+        return self.KEY_PREFIX + hashlib.md5(url.encode()).hexdigest()
+
+    def get(self, url, compact=False):
+        """Возвращает CacheEntry или None (compact — занятия в виде EventTable)"""
+        raw = self.redis.get(self.key(url))
+        if not raw:
+            return None
+        data = json.loads(raw)
+        events = _decode_events(data, compact)
+        return CacheEntry(etag=data["etag"], last_modified=data["last_modified"],
+                          content_hash=data["content_hash"], events=events, expand=data.get("expand", False))
+
+    def set(self, url, entry):
+        self.store(url, self.dumps(entry))
+
+    @staticmethod
+    def dumps(entry):
+        """Сериализованная запись (для store: сохранить её можно позже, например после записи в БД)"""
+        data = {
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "content_hash": entry.content_hash,
+            "expand": entry.expand,
+        }
+        try:
+            if isinstance(entry.events, EventTable):
+                data["table"] = _encode_table(entry.events)
+        except ValueError:
+            pass  # Нестандартный часовой пояс — храним словарями
+        if "table" not in data:
+            data["events"] = [
+                {key: _encode_value(value) for key, value in event.items()}
+                for event in entry.events
+            ]
+        return json.dumps(data, ensure_ascii=False)
+
+    def store(self, url, payload):
+        self.redis.set(self.key(url), payload, ex=self.ttl)
+
+    def touch(self, url):
+        """Продлевает срок хранения записи без её перезаписи"""
+        self.redis.expire(self.key(url), self.ttl)
+
+    def delete(self, url):
+        self.redis.delete(self.key(url))
@@ -0,0 +1,312 @@
+import re
+from datetime import date, datetime, timedelta
+
+import pytz
+from dateutil.rrule import rruleset, rrulestr
+
+# Строковые свойства VEVENT, которые нужны для занятия, и соответствующие поля
+TEXT_PROPERTIES = {
+    "SUMMARY": "summary",
+    "LOCATION": "location",
+    "X-META-TEACHER": "teacher",
+    "X-META-GROUP": "group",
+    "X-META-DISCIPLINE": "discipline",
+}
+TIME_PROPERTIES = ("DTSTART", "DTEND", "RECURRENCE-ID")
+LIST_PROPERTIES = ("RDATE", "EXDATE")
+PROPERTIES = {*TEXT_PROPERTIES, *TIME_PROPERTIES, *LIST_PROPERTIES, "RRULE", "UID"}
+_WANTED = PROPERTIES | {"BEGIN", "END"}
+
+UNBOUNDED_HORIZON = timedelta(days=366)  # Докуда разворачивать правило без UNTIL и COUNT
+
+_FOLD = re.compile("(\r?\n)+[ \t]")  # Перенос строки с пробелом или табуляцией — продолжение строки
+
+
+class UnsupportedCalendar(ValueError):
+    """Календарь содержит конструкции, которые быстрый разбор не поддерживает"""
+
+
+def unescape(value):
+    """Снимает экранирование текстового значения (как icalendar, порядок замен важен)"""
+    if "\\" not in value:
+        return value
+    return (value.replace("\\N", "\\n").replace("\\n", "\n").replace("\\,", ",")
+            .replace("\\;", ";").replace("\\\\", "\\"))
+
+
+def _unfold(ical_data):
+    """Склеивает перенесённые строки и возвращает список строк содержимого"""
+    text = ical_data.replace("\r\n", "\n")
+    if "\n\n " in text or "\n\n\t" in text:
+        text = _FOLD.sub("", text)  # Пустые строки перед продолжением — редкий случай
+    else:
+        text = text.replace("\n ", "").replace("\n\t", "")
+    return text.split("\n")
+
+
+def _split_line(line):
+    """Делит строку содержимого на (имя, параметры-строка, значение)"""
+    colon = line.find(":")
+    if colon < 0:
+        raise UnsupportedCalendar(f"Строка без значения: {line!r}")
+    head = line[:colon]
+    if '"' in head:
+        # Двоеточие может быть внутри параметра в кавычках — ищем первое вне кавычек
+        in_quotes = False
+        for colon, char in enumerate(line):
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == ":" and not in_quotes:
+                break
+        head = line[:colon]
+    name, _, params = head.partition(";")
+    return name.upper(), params, line[colon + 1:]
+
+
+def _param(params, key):
+    """Значение параметра key (без кавычек) или None"""
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.upper() == key:
+            return value.strip('"')
+    return None
+
+
+class _TimeParser:
+    """Разбор значений DATE и DATE-TIME с кэшем: в календаре одни и те же моменты повторяются"""
+
+    def __init__(self):
+        self._values = {}
+        self._zones = {}
+        self._days = {}
+
+    def zone(self, tzid):
+        tzinfo = self._zones.get(tzid)
+        if tzinfo is None:
+            try:
+                tzinfo = self._zones[tzid] = pytz.timezone(tzid.strip("/"))
+            except pytz.UnknownTimeZoneError:
+                # Windows-имена и пояса из VTIMEZONE разбирает только icalendar
+                raise UnsupportedCalendar(f"Неизвестный часовой пояс: {tzid}")
+        return tzinfo
+
+    def parse(self, value, tzid=None):
+        key = (value, tzid)
+        parsed = self._values.get(key)
+        if parsed is None:
+            parsed = self._values[key] = self._parse(value, tzid)
+        return parsed
+
+    def _localize(self, tzinfo, moment, day):
+        """pytz localize, ускоренный для дней без перехода: смещение берётся из кэша по дню"""
+        key = (tzinfo, day)
+        day_tzinfo = self._days.get(key)
+        if day_tzinfo is None:
+            midnight = datetime(moment.year, moment.month, moment.day)
+            first = tzinfo.localize(midnight).tzinfo
+            last = tzinfo.localize(midnight.replace(hour=23, minute=59, second=59)).tzinfo
+            day_tzinfo = self._days[key] = first if first is last else False
+        if day_tzinfo is False:  # В этот день меняется смещение
+            return tzinfo.localize(moment)
+        return moment.replace(tzinfo=day_tzinfo)
+
+    def _parse(self, value, tzid):
+        try:
+            if len(value) == 8:
+                return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+            if len(value) not in (15, 16) or value[8] != "T":
+                raise ValueError(value)
+            moment = datetime(int(value[:4]), int(value[4:6]), int(value[6:8]),
+                              int(value[9:11]), int(value[11:13]), int(value[13:15]))
+        except ValueError:
+            raise UnsupportedCalendar(f"Неподдерживаемое значение времени: {value}")
+        if tzid:
+            return self._localize(self.zone(tzid), moment, value[:8])
+        if len(value) == 15:
+            return moment
+        if value[15] == "Z":
+            return pytz.utc.localize(moment)
+        raise UnsupportedCalendar(f"Неподдерживаемое значение времени: {value}")
+
+
+def _iter_vevents(ical_data, times):
+    """Выдаёт свойства каждого VEVENT (только нужные), разбирая календарь построчно"""
+    stack = []
+    properties = None
+    for line in _unfold(ical_data):
+        # Ненужные свойства отбрасываем до полного разбора строки
+        if not line or line.partition(":")[0].partition(";")[0].upper() not in _WANTED:
+            continue
+        name, params, value = _split_line(line)
+
+        if name == "BEGIN":
+            stack.append(value.upper())
+            if stack[-1] == "VEVENT":
+                properties = {}
+            continue
+        if name == "END":
+            if stack and stack.pop() == "VEVENT":
+                yield properties
+            continue
+        # Свойства вложенных компонентов (VALARM) и календаря пропускаем
+        if name not in PROPERTIES or not stack or stack[-1] != "VEVENT":
+            continue
+
+        if name in LIST_PROPERTIES:
+            tzid = _param(params, "TZID") if params else None
+            if "/" in value:
+                raise UnsupportedCalendar(f"{name} с периодом не поддерживается")
+            properties.setdefault(name, []).extend(times.parse(item, tzid) for item in value.split(","))
+            continue
+        if name in properties:
+            # Повторяющееся свойство icalendar превращает в список — отдаём такой календарь ему
+            raise UnsupportedCalendar(f"Повторяющееся свойство {name}")
+        if name in TIME_PROPERTIES:
+            properties[name] = times.parse(value, _param(params, "TZID") if params else None)
+        elif name in TEXT_PROPERTIES:
+            properties[name] = unescape(value)
+        else:
+            properties[name] = value
+
+
+def _local(moment, tzinfo):
+    """Момент как наивное локальное время в поясе tzinfo (для дат — полночь)"""
+    if not isinstance(moment, datetime):
+        return datetime(moment.year, moment.month, moment.day)
+    if moment.tzinfo is not None and tzinfo is not None:
+        moment = moment.astimezone(tzinfo)
+    return moment.replace(tzinfo=None)
+
+
+def _local_rule(rule, tzinfo):
+    """Переводит UNTIL правила в локальное время DTSTART (dateutil требует одинаковой «наивности»)"""
+    parts = []
+    for part in rule.split(";"):
+        key, _, value = part.partition("=")
+        if key.upper() == "UNTIL":
+            if len(value) == 8:  # Дата — включительно до конца дня
+                value += "T235959"
+            elif value.endswith("Z"):
+                until = pytz.utc.localize(datetime.strptime(value, "%Y%m%dT%H%M%SZ"))
+                value = _local(until, tzinfo).strftime("%Y%m%dT%H%M%S")
+            part = f"UNTIL={value}"
+        parts.append(part)
+    return ";".join(parts)
+
+
+def in_window(moment, window):
+    """Попадает ли начало занятия в окно (первый день, день после последнего) по локальной дате"""
+    if window is None:
+        return True
+    day = moment.date() if isinstance(moment, datetime) else moment
+    return window[0] <= day < window[1]
+
+
+def expand_occurrences(start, end, rule=None, rdates=(), exdates=(), window=None):
+    """Лениво выдаёт (начало, конец) повторений занятия по RRULE/RDATE за вычетом EXDATE.
+
+    Повторения считаются в локальном времени DTSTART и затем локализуются, поэтому
+    переходы на летнее время не сдвигают занятия. window — (первый день, день после
+    последнего): повторения до окна пропускаются, перебор останавливается на конце окна.
+    Правило без UNTIL и COUNT и без окна разворачивается на UNBOUNDED_HORIZON вперёд.
+    """
+    is_date = not isinstance(start, datetime)
+    tzinfo = None if is_date else start.tzinfo
+    duration = end - start
+    first = _local(start, tzinfo)
+
+    occurrences = rruleset()
+    bounded = True
+    if rule:
+        try:
+            occurrences.rrule(rrulestr(_local_rule(rule, tzinfo), dtstart=first))
+        except (ValueError, TypeError) as e:
+            raise UnsupportedCalendar(f"Некорректное правило {rule}: {e}")
+        upper_rule = rule.upper()
+        bounded = "UNTIL=" in upper_rule or "COUNT=" in upper_rule
+    else:
+        occurrences.rdate(first)
+    for moment in rdates:
+        occurrences.rdate(_local(moment, tzinfo))
+    for moment in exdates:
+        occurrences.exdate(_local(moment, tzinfo))
+
+    if window is None:
+        horizon = None if bounded else first + UNBOUNDED_HORIZON
+        iterator = iter(occurrences)
+    else:
+        horizon = _local(window[1], None)
+        iterator = occurrences.xafter(_local(window[0], None), inc=True)
+
+    for occurrence in iterator:
+        if horizon is not None and occurrence >= horizon:
+            break
+        if is_date:
+            occurrence_start = occurrence.date()
+            yield occurrence_start, occurrence_start + duration
+        elif tzinfo is None:
+            yield occurrence, occurrence + duration
+        else:
+            occurrence_start = tzinfo.localize(occurrence) if hasattr(tzinfo, "localize") else occurrence.replace(tzinfo=tzinfo)
+            occurrence_end = occurrence_start + duration
+            if hasattr(tzinfo, "normalize"):
+                occurrence_end = tzinfo.normalize(occurrence_end)
+            yield occurrence_start, occurrence_end
+
+
+def _event(properties, start, end):
+    return {
+        "summary": properties.get("SUMMARY", ""),
+        "start": start,
+        "end": end,
+        "location": properties.get("LOCATION", ""),
+        "teacher": properties.get("X-META-TEACHER", ""),
+        "group": properties.get("X-META-GROUP", ""),
+        "discipline": properties.get("X-META-DISCIPLINE", ""),
+    }
+
+
+def expand_events(vevents, expand=False, window=None):
+    """Превращает свойства VEVENT (ключи — имена свойств iCal) в словари занятий.
+
+    Без expand — одно занятие на VEVENT, время из DTSTART/DTEND. С expand повторяющиеся
+    занятия (RRULE/RDATE/EXDATE) разворачиваются, а экземпляры, переопределённые через
+    RECURRENCE-ID, заменяются своими VEVENT. window — (первый день, день после последнего):
+    выдаются только занятия, начинающиеся в окне.
+    """
+    recurring = []
+    overridden = {}  # UID → моменты RECURRENCE-ID
+
+    for properties in vevents:
+        if "DTSTART" not in properties or "DTEND" not in properties:
+            raise UnsupportedCalendar("VEVENT без DTSTART или DTEND")
+        if expand and "RECURRENCE-ID" in properties:
+            overridden.setdefault(properties.get("UID"), []).append(properties["RECURRENCE-ID"])
+        # Оставляем только занятия с X-META-DISCIPLINE
+        if not properties.get("X-META-DISCIPLINE"):
+            continue
+        if expand and ("RRULE" in properties or "RDATE" in properties):
+            recurring.append(properties)  # Переопределения могут идти после основного VEVENT
+            continue
+        if in_window(properties["DTSTART"], window):
+            yield _event(properties, properties["DTSTART"], properties["DTEND"])
+
+    for properties in recurring:
+        exdates = properties.get("EXDATE", []) + overridden.get(properties.get("UID"), [])
+        for start, end in expand_occurrences(properties["DTSTART"], properties["DTEND"], properties.get("RRULE"),
+                                             properties.get("RDATE", ()), exdates, window=window):
+            yield _event(properties, start, end)
+
+
+def iter_events(ical_data, expand=False, window=None):
+    """Потоковый разбор календаря МИРЭА (?includeMeta=true): выдаёт словари занятий.
+
+    Без expand и window результат совпадает с ScheduleService.parse_ical (см. expand_events).
+    При неподдерживаемой конструкции выбрасывает UnsupportedCalendar.
+    """
+    return expand_events(_iter_vevents(ical_data, _TimeParser()), expand=expand, window=window)
+
+
+def parse_events(ical_data, expand=False, window=None):
+    """То же, что iter_events, но списком"""
+    return list(iter_events(ical_data, expand=expand, window=window))
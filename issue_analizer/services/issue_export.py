@@ -0,0 +1,87 @@
+import csv
+import json
+import zlib
+
+from issue_analizer.serializers import IssueValuesSerializer
+
+
+class _Line:
+    """Буфер для csv.writer: writerow возвращает готовую строку"""
+
+    def write(self, value):
+        return value
+
+
+class IssueExporter:
+    """Потоковая выгрузка проблем с занятиями в NDJSON или CSV.
+
+    Строки читаются серверным курсором (iterator), склеиваются в блоки и при
+    необходимости сжимаются gzip на лету — память не зависит от размера выгрузки.
+    """
+
+    CONTENT_TYPES = {
+        "ndjson": "application/x-ndjson; charset=utf-8",
+        "csv": "text/csv; charset=utf-8",
+    }
+    CHUNK_SIZE = 2000  # Строк за одно чтение из курсора
+    BLOCK_SIZE = 64 * 1024  # Размер отдаваемого блока, символов
+
+    def __init__(self, export_format):
+        if export_format not in self.CONTENT_TYPES:
+            raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+        self.format = export_format
+
+    @property
+    def content_type(self):
+        return self.CONTENT_TYPES[self.format]
+
+    def rows(self, queryset):
+        return IssueValuesSerializer.values(queryset).order_by("id").iterator(chunk_size=self.CHUNK_SIZE)
+
+    def lines(self, rows):
+        """Строки выгрузки: NDJSON — JSON проблемы как в API, CSV — плоские колонки с заголовком"""
+        to_representation = IssueValuesSerializer.to_representation
+        if self.format == "ndjson":
+            for row in rows:
+                yield json.dumps(to_representation(row), ensure_ascii=False) + "\n"
+            return
+
+        writer = csv.writer(_Line())
+        relations = IssueValuesSerializer.EVENT_RELATIONS
+        event_fields = IssueValuesSerializer.EVENT_FIELDS
+        yield writer.writerow(["id", "issue_type", "description", "detected_at"] + [
+            f"{relation}_{field}" for relation in relations for field in event_fields
+        ])
+        for row in rows:
+            issue = to_representation(row)
+            yield writer.writerow(
+                [issue["id"], issue["issue_type"], issue["description"], issue["detected_at"]]
+                + [issue[relation][field] for relation in relations for field in event_fields]
+            )
+
+    def blocks(self, lines):
+        """Склеивает строки в блоки по BLOCK_SIZE и кодирует в UTF-8"""
+        block, size = [], 0
+        for line in lines:
+            block.append(line)
+            size += len(line)
+            if size >= self.BLOCK_SIZE:
+                yield "".join(block).encode()
+                block, size = [], 0
+        if block:
+            yield "".join(block).encode()
+
+    @staticmethod
+    def gzip(blocks):
+        """Сжимает поток блоков в формат gzip"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for block in blocks:
+            compressed = compressor.compress(block)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def stream(self, queryset, compress=False):
+        """Итератор байтов выгрузки для StreamingHttpResponse"""
+        blocks = self.blocks(self.lines(self.rows(queryset)))
+        return self.gzip(blocks) if compress else blocks
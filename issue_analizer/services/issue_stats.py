@@ -0,0 +1,108 @@
+import re
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncWeek
+from django.utils.timezone import now
+
+from issue_analizer.models import IssueStat, ScheduleIssue
+from .issue_writer import truncate_text
+
+
+class IssueStats:
+    """Материализованная статистика проблем для /api/issues/stats (таблица IssueStat).
+
+    Пересчитывается после каждой записи проблем несколькими агрегирующими запросами,
+    поэтому чтение не зависит от числа проблем. Разрезы — по первому занятию проблемы,
+    как фильтры /api/issueslist. Для каждого значения хранится строка по каждой категории
+    и строка по всем категориям (category="").
+    """
+
+    DIMENSIONS = ("category", "group", "teacher", "building", "week")
+    ORDERINGS = ("count", "key")
+    BATCH_SIZE = 2000
+
+    # Аудитория МИРЭА: "А-419 (В-78)" — корпус А кампуса В-78
+    ROOM = re.compile(r"^\s*(?P<building>[^\s()-]+)-[^\s()]+\s*(?P<campus>\([^()]*\))?\s*$")
+
+    @classmethod
+    def building(cls, location):
+        """Корпус аудитории: "А-419 (В-78)" → "А (В-78)"; нестандартные названия — как есть"""
+        match = cls.ROOM.match(location or "")
+        if not match:
+            return (location or "").strip()
+        return f"{match['building']} {match['campus']}" if match["campus"] else match["building"]
+
+    @classmethod
+    def count_rows(cls):
+        """Выдаёт (разрез, значение, категория, число проблем) по текущим проблемам"""
+        issues = ScheduleIssue.objects.values("issue_type__name")
+        for category, count in issues.annotate(count=Count("id")).values_list("issue_type__name", "count"):
+            yield "category", category, category, count
+
+        for dimension, field in (("group", "related_event__group"), ("teacher", "related_event__teacher")):
+            rows = issues.values_list(field, "issue_type__name").annotate(count=Count("id")).order_by()
+            for key, category, count in rows:
+                yield dimension, key or "", category, count
+
+        # Корпус выделяется из аудитории в Python: агрегируем по аудиториям, затем суммируем
+        rows = issues.values_list("related_event__location", "issue_type__name").annotate(count=Count("id")).order_by()
+        for location, category, count in rows:
+            yield "building", cls.building(location), category, count
+
+        rows = (issues.annotate(week=TruncWeek("related_event__start_time")).values_list("week", "issue_type__name")
+                .annotate(count=Count("id")).order_by())
+        for week, category, count in rows:
+            yield "week", week.date().isoformat(), category, count
+
+    @classmethod
+    def rebuild(cls):
+        """Пересчитывает статистику и заменяет её в одной транзакции. Возвращает число строк"""
+        counts = {}
+        for dimension, key, category, count in cls.count_rows():
+            key = truncate_text(key, 255)
+            for row_category in (category, ""):
+                row = (dimension, key, row_category)
+                counts[row] = counts.get(row, 0) + count
+
+        computed_at = now()
+        with transaction.atomic():
+            IssueStat.objects.all().delete()
+            IssueStat.objects.bulk_create(
+                (IssueStat(dimension=dimension, key=key, category=category, count=count, computed_at=computed_at)
+                 for (dimension, key, category), count in counts.items()),
+                batch_size=cls.BATCH_SIZE,
+            )
+        return len(counts)
+
+    @classmethod
+    def top(cls, dimension, category="", search=None, order="count", limit=100):
+        """Значения разреза с числом проблем (для category="" — с разбивкой по категориям).
+
+        search — подстрока значения, order — count (по убыванию числа) или key (по значению,
+        например недели по порядку). Возвращает {"computed_at", "total", "results"}.
+        """
+        rows = IssueStat.objects.filter(dimension=dimension, category=category)
+        if search:
+            rows = rows.filter(key__icontains=search)
+        ordering = ("-count", "key") if order == "count" else ("key",)
+        top = list(rows.order_by(*ordering).values_list("key", "count", "computed_at")[:limit])
+
+        breakdown = {}
+        if not category and top:
+            categories = (IssueStat.objects.filter(dimension=dimension, key__in=[key for key, _, _ in top])
+                          .exclude(category="").values_list("key", "category", "count"))
+            for key, row_category, count in categories:
+                breakdown.setdefault(key, {})[row_category] = count
+
+        totals = IssueStat.objects.filter(dimension="category", category="")
+        if category:
+            totals = totals.filter(key=category)
+        return {
+            "computed_at": top[0][2] if top else None,
+            "total": totals.aggregate(total=Sum("count"))["total"] or 0,
+            "results": [
+                {"key": key, "count": count, **({} if category else {"categories": breakdown.get(key, {})})}
+                for key, count, _ in top
+            ],
+        }
@@ -0,0 +1,208 @@
+import time
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from issue_analizer.models import IssueCategory, ScheduleEvent, ScheduleIssue
+from .schedule_analyzer import ScheduleAnalyzer, EVENT_FIELDS
+
+
+def truncate_text(text, max_length=255):
+    text = str(text)
+    if len(text) > max_length:
+        return text[:max_length]
+    return text
+
+
+class IssueWriter:
+    """Пакетная запись проблем в БД: кэш категорий, дедупликация занятий, bulk_create пачками"""
+
+    BATCH_SIZE = 2000
+
+    def __init__(self, batch_size=None, metrics=None):
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.metrics = metrics  # RefreshMetrics: время и число строк в этапе write
+        self._categories = {}
+
+    def category_ids(self, names):
+        """Возвращает {название: id}, создавая недостающие категории одним запросом"""
+        missing = set(names) - self._categories.keys()
+        if missing:
+            self._categories.update(
+                IssueCategory.objects.filter(name__in=missing).values_list("name", "id")
+            )
+            missing -= self._categories.keys()
+        if missing:
+            IssueCategory.objects.bulk_create(
+                [IssueCategory(name=name) for name in missing], ignore_conflicts=True
+            )
+            self._categories.update(
+                IssueCategory.objects.filter(name__in=missing).values_list("name", "id")
+            )
+        return self._categories
+
+    @staticmethod
+    def event_key(issue, prefix="", suffix=""):
+        """Ключ занятия для дедупликации: все поля после обрезки"""
+        values = []
+        for field in EVENT_FIELDS:
+            value = issue[prefix + field + suffix]
+            values.append(value if field in ("start", "end") else truncate_text(value, 255))
+        return tuple(values)
+
+    def create(self, issues):
+        """Сохраняет проблемы. Одинаковые занятия записываются один раз. Возвращает число проблем"""
+        issues = list(issues)
+        if not issues:
+            return 0
+
+        categories = self.category_ids({issue["category"] for issue in issues})
+
+        events = {}
+        pairs = []
+        for issue in issues:
+            keys = (self.event_key(issue), self.event_key(issue, "related_", "_2"))
+            for key in keys:
+                if key not in events:
+                    summary, start, end, location, teacher, group, discipline = key
+                    events[key] = ScheduleEvent(
+                        summary=summary,
+                        start_time=start,
+                        end_time=end,
+                        location=location,
+                        teacher=teacher,
+                        group=group,
+                        discipline=discipline,
+                    )
+            pairs.append(keys)
+
+        ScheduleEvent.objects.bulk_create(events.values(), batch_size=self.batch_size)
+        if self.metrics:
+            self.metrics.count("write", events=len(events))
+
+        updated = now()
+        ScheduleIssue.objects.bulk_create(
+            (
+                ScheduleIssue(
+                    issue_type_id=categories[issue["category"]],
+                    related_event_id=events[first].pk,
+                    related_event_2_id=events[second].pk,
+                    description=truncate_text(issue["description"], 255),
+                    fingerprint=ScheduleAnalyzer.fingerprint(issue),
+                    last_updated=updated,
+                )
+                for issue, (first, second) in zip(issues, pairs)
+            ),
+            batch_size=self.batch_size,
+            # Ту же проблему могло только что записать пересекающееся обновление: пропускаем её
+            # (оставшиеся без проблем занятия удалит полное обновление)
+            ignore_conflicts=True,
+        )
+        return len(issues)
+
+    def delete(self, issue_ids):
+        """Удаляет проблемы пачками вместе с занятиями, на которые больше никто не ссылается"""
+        issue_ids = list(issue_ids)
+        for start in range(0, len(issue_ids), self.batch_size):
+            batch = issue_ids[start:start + self.batch_size]
+            event_ids = set()
+            for first_id, second_id in ScheduleIssue.objects.filter(id__in=batch).values_list(
+                    "related_event_id", "related_event_2_id"):
+                event_ids.update((first_id, second_id))
+            ScheduleIssue.objects.filter(id__in=batch).delete()
+            ScheduleEvent.objects.filter(
+                id__in=event_ids, related_event__isnull=True, related_event_2__isnull=True
+            ).delete()
+        return len(issue_ids)
+
+    def sync(self, issues, groups=None, categories=None, keep_groups=None):
+        """Приводит проблемы в БД к найденным: добавляет новые и удаляет исчезнувшие.
+
+        groups — множество групп, в пределах которых выполняется сравнение (None — вся база),
+        categories — то же для категорий проблем, keep_groups — группы, проблемы которых
+        не трогаются (их календари не загрузились). Возвращает (created, deleted).
+        """
+        started = time.monotonic()
+        found = {ScheduleAnalyzer.fingerprint(issue): issue for issue in issues}
+        keep = {truncate_text(group, 255) for group in keep_groups or ()}
+        if keep:
+            found = {fingerprint: issue for fingerprint, issue in found.items()
+                     if truncate_text(issue["group"], 255) not in keep}
+
+        with transaction.atomic():
+            existing = ScheduleIssue.objects.all()
+            if groups is not None:
+                existing = existing.filter(related_event__group__in=[truncate_text(group, 255) for group in groups])
+            if categories is not None:
+                existing = existing.filter(issue_type__name__in=categories)
+            if keep:
+                existing = existing.exclude(related_event__group__in=keep)
+
+            known = set()
+            stale_ids = []
+            for issue_id, fingerprint in existing.values_list("id", "fingerprint").iterator():
+                if fingerprint in found and fingerprint not in known:
+                    known.add(fingerprint)
+                else:
+                    stale_ids.append(issue_id)  # Исчезнувшие проблемы и дубликаты
+
+            # Найденные снова проблемы подтверждены этим обновлением (удаляемые обновятся зря, но одним запросом)
+            if known:
+                existing.update(last_updated=now())
+            created = self.create(issue for fingerprint, issue in found.items() if fingerprint not in known)
+            deleted = self.delete(stale_ids)
+            if groups is None and categories is None:
+                # Полное обновление: заодно удаляем занятия, оставшиеся от прошлых версий
+                ScheduleEvent.objects.filter(related_event__isnull=True, related_event_2__isnull=True).delete()
+
+        if self.metrics:
+            self.metrics.add("write", time.monotonic() - started, created=created, deleted=deleted)
+        return created, deleted
+
+    def touch(self, keep_groups=None, categories=None):
+        """Отмечает все проблемы, кроме групп keep_groups, подтверждёнными сейчас (last_updated).
+
+        Нужен инкрементальному обновлению: проблемы неизменившихся календарей не синхронизируются.
+        categories — только проблемы этих категорий (те, что обновление действительно проверяло).
+        """
+        issues = ScheduleIssue.objects.all()
+        if categories is not None:
+            issues = issues.filter(issue_type__name__in=categories)
+        if keep_groups:
+            issues = issues.exclude(related_event__group__in=[truncate_text(group, 255) for group in keep_groups])
+        return issues.update(last_updated=now())
+
+    @staticmethod
+    def vanished_groups(groups, keep_groups=None):
+        """Группы с проблемами в БД, которых нет среди groups (и keep_groups): их календари исчезли"""
+        present = {truncate_text(group, 255) for group in (*groups, *(keep_groups or ()))}
+        stored = ScheduleIssue.objects.values_list("related_event__group", flat=True).distinct()
+        return set(stored) - present
+
+    def sync_chunks(self, chunks, categories=None, on_sync=None):
+        """Потоковая синхронизация: chunks выдаёт пары (groups, issues) по одному календарю.
+
+        Проблемы копятся до размера пачки и записываются вместе, поэтому в памяти
+        одновременно находится не больше одной пачки. on_sync() вызывается после записи
+        каждой пачки. Возвращает (created, deleted).
+        """
+        created = deleted = 0
+        groups, issues = set(), []
+
+        for chunk_groups, chunk_issues in chunks:
+            groups.update(chunk_groups)
+            issues.extend(chunk_issues)
+            if len(issues) >= self.batch_size or len(groups) >= self.batch_size:
+                chunk_created, chunk_deleted = self.sync(issues, groups, categories)
+                created, deleted = created + chunk_created, deleted + chunk_deleted
+                groups, issues = set(), []
+                if on_sync:
+                    on_sync()
+
+        if groups:
+            chunk_created, chunk_deleted = self.sync(issues, groups, categories)
+            created, deleted = created + chunk_created, deleted + chunk_deleted
+            if on_sync:
+                on_sync()
+
+        return created, deleted
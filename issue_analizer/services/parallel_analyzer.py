@@ -0,0 +1,108 @@
+import billiard
+
+from .event_table import EventTable, select_groups, select_window
+from .rule_engine import RuleEngine
+from .schedule_analyzer import ScheduleAnalyzer
+from .schedule_service import ScheduleService
+
+
+def _fetch_shard(args):
+    links, options = args
+    return ScheduleService.fetch_icals(links, **options)
+
+
+def _analyze_shard(args):
+    events, engine, rules = args
+    return ScheduleAnalyzer.find_issues(events, engine=engine, rules=rules), rules.timings
+
+
+def _pool_map(function, payloads, processes):
+    """Выполняет function для каждого payload в пуле процессов, сохраняя порядок.
+
+    Каждая часть — отдельный apply_async: при pool.map billiard учитывает доставку
+    результата только для одного процесса, и остальные ждут ~30 с перед выходом.
+    """
+    pool = billiard.Pool(processes)
+    try:
+        jobs = [pool.apply_async(function, (payload,)) for payload in payloads]
+        return [job.get() for job in jobs]
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _group_order(events):
+    """Группы в порядке первого появления (так их перебирает ScheduleAnalyzer)"""
+    if isinstance(events, EventTable):
+        return [events.strings[group_id] for group_id in dict.fromkeys(events.group)]
+    return list(dict.fromkeys(event["group"] for event in events))
+
+
+class ParallelAnalyzer:
+    """Многопроцессная обработка расписания, разбитого на части.
+
+    Используется пул billiard: в отличие от multiprocessing он может создавать дочерние
+    процессы внутри prefork-воркера Celery. Результаты совпадают с последовательным
+    выполнением, включая порядок.
+    """
+
+    @staticmethod
+    def fetch_icals(ical_urls, processes, workers=None, per_host=None, **options):
+        """Загрузка и разбор календарей: ссылки делятся на непрерывные части по процессам,
+        в каждом процессе работает свой пул потоков. Результаты — в исходном порядке.
+        """
+        ical_urls = list(ical_urls)
+        processes = max(1, min(processes, len(ical_urls)))
+        size = -(-len(ical_urls) // processes)
+        options = dict(options)
+        options["workers"] = max(1, (workers or ScheduleService.FETCH_WORKERS) // processes)
+        options["per_host"] = max(1, (per_host or ScheduleService.PER_HOST_LIMIT) // processes)
+
+        shards = [(ical_urls[start:start + size], options) for start in range(0, len(ical_urls), size)]
+        shard_results = _pool_map(_fetch_shard, shards, processes)
+        return [result for results in shard_results for result in results]
+
+    @staticmethod
+    def shard_groups(events, shards):
+        """Распределяет группы по частям, выравнивая число занятий (жадно, от крупных групп)"""
+        sizes = {}
+        if isinstance(events, EventTable):
+            for group_id in events.group:
+                sizes[group_id] = sizes.get(group_id, 0) + 1
+            sizes = {events.strings[group_id]: size for group_id, size in sizes.items()}
+        else:
+            for event in events:
+                sizes[event["group"]] = sizes.get(event["group"], 0) + 1
+
+        buckets = [(0, index, set()) for index in range(shards)]
+        for group, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            load, index, groups = min(buckets)
+            groups.add(group)
+            buckets[index] = (load + size, index, groups)
+        return [groups for _, _, groups in buckets if groups]
+
+    @staticmethod
+    def find_issues(events, processes, engine=None, window=None, rules=None):
+        """То же, что ScheduleAnalyzer.find_issues, но группы анализируются в нескольких процессах.
+
+        Время правил из процессов суммируется в rules.timings.
+        """
+        if window is not None:
+            events = select_window(events, window)
+        rules = rules or RuleEngine()
+        group_order = _group_order(events)
+        shards = ParallelAnalyzer.shard_groups(events, processes)
+        if len(shards) < 2:
+            return ScheduleAnalyzer.find_issues(events, engine=engine, rules=rules)
+
+        payloads = [(select_groups(events, groups), engine, rules) for groups in shards]
+        shard_results = _pool_map(_analyze_shard, payloads, len(shards))
+
+        # Склеиваем в порядке последовательного анализа: группы по первому появлению
+        issues_by_group = {}
+        for issues, timings in shard_results:
+            for name, seconds in timings.items():
+                rules.timings[name] += seconds
+            for issue in issues:
+                issues_by_group.setdefault(issue["group"], []).append(issue)
+        return [issue for group in group_order for issue in issues_by_group.get(group, ())]
@@ -0,0 +1,108 @@
+import redis
+
+
+class RefreshCoordinator:
+    """Объединяет запросы на обновление расписания в одно глобальное обновление.
+
+    Активное обновление — ключ ACTIVE_KEY с id задачи, который захватывается атомарно
+    вместе с очисткой списка ожидающих (WATCH и MULTI/EXEC). Запросы, пришедшие во время
+    обновления, присоединяются к нему и встают в список ожидающих: N одновременных
+    запросов — одно обновление.
+    scope — отдельная блокировка, например точечного обновления одной группы.
+    """
+
+    ACTIVE_KEY = "schedule_refresh:active"
+    WAITERS_KEY = "schedule_refresh:waiters"
+    LOCK_TTL = 3600  # Страховка на случай, если задача не сняла блокировку
+
+    def __init__(self, redis_client, ttl=None, scope=None):
+        self.redis = redis_client
+        self.ttl = ttl or self.LOCK_TTL
+        suffix = f":{scope}" if scope else ""
+        self.active_key = self.ACTIVE_KEY + suffix
+        self.waiters_key = self.WAITERS_KEY + suffix
+
+    def active(self):
+        """id задачи текущего обновления или None"""
+        return self.redis.get(self.active_key)
+
+    def depth(self):
+        """Сколько запросов ждут текущее обновление"""
+        return self.redis.llen(self.waiters_key)
+
+    def waiters(self):
+        return self.redis.lrange(self.waiters_key, 0, -1)
+
+    def scoped(self, is_finished=None):
+        """{scope: id задачи} активных обновлений со своей блокировкой.
+
+        is_finished(task_id) позволяет снять блокировки задач, которые уже завершились.
+        """
+        prefix = self.ACTIVE_KEY + ":"
+        keys = list(self.redis.scan_iter(match=prefix + "*"))
+        values = self.redis.mget(keys) if keys else []
+        scoped = {key[len(prefix):]: task_id for key, task_id in zip(keys, values) if task_id}
+        if is_finished:
+            for scope, task_id in list(scoped.items()):
+                if is_finished(task_id) and RefreshCoordinator(self.redis, scope=scope).release(task_id):
+                    del scoped[scope]
+        return scoped
+
+    def claim(self, task_id):
+        """Пытается стать активным обновлением, не вставая в очередь. Возвращает True при успехе"""
+        return self._claim(task_id)[0]
+
+    def _claim(self, task_id):
+        """Захватывает свободную блокировку: (успех, id активной задачи или None).
+
+        Захват и очистка списка ожидающих — одна транзакция MULTI/EXEC: запрос, который
+        присоединился к новому обновлению сразу после захвата, не удаляется из очереди.
+        """
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(self.active_key)
+                active = pipe.get(self.active_key)
+                if active is not None:
+                    pipe.unwatch()
+                    return False, active
+                pipe.multi()
+                pipe.set(self.active_key, task_id, ex=self.ttl)
+                pipe.delete(self.waiters_key)
+                pipe.execute()
+                return True, task_id
+            except redis.WatchError:
+                return False, None  # Блокировку захватили между командами
+
+    def request(self, task_id, query="", is_finished=None):
+        """Запрос на обновление. Возвращает (id задачи, позиция в очереди, нужно ли её запустить).
+
+        Если обновления нет, task_id атомарно становится активным (позиция 0) и задачу
+        должен запустить вызывающий. Иначе запрос присоединяется к текущему обновлению.
+        is_finished(task_id) позволяет снять блокировку задачи, которая уже завершилась.
+        """
+        while True:
+            claimed, active = self._claim(task_id)
+            if claimed:
+                return task_id, 0, True
+            if active is None:
+                continue  # Блокировку захватили между командами — узнаём, кто
+            if is_finished and is_finished(active):
+                self.release(active)
+                continue
+            position = self.redis.rpush(self.waiters_key, query)
+            return active, position, False
+
+    def release(self, task_id):
+        """Снимает блокировку, только если она принадлежит task_id (сравнение и удаление атомарны)"""
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(self.active_key)
+                if pipe.get(self.active_key) != task_id:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.delete(self.active_key, self.waiters_key)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False  # Блокировку уже перехватили
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RefreshMetrics:
+    """Метрики этапов обновления расписания: время, число вызовов и счётчики (байты, занятия, строки).
+
+    Этапы: catalog (страницы каталога), fetch (ожидание календарей), download и parse
+    (по каждому календарю, в потоках загрузки), analyze, rule_<имя> (правила анализа),
+    write, publish, total.
+    Последний запуск и накопленные итоги хранятся в Redis для /api/schedule/metrics.
+    """
+
+    LAST_KEY = "schedule_metrics:last"
+    TOTALS_KEY = "schedule_metrics:totals"
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds=0.0, calls=1, **counts):
+        """Учитывает вызов этапа длительностью seconds и его счётчики"""
+        with self._lock:
+            values = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+            values["calls"] += calls
+            values["seconds"] += seconds
+            values["max_seconds"] = max(values["max_seconds"], seconds)
+            for name, value in counts.items():
+                values[name] = values.get(name, 0) + value
+
+    def count(self, stage, **counts):
+        """Только счётчики этапа, без времени и вызова"""
+        self.add(stage, calls=0, **counts)
+
+    @contextmanager
+    def measure(self, stage, **counts):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(stage, time.monotonic() - started, **counts)
+
+    def timed(self, stage, items):
+        """Итератор по items, время получения элементов которого учитывается в этапе stage"""
+        iterator = iter(items)
+        count, seconds = 0, 0.0
+        while True:
+            started = time.monotonic()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.monotonic() - started
+            count += 1
+            yield item
+        self.add(stage, seconds, items=count)
+
+    def record_fetch(self, result):
+        """Учитывает загрузку и разбор одного календаря (FetchResult)"""
+        self.add("download", max(0.0, result.elapsed - result.parse_time),
+                 bytes=result.size, attempts=result.attempts, failed=int(not result.ok))
+        if result.parse_time:
+            self.add("parse", result.parse_time, events=len(result.events))
+
+    def record_rules(self, timings):
+        """Учитывает время правил анализа (RuleEngine.timings) как этапы rule_<имя>"""
+        for name, seconds in timings.items():
+            self.add(f"rule_{name}", seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                stage: {name: round(value, 3) if isinstance(value, float) else value for name, value in values.items()}
+                for stage, values in self.stages.items()
+            }
+
+    def save(self, redis_client, mode="full", status="ok"):
+        """Сохраняет запуск как последний и добавляет его к накопленным итогам"""
+        stages = self.as_dict()
+        last = {"mode": mode, "status": status, "finished_at": time.time(), "stages": stages}
+        with redis_client.pipeline() as pipe:
+            pipe.set(self.LAST_KEY, json.dumps(last))
+            pipe.hincrby(self.TOTALS_KEY, f"runs:{mode}:{status}", 1)
+            for stage, values in stages.items():
+                for name, value in values.items():
+                    if name != "max_seconds":
+                        pipe.hincrbyfloat(self.TOTALS_KEY, f"{stage}:{name}", value)
+            pipe.execute()
+        return last
+
+    @classmethod
+    def load(cls, redis_client):
+        """{"last": последний запуск или None, "runs": {...}, "totals": {этап: {счётчик: значение}}}"""
+        with redis_client.pipeline() as pipe:
+            pipe.get(cls.LAST_KEY)
+            pipe.hgetall(cls.TOTALS_KEY)
+            last, totals = pipe.execute()
+
+        runs, stages = {}, {}
+        for field, value in totals.items():
+            value = float(value)
+            if field.startswith("runs:"):
+                _, mode, status = field.split(":", 2)
+                runs.setdefault(mode, {})[status] = int(value)
+            else:
+                stage, name = field.split(":", 1)
+                stages.setdefault(stage, {})[name] = int(value) if value.is_integer() else round(value, 3)
+        return {"last": json.loads(last) if last else None, "runs": runs, "totals": stages}
+
+    @staticmethod
+    def prometheus(data):
+        """Метрики из load() в текстовом формате Prometheus"""
+        metrics = {}
+
+        def sample(name, kind, labels, value):
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            metrics.setdefault((name, kind), []).append(f"{name}{{{label_text}}} {value}")
+
+        for mode, statuses in data["runs"].items():
+            for status, value in statuses.items():
+                sample("schedule_refresh_runs_total", "counter", {"mode": mode, "status": status}, value)
+        for stage, values in data["totals"].items():
+            for name, value in values.items():
+                sample(f"schedule_refresh_stage_{name}_total", "counter", {"stage": stage}, value)
+
+        last = data["last"]
+        if last:
+            labels = {"mode": last["mode"], "status": last["status"]}
+            sample("schedule_refresh_last_finished_timestamp_seconds", "gauge", labels, round(last["finished_at"], 3))
+            for stage, values in last["stages"].items():
+                for name, value in values.items():
+                    sample(f"schedule_refresh_last_stage_{name}", "gauge", {"stage": stage}, value)
+
+        lines = []
+        for (name, kind), samples in metrics.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,55 @@
+from urllib.parse import parse_qs
+
+
+class RefreshPlanner:
+    """Выбор календарей для частичного (горячего) обновления между полными.
+
+    Приоритет календаря группы — как часто он менялся (счётчик с затуханием после
+    каждого полного обновления) и как часто группу запрашивают в /api/issueslist.
+    """
+
+    CHANGES_KEY = "schedule_refresh:changes"
+    DECAY = 0.5  # Во сколько раз уменьшаются счётчики изменений после полного обновления
+    POPULARITY_WEIGHT = 0.1  # Вес одного запроса группы относительно одного изменения календаря
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def record(self, results):
+        """Учитывает, какие календари изменились (FetchResult)"""
+        with self.redis.pipeline() as pipe:
+            for result in results:
+                if result.ok and result.changed:
+                    pipe.zincrby(self.CHANGES_KEY, 1, result.url)
+            pipe.execute()
+
+    def decay(self):
+        """Затухание счётчиков: давние изменения весят меньше свежих"""
+        self.redis.zunionstore(self.CHANGES_KEY, {self.CHANGES_KEY: self.DECAY})
+
+    @staticmethod
+    def group_popularity(popular_filters):
+        """{фильтр группы в верхнем регистре: число запросов} из фильтров популярных запросов списка"""
+        popularity = {}
+        for filters, score in popular_filters:
+            for group in parse_qs(filters).get("group", ()):
+                group = group.strip().upper()
+                if group:
+                    popularity[group] = popularity.get(group, 0) + score
+        return popularity
+
+    def rank(self, catalog, limit, popular_filters=()):
+        """Ссылки самых приоритетных календарей из каталога (записи fetch_schedule) — не больше limit"""
+        changes = dict(self.redis.zrange(self.CHANGES_KEY, 0, -1, withscores=True))
+        popularity = self.group_popularity(popular_filters)
+
+        scored = []
+        for schedule in catalog:
+            link = schedule["iCalLink"]
+            title = str(schedule.get("targetTitle", "")).upper()
+            requests = sum(count for group, count in popularity.items() if title and group in title)
+            score = changes.get(link, 0) + self.POPULARITY_WEIGHT * requests
+            if score > 0:
+                scored.append((score, link))
+        scored.sort(key=lambda item: -item[0])
+        return [link for _, link in scored[:limit]]
@@ -0,0 +1,94 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode
+
+
+class IssueListCache:
+    """Кэш ответов /api/issueslist в Redis с номером поколения данных.
+
+    Поколение увеличивается после каждого обновления проблем в БД. Оно входит в ключ,
+    поэтому ответы, сохранённые до обновления, больше не отдаются и истекают по TTL.
+    """
+
+    KEY_PREFIX = "issues_list:"
+    GENERATION_KEY = "issues_list:generation"
+    REFRESHED_KEY = "issues_list:refreshed_at"  # Время последнего полного обновления (Unix)
+    POPULAR_KEY = "issues_list:popular"  # Частота запросов первых страниц по фильтрам (для прогрева)
+    POPULAR_LIMIT = 1000  # Сколько фильтров хранится в популярности, редкие вытесняются
+    POPULAR_TTL = 7 * 24 * 3600
+    TTL = 3600
+
+    def __init__(self, redis_client, ttl=None):
+        self.redis = redis_client
+        self.ttl = ttl or self.TTL
+
+    @staticmethod
+    def normalize(group=None, teacher=None):
+        """Фильтры без пробелов по краям и без учёта регистра (поиск по ним регистронезависимый)"""
+        return (group or "").strip().upper() or None, (teacher or "").strip().lower() or None
+
+    @classmethod
+    def filters(cls, group=None, teacher=None):
+        """Строка фильтров запроса (group=...&teacher=...) — ключ кэша и элемент популярности"""
+        group, teacher = cls.normalize(group, teacher)
+        return urlencode([(name, value) for name, value in (("group", group), ("teacher", teacher)) if value])
+
+    @staticmethod
+    def parse_filters(filters):
+        """(group, teacher) из строки фильтров"""
+        params = dict(parse_qsl(filters))
+        return params.get("group"), params.get("teacher")
+
+    def key(self, generation, filters, cursor):
+        digest = hashlib.md5(f"{filters}\x1f{cursor or ''}".encode()).hexdigest()
+        return f"{self.KEY_PREFIX}{generation}:{digest}"
+
+    def generation(self):
+        return int(self.redis.get(self.GENERATION_KEY) or 0)
+
+    def refreshed_at(self):
+        """Время последнего полного обновления (Unix) или None"""
+        value = self.redis.get(self.REFRESHED_KEY)
+        return float(value) if value else None
+
+    def get(self, filters, cursor=None, count=True):
+        """Возвращает (поколение, время полного обновления, закэшированная страница или None).
+
+        filters — строка фильтров (см. filters), cursor — страница, count — учесть запрос
+        первой страницы в популярности. Страница — словарь next и previous (курсоры соседних
+        страниц, пустая строка — нет страницы) и body (JSON без ссылок).
+        """
+        with self.redis.pipeline() as pipe:
+            pipe.get(self.GENERATION_KEY)
+            pipe.get(self.REFRESHED_KEY)
+            if count and not cursor:
+                pipe.zincrby(self.POPULAR_KEY, 1, filters)
+                pipe.zremrangebyrank(self.POPULAR_KEY, 0, -self.POPULAR_LIMIT - 1)
+                pipe.expire(self.POPULAR_KEY, self.POPULAR_TTL)
+            generation, refreshed_at = pipe.execute()[:2]
+        generation = int(generation or 0)
+        refreshed_at = float(refreshed_at) if refreshed_at else None
+        page = self.redis.hgetall(self.key(generation, filters, cursor))
+        return generation, refreshed_at, page or None
+
+    def set(self, generation, filters, cursor, page):
+        """Сохраняет страницу: словарь next, previous и body (см. get)"""
+        key = self.key(generation, filters, cursor)
+        with self.redis.pipeline() as pipe:
+            pipe.hset(key, mapping={name: value or "" for name, value in page.items()})
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def bump(self, refreshed_at=None):
+        """Новое поколение данных: вызывается после записи проблем в БД.
+
+        refreshed_at — время завершения полного обновления (для частичного не передаётся).
+        """
+        with self.redis.pipeline() as pipe:
+            pipe.incr(self.GENERATION_KEY)
+            if refreshed_at is not None:
+                pipe.set(self.REFRESHED_KEY, refreshed_at)
+            return pipe.execute()[0]
+
+    def popular(self, limit, with_scores=False):
+        """Фильтры самых частых запросов первых страниц (с числом запросов, если with_scores)"""
+        return self.redis.zrevrange(self.POPULAR_KEY, 0, limit - 1, withscores=with_scores)
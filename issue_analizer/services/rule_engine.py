@@ -0,0 +1,219 @@
+import time
+
+from .event_table import IssueRef
+
+# Что нужно правилу для проверки
+PAIR = "pair"  # Два соседних занятия дня группы
+DAY = "day"  # Все занятия дня группы, по времени начала
+OVERLAP = "overlap"  # Пересекающиеся по времени занятия одной сущности (преподавателя, аудитории, группы)
+
+RULES = {}  # Зарегистрированные правила: {имя: класс}
+
+
+def register(rule_class):
+    """Декоратор: регистрирует правило под его именем"""
+    if rule_class.name in RULES:
+        raise ValueError(f"Правило {rule_class.name} уже зарегистрировано")
+    RULES[rule_class.name] = rule_class
+    return rule_class
+
+
+class Rule:
+    """Правило анализа. Пороги — атрибуты класса, их можно переопределить при создании"""
+    name = ""  # Имя в реестре и в настройке SCHEDULE_RULES
+    category = ""  # Категория найденных проблем
+    needs = None
+
+    def __init__(self, **params):
+        for param, value in params.items():
+            if param.startswith("_") or not hasattr(type(self), param):
+                raise ValueError(f"У правила {self.name} нет параметра {param}")
+            setattr(self, param, value)
+
+
+class PairRule(Rule):
+    """Правило для пары соседних занятий дня группы. gap — перерыв между ними, с"""
+    needs = PAIR
+
+    def matches(self, table, first, second, gap):
+        raise NotImplementedError
+
+    def mask(self, pairs):
+        """Векторизованный matches для движка numpy (PairColumns) или None — проверять по одной паре"""
+        return None
+
+    def describe(self, table, first, second, gap):
+        raise NotImplementedError
+
+
+class DayRule(Rule):
+    """Правило для всего дня группы"""
+    needs = DAY
+
+    def check_day(self, table, rows):
+        """Выдаёт IssueRef по индексам занятий дня, отсортированным по началу"""
+        raise NotImplementedError
+
+
+class OverlapRule(Rule):
+    """Правило для пересекающихся занятий одной сущности.
+
+    key — поле сущности, identity — поля, по которым пересечение считается разными
+    занятиями (одинаковые занятия из разных календарей схлопываются).
+    """
+    needs = OVERLAP
+    key = ""
+    identity = ()
+
+    def matches(self, table, first, second):
+        return True
+
+    def describe(self, table, first, second):
+        raise NotImplementedError
+
+
+def sweep_overlaps(table, key_field, identity_fields):
+    """Сканирующая прямая по индексу key_field: выдаёт пары пересекающихся по времени занятий.
+
+    Одно и то же занятие приходит из календарей группы, преподавателя и аудитории, а поточная
+    лекция — отдельной записью для каждой группы. Поэтому занятия сначала схлопываются по
+    (ключ, время, identity_fields), а пересечением считается пара, у которой
+    identity_fields различаются. Сложность O(n log n + k), k — число пересечений.
+    """
+    keys = getattr(table, key_field)
+    starts, ends = table.start, table.end
+    identity = [getattr(table, field) for field in identity_fields]
+    empty = table.string_id("")
+
+    representatives = {}
+    for index, key in enumerate(keys):
+        if key == empty:
+            continue
+        lesson = (key, starts[index], ends[index], *(column[index] for column in identity))
+        representatives.setdefault(lesson, index)
+
+    rows = sorted(representatives.values(), key=lambda index: (keys[index], starts[index], ends[index], index))
+
+    active = []  # Занятия текущего ключа, ещё не закончившиеся к началу очередного
+    current_key = None
+    for index in rows:
+        if keys[index] != current_key:
+            current_key, active = keys[index], []
+        active = [other for other in active if ends[other] > starts[index]]
+        for other in active:
+            if any(column[other] != column[index] for column in identity):
+                yield other, index
+        active.append(index)
+
+
+def check_days(table, rows, day_rules, timings, offset=0):
+    """Проверяет день группы правилами DAY. Выдаёт (позиция в дне, номер правила, IssueRef)"""
+    positions = {row: position for position, row in enumerate(rows)}
+    for rule_index, rule in enumerate(day_rules, offset):
+        started = time.perf_counter()
+        refs = list(rule.check_day(table, rows))
+        timings[rule.name] += time.perf_counter() - started
+        for ref in refs:
+            yield positions.get(ref.first, 0), rule_index, ref
+
+
+class RuleEngine:
+    """Запускает правила за один проход по данным.
+
+    Правила PAIR и DAY получают данные из одной сортировки по группам и дням, правила
+    OVERLAP — из одной сканирующей прямой на каждое поле сущности. Проблемы выдаются
+    в порядке занятий, при совпадении — в порядке правил. Время каждого правила
+    накапливается в timings.
+    """
+
+    def __init__(self, rules=None, params=None):
+        """rules — имена правил (None — все зарегистрированные), params — {имя: {параметр: значение}}"""
+        names = list(RULES) if rules is None else list(rules)
+        unknown = [name for name in names if name not in RULES]
+        if unknown:
+            raise ValueError(f"Неизвестные правила: {', '.join(unknown)}")
+        params = params or {}
+        self.rules = [RULES[name](**params.get(name, {})) for name in names]
+        self.timings = {rule.name: 0.0 for rule in self.rules}
+
+    def select(self, *needs):
+        return [rule for rule in self.rules if rule.needs in needs]
+
+    def categories(self, *needs):
+        """Категории проблем правил с указанными потребностями (без повторов, в порядке правил)"""
+        return tuple(dict.fromkeys(rule.category for rule in self.select(*needs)))
+
+    def iter_day_refs(self, table, engine=None):
+        """Правила PAIR и DAY: IssueRef по дням групп (группы и дни — в порядке первого появления)"""
+        pair_rules, day_rules = self.select(PAIR), self.select(DAY)
+        if not pair_rules and not day_rules:
+            return
+        if engine == "numpy":
+            from .vectorized_analyzer import iter_day_refs
+            yield from iter_day_refs(table, pair_rules, day_rules, self.timings)
+            return
+        if engine not in (None, "python"):
+            raise ValueError(f"Неизвестный движок анализа: {engine}")
+
+        starts, ends = table.start, table.end
+
+        # Группируем индексы занятий по группе и дню (в порядке первого появления)
+        rows_by_group_day = {}
+        for index, (group, day) in enumerate(zip(table.group, table.day)):
+            rows_by_group_day.setdefault(group, {}).setdefault(day, []).append(index)
+
+        # Дни подряд, занятия дня — по началу; позиция — номер занятия в этом порядке
+        days, pairs, position = [], [], 0
+        for rows_by_day in rows_by_group_day.values():
+            for rows in rows_by_day.values():
+                rows.sort(key=starts.__getitem__)
+                days.append((position, rows))
+                pairs.extend(
+                    (position + offset, first, second, starts[second] - ends[first])
+                    for offset, (first, second) in enumerate(zip(rows, rows[1:]))
+                )
+                position += len(rows)
+
+        found = []  # (позиция первого занятия, номер правила, IssueRef)
+        for rule_index, rule in enumerate(pair_rules):
+            started = time.perf_counter()
+            matches, category, describe = rule.matches, rule.category, rule.describe
+            found.extend(
+                (position, rule_index, IssueRef(category, first, second, describe(table, first, second, gap)))
+                for position, first, second, gap in pairs if matches(table, first, second, gap)
+            )
+            self.timings[rule.name] += time.perf_counter() - started
+
+        for day_start, rows in days if day_rules else ():
+            for position, rule_index, ref in check_days(table, rows, day_rules, self.timings, len(pair_rules)):
+                found.append((day_start + position, rule_index, ref))
+
+        found.sort(key=lambda item: (item[0], item[1]))
+        for _, _, ref in found:
+            yield ref
+
+    def iter_overlap_refs(self, table):
+        """Правила OVERLAP: одна сканирующая прямая на (key, identity), проблемы — по правилам"""
+        sweeps = {}
+        for rule in self.select(OVERLAP):
+            sweeps.setdefault((rule.key, tuple(rule.identity)), []).append(rule)
+
+        for (key, identity), rules in sweeps.items():
+            started = time.perf_counter()
+            overlaps = list(sweep_overlaps(table, key, identity))
+            # Время общей сканирующей прямой делится между её правилами
+            for rule in rules:
+                self.timings[rule.name] += (time.perf_counter() - started) / len(rules)
+
+            for rule in rules:
+                started = time.perf_counter()
+                refs = [
+                    IssueRef(rule.category, first, second, rule.describe(table, first, second))
+                    for first, second in overlaps if rule.matches(table, first, second)
+                ]
+                self.timings[rule.name] += time.perf_counter() - started
+                yield from refs
+
+    def report(self):
+        """Время правил, с"""
+        return {name: round(seconds, 6) for name, seconds in self.timings.items()}
@@ -1,85 +1,64 @@
-from collections import defaultdict
-from datetime import timedelta
+import hashlib
 
-class ScheduleAnalyzer:
-    """Анализирует расписание на окна и сложные переходы"""
-
-    MIN_TIME_TO_TRAVEL = timedelta(minutes=10)
-
-    @staticmethod
-    def find_issues(events):
-        """Ищет неудобства в расписании с учётом групп и дней"""
-        issues = []
+from .analysis_rules import PAIR_CATEGORIES, ImpossibleTransitionRule, LongWindowRule
+from .conflict_detector import CONFLICT_CATEGORIES
+from .event_table import EVENT_FIELDS, EventRows, EventTable, select_window
+from .rule_engine import RuleEngine
 
-        # Группируем по группе и дню
-        events_by_group_day = defaultdict(lambda: defaultdict(list))
-        for event in events:
-            group = event["group"]
-            day = event["start"].date()
-            events_by_group_day[group][day].append(event)
 
-        # Перебираем группы и их расписание
-        for group, days in events_by_group_day.items():
-            for day, day_events in days.items():
-                # Сортируем занятия внутри дня по времени начала
-                day_events.sort(key=lambda e: e["start"])
-
-                for i in range(len(day_events) - 1):
-                    event_1 = day_events[i]
-                    event_2 = day_events[i + 1]
+class ScheduleAnalyzer:
+    """Анализирует расписание на окна и сложные переходы"""
 
-                    end_prev = event_1["end"]
-                    start_next = event_2["start"]
+    MIN_TIME_TO_TRAVEL = ImpossibleTransitionRule.min_travel
+    LONG_WINDOW = LongWindowRule.min_gap
 
-                    location_prev, location_next = event_1["location"], event_2["location"]
-                    gap = start_next - end_prev
+    # Категории проблем встроенных правил: соседние занятия дня группы и конфликты по времени
+    PAIR_CATEGORIES = PAIR_CATEGORIES
+    CONFLICT_CATEGORIES = CONFLICT_CATEGORIES
 
-                    # Проверяем длинные окна (больше 2 часов)
-                    if gap > timedelta(hours=2):
-                        issues.append({
-                            "category": "Длинное окно",
-                            "summary": event_1["summary"],
-                            "start": event_1["start"],
-                            "end": event_1["end"],
-                            "location": event_1["location"],
-                            "teacher": event_1["teacher"],
-                            "group": event_1["group"],
-                            "discipline": event_1["discipline"],
+    # Движки анализа дней групп: "python" — цикл по дням групп, "numpy" — векторизованный
+    ENGINES = ("python", "numpy")
 
-                            # 🔹 Теперь добавляем информацию про второе событие
-                            "related_summary_2": event_2["summary"],
-                            "related_start_2": event_2["start"],
-                            "related_end_2": event_2["end"],
-                            "related_location_2": event_2["location"],
-                            "related_teacher_2": event_2["teacher"],
-                            "related_group_2": event_2["group"],
-                            "related_discipline_2": event_2["discipline"],
+    @staticmethod
+    def find_issues(events, engine=None, window=None, rules=None):
+        """Ищет неудобства в расписании с учётом групп и дней"""
+        return list(ScheduleAnalyzer.iter_issues(events, engine=engine, window=window, rules=rules))
 
-                            "description": f"Окно между занятиями: {gap}"
-                        })
+    @staticmethod
+    def iter_issues(events, engine=None, window=None, rules=None):
+        """Генератор неудобств: выдаёт проблемы по мере анализа.
 
-                    # Проверяем невозможные переходы между корпусами
-                    if location_prev != location_next and gap < ScheduleAnalyzer.MIN_TIME_TO_TRAVEL:
-                        issues.append({
-                            "category": "Невозможный переход",
-                            "summary": event_1["summary"],
-                            "start": event_1["start"],
-                            "end": event_1["end"],
-                            "location": event_1["location"],
-                            "teacher": event_1["teacher"],
-                            "group": event_1["group"],
-                            "discipline": event_1["discipline"],
+        events — список словарей или EventTable, engine задаёт движок анализа,
+        window — (первый день, день после последнего): анализируются только дни из этого окна.
+        rules — RuleEngine (по умолчанию все зарегистрированные правила с порогами по умолчанию).
+        """
+        if window is not None:
+            events = select_window(events, window)
+        if isinstance(events, EventTable):
+            table = events
+        else:
+            # Движку numpy нужны числовые колонки, python работает прямо со словарями
+            table = EventTable(events) if engine == "numpy" else EventRows(events)
+        for ref in ScheduleAnalyzer.iter_issue_refs(table, engine=engine, rules=rules):
+            yield table.issue(ref)
 
-                            # 🔹 Теперь добавляем второе событие, куда нужно успеть
-                            "related_summary_2": event_2["summary"],
-                            "related_start_2": event_2["start"],
-                            "related_end_2": event_2["end"],
-                            "related_location_2": event_2["location"],
-                            "related_teacher_2": event_2["teacher"],
-                            "related_group_2": event_2["group"],
-                            "related_discipline_2": event_2["discipline"],
+    @staticmethod
+    def iter_issue_refs(table, engine=None, rules=None):
+        """То же, что iter_issues, для EventTable (или EventRows): выдаёт IssueRef правил PAIR и DAY"""
+        return (rules or RuleEngine()).iter_day_refs(table, engine=engine)
 
-                            "description": f"Невозможно успеть из {location_prev} в {location_next} за {gap}."
-                        })
+    @staticmethod
+    def find_conflicts(events, window=None, rules=None):
+        """Ищет конфликты по времени: преподаватель или аудитория заняты дважды, занятия группы пересекаются"""
+        if window is not None:
+            events = select_window(events, window)
+        table = events if isinstance(events, EventTable) else EventTable(events)
+        return [table.issue(ref) for ref in (rules or RuleEngine()).iter_overlap_refs(table)]
 
-        return issues
+    @staticmethod
+    def fingerprint(issue):
+        """Стабильный отпечаток проблемы: категория и оба занятия"""
+        parts = [issue["category"]]
+        parts.extend(str(issue[field]) for field in EVENT_FIELDS)
+        parts.extend(str(issue[f"related_{field}_2"]) for field in EVENT_FIELDS)
+        return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
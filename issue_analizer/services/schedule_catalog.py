@@ -0,0 +1,81 @@
+import json
+
+import redis
+
+from .schedule_service import ScheduleService
+
+
+class ScheduleCatalog:
+    """Каталог расписаний (записи fetch_schedule), закэшированный в Redis.
+
+    Нужен точечному обновлению: календари группы или преподавателя находятся без обхода
+    всех страниц API. Каталог перезаписывается при каждом полном обновлении.
+    """
+
+    KEY = "schedule_catalog"
+    TTL = 24 * 3600
+
+    def __init__(self, redis_client, ttl=None, api_url=None):
+        self.redis = redis_client
+        self.ttl = ttl or self.TTL
+        self.api_url = api_url
+
+    def load(self):
+        """Закэшированный каталог или None (ошибка Redis — как промах)"""
+        try:
+            raw = self.redis.get(self.KEY)
+        except redis.RedisError:
+            return None
+        return json.loads(raw) if raw else None
+
+    def refresh(self, metrics=None):
+        """Загружает каталог из API и сохраняет его"""
+        catalog = ScheduleService.fetch_schedule(metrics=metrics, api_url=self.api_url)
+        try:
+            self.redis.set(self.KEY, json.dumps(catalog, ensure_ascii=False), ex=self.ttl)
+        except redis.RedisError as e:
+            print(f"⚠️ Не удалось сохранить каталог расписаний: {e}")
+        return catalog
+
+    def get(self, metrics=None):
+        catalog = self.load()
+        return self.refresh(metrics) if catalog is None else catalog
+
+    @staticmethod
+    def match(catalog, title, target):
+        """Записи каталога типа target (scheduleTarget), в названии которых есть title.
+
+        Если есть точное совпадение названия (без учёта регистра) — только оно.
+        """
+        title = title.strip().casefold()
+        found = [
+            schedule for schedule in catalog
+            if schedule.get("scheduleTarget", ScheduleService.GROUP_TARGET) == target
+            and title in str(schedule.get("targetTitle", "")).casefold()
+        ]
+        exact = [schedule for schedule in found if str(schedule.get("targetTitle", "")).casefold() == title]
+        return exact or found
+
+    def find(self, title, target, metrics=None):
+        """Как match по кэшу; если ничего не найдено, каталог загружается заново (могли появиться новые записи)"""
+        catalog = self.load()
+        found = self.match(catalog, title, target) if catalog is not None else []
+        if not found:
+            found = self.match(self.refresh(metrics), title, target)
+        return found
+
+    def group_links(self, groups, metrics=None):
+        """Ссылки на календари групп с точно такими названиями.
+
+        Значение может перечислять несколько групп через запятую: X-META-GROUP потоковой
+        лекции в календаре преподавателя — "ИКБО-01-23, ИКБО-02-23, ...".
+        """
+        titles = {title.strip().casefold() for group in groups for title in group.split(",") if title.strip()}
+        if not titles:
+            return []
+        catalog = self.get(metrics)
+        return [
+            schedule["iCalLink"] for schedule in catalog
+            if ScheduleService.is_group_schedule(schedule)
+            and str(schedule.get("targetTitle", "")).casefold() in titles
+        ]
@@ -1,26 +1,134 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
 from icalendar import Calendar, vText
 
+from .event_table import EventTable, event_groups, select_window
+from .ical_cache import CacheEntry, content_hash
+from .ical_parser import TEXT_PROPERTIES, UnsupportedCalendar, expand_events, iter_events
+
+
+@dataclass
+class FetchResult:
+    """Результат загрузки одного iCal-файла"""
+    url: str
+    events: list
+    error: str = None  # Текст ошибки, если файл загрузить не удалось
+    attempts: int = 0  # Сколько попыток понадобилось
+    elapsed: float = 0.0  # Время загрузки и разбора, с
+    parse_time: float = 0.0  # Из них на разбор, с
+    size: int = 0  # Размер загруженного календаря, байт
+    changed: bool = True  # Календарь изменился с прошлой загрузки (или кэш не используется)
+    previous_groups: frozenset = frozenset()  # Группы из прошлой версии изменившегося календаря
+    cache_payload: str = None  # Запись кэша, которую сохраняют после записи проблем в БД (defer_cache)
+
+    @property
+    def ok(self):
+        return self.error is None
+
 
 class ScheduleService:
     """Класс для работы с API расписания МИРЭА"""
 
     API_URL = "https://schedule-of.mirea.ru/schedule/api/search"
+    GROUP_TARGET = 1  # scheduleTarget расписания учебной группы
+    TEACHER_TARGET = 2  # scheduleTarget расписания преподавателя
+
+    # Параметры параллельной загрузки (можно переопределить при вызове)
+    FETCH_WORKERS = 16  # Размер пула потоков
+    PER_HOST_LIMIT = 8  # Максимум одновременных запросов к одному хосту
+    TIMEOUT = 30  # Таймаут одного запроса, с
+    RETRIES = 3  # Количество повторных попыток
+    BACKOFF = 0.5  # Базовая задержка между попытками, с (растёт экспоненциально)
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    _session = None
+    _session_lock = threading.Lock()
+    _host_limits = {}
+
+    @classmethod
+    def get_session(cls):
+        """Общая keep-alive сессия с пулом соединений"""
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(cls.FETCH_WORKERS, cls.PER_HOST_LIMIT))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def reset_session(cls):
+        """Забывает сессию, блокировку и семафоры родителя (в дочернем процессе после fork).
+
+        Иначе дочерние процессы пула делят с родителем и друг с другом одно keep-alive
+        соединение, а блокировка или семафор, захваченные в момент fork, не освободятся никогда.
+        """
+        cls._session = None
+        cls._session_lock = threading.Lock()
+        cls._host_limits = {}
 
     @classmethod
-    def fetch_schedule(cls):
-        """Получает список групп и ссылки на расписание (постранично)"""
+    def _host_limit(cls, url, limit):
+        """Семафор, ограничивающий число одновременных запросов к хосту"""
+        key = (urlsplit(url).netloc, limit)
+        with cls._session_lock:
+            if key not in cls._host_limits:
+                cls._host_limits[key] = threading.BoundedSemaphore(limit)
+            return cls._host_limits[key]
+
+    @classmethod
+    def _get(cls, url, params=None, headers=None, timeout=None, retries=None, backoff=None, per_host=None):
+        """GET-запрос через общую сессию с таймаутом и повторами. Возвращает (response, attempts)"""
+        timeout = cls.TIMEOUT if timeout is None else timeout
+        retries = cls.RETRIES if retries is None else retries
+        backoff = cls.BACKOFF if backoff is None else backoff
+        limit = cls._host_limit(url, per_host or cls.PER_HOST_LIMIT)
+        session = cls.get_session()
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with limit:
+                    response = session.get(url, params=params, headers=headers, timeout=timeout)
+                if response.status_code not in cls.RETRY_STATUSES or attempt > retries:
+                    response.raise_for_status()
+                    return response, attempt
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt > retries:
+                    raise
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+    @classmethod
+    def fetch_schedule(cls, metrics=None, api_url=None):
+        """Получает список групп и ссылки на расписание (постранично).
+
+        metrics — RefreshMetrics: время и размер каждой страницы в этапе catalog,
+        api_url — адрес каталога вместо API_URL (например, локальной замены API).
+        """
         all_data = []
         next_page_token = None
 
         while True:
             # Формируем URL с токеном страницы (если есть)
             params = {"pageToken": next_page_token} if next_page_token else {}
-            response = requests.get(cls.API_URL, params=params)
-            response.raise_for_status()
+            started = time.monotonic()
+            response, attempts = cls._get(api_url or cls.API_URL, params=params)
 
             data = response.json()
             all_data.extend(data["data"])  # Добавляем данные
+            if metrics:
+                metrics.add("catalog", time.monotonic() - started, pages=1, items=len(data["data"]),
+                            bytes=len(response.content), attempts=attempts)
 
             # Проверяем, есть ли следующая страница
             next_page_token = data.get("nextPageToken")
@@ -30,17 +138,178 @@ class ScheduleService:
         return all_data
 
     @classmethod
-    def fetch_ical(cls, ical_url):
+    def is_group_schedule(cls, schedule):
+        """Является ли запись каталога расписанием группы (если тип не указан — считаем, что да)"""
+        return schedule.get("scheduleTarget", cls.GROUP_TARGET) == cls.GROUP_TARGET
+
+    @classmethod
+    def _download_ical(cls, ical_url, cache=None, compact=False, fast_parser=False, expand=False, window=None,
+                       defer_cache=False, **options):
+        """Загружает календарь с учётом кэша и возвращает FetchResult.
+
+        compact — вернуть занятия в виде EventTable вместо списка словарей,
+        fast_parser — разбирать построчным парсером, expand и window — см. parse_ical,
+        defer_cache — не сохранять запись кэша, а вернуть её в FetchResult.cache_payload:
+        если запись проблем не удастся, следующее обновление снова увидит календарь изменившимся.
+        """
+        started = time.monotonic()
+        # Кэш хранит календарь целиком под ссылкой: окно (оно сдвигается каждый день) применяется
+        # после чтения из кэша, иначе каждый день все календари считались бы изменившимися
+        parse_options = {"fast": fast_parser, "expand": expand, "window": None if cache else window}
+        entry = cache.get(ical_url, compact=compact) if cache else None
+        if entry and entry.expand != expand:
+            entry = CacheEntry(content_hash=entry.content_hash, events=entry.events)  # Занятия разобраны иначе
+            reparse = True
+        else:
+            reparse = False
+        headers = entry.conditional_headers() if entry else None
+        response, attempts = cls._get(ical_url + "?includeMeta=true", headers=headers, **options)
+
+        # 304 Not Modified — сервер подтвердил, что календарь не менялся
+        if entry and response.status_code == 304:
+            cache.touch(ical_url)
+            return FetchResult(ical_url, cls._in_window(entry.events, window), attempts=attempts,
+                               elapsed=time.monotonic() - started, changed=False)
+
+        digest = content_hash(response.content)
+        changed = not entry or entry.content_hash != digest
+        parse_time = 0.0
+        # Содержимое не изменилось — повторно не разбираем
+        if changed or reparse:
+            parse_started = time.monotonic()
+            if compact:
+                events = cls.parse_ical_table(response.text, **parse_options)
+            else:
+                events = cls.parse_ical(response.text, **parse_options)
+            parse_time = time.monotonic() - parse_started
+        else:
+            events = entry.events
+
+        cache_payload = None
+        if cache:
+            new_entry = CacheEntry(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                content_hash=digest,
+                events=events,
+                expand=expand,
+            )
+            if defer_cache:
+                cache_payload = cache.dumps(new_entry)
+            else:
+                cache.set(ical_url, new_entry)
+            events = cls._in_window(events, window)
+
+        previous_groups = frozenset(event_groups(entry.events)) if entry and changed else frozenset()
+        return FetchResult(ical_url, events, attempts=attempts, elapsed=time.monotonic() - started,
+                           parse_time=parse_time, size=len(response.content),
+                           changed=changed, previous_groups=previous_groups, cache_payload=cache_payload)
+
+    @staticmethod
+    def _in_window(events, window):
+        return events if window is None else select_window(events, window)
+
+    @classmethod
+    def fetch_ical(cls, ical_url, cache=None, **options):
         """Загружает и парсит iCalendar файл"""
-        response = requests.get(ical_url + "?includeMeta=true")
-        response.raise_for_status()
-        return cls.parse_ical(response.text)
+        return cls._download_ical(ical_url, cache=cache, **options).events
+
+    @classmethod
+    def _fetch_result(cls, ical_url, cache=None, **options):
+        """Загружает один календарь, не выбрасывая исключений"""
+        started = time.monotonic()
+        try:
+            return cls._download_ical(ical_url, cache=cache, **options)
+        except Exception as e:
+            return FetchResult(ical_url, [], error=str(e), elapsed=time.monotonic() - started)
+
+    @classmethod
+    def _iter_indexed(cls, ical_urls, workers=None, **options):
+        """Загружает календари в пуле потоков, выдавая (index, FetchResult) по мере готовности.
+
+        В работе одновременно не больше 2 * workers задач, поэтому готовые, но ещё не
+        обработанные календари не накапливаются в памяти.
+        """
+        workers = workers or cls.FETCH_WORKERS
+        urls = enumerate(ical_urls)
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                for index, url in urls:
+                    pending[executor.submit(cls._fetch_result, url, **options)] = index
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+    @classmethod
+    def iter_icals(cls, ical_urls, workers=None, **options):
+        """Потоковая загрузка: выдаёт FetchResult по мере готовности календарей (порядок не сохраняется)
+
+        options: cache, defer_cache, compact, fast_parser, expand, window, timeout, retries, backoff, per_host
+        """
+        for _, result in cls._iter_indexed(ical_urls, workers=workers, **options):
+            yield result
+
+    @classmethod
+    def fetch_icals(cls, ical_urls, workers=None, **options):
+        """Параллельно загружает календари. Возвращает FetchResult для каждой ссылки в исходном порядке
+
+        options: cache, defer_cache, compact, fast_parser, expand, window, timeout, retries, backoff, per_host
+        """
+        ical_urls = list(ical_urls)
+        results = [None] * len(ical_urls)
+        for index, result in cls._iter_indexed(ical_urls, workers=workers, **options):
+            results[index] = result
+        return results
 
     @staticmethod
-    def parse_ical(ical_data):
-        """Разбирает iCalendar (.ics) и возвращает список только с парами"""
+    def _vevent_properties(component):
+        """Нужные свойства VEVENT из icalendar в формате ical_parser (для expand_events)"""
+        properties = {name: str(component.get(name, "")) for name in TEXT_PROPERTIES}
+        properties["DTSTART"] = component.get("DTSTART").dt
+        properties["DTEND"] = component.get("DTEND").dt
+        if "UID" in component:
+            properties["UID"] = str(component["UID"])
+        if "RECURRENCE-ID" in component:
+            properties["RECURRENCE-ID"] = component["RECURRENCE-ID"].dt
+        if "RRULE" in component:
+            rule = component["RRULE"]
+            properties["RRULE"] = (rule[0] if isinstance(rule, list) else rule).to_ical().decode()
+        for name in ("RDATE", "EXDATE"):
+            if name in component:
+                values = component[name] if isinstance(component[name], list) else [component[name]]
+                properties[name] = [moment.dt for value in values for moment in value.dts]
+        return properties
+
+    @classmethod
+    def parse_ical(cls, ical_data, fast=False, expand=False, window=None):
+        """Разбирает iCalendar (.ics) и возвращает список только с парами
+
+        fast — построчный разбор без дерева компонентов icalendar (результат тот же);
+        календари, которые он не поддерживает, разбираются через icalendar.
+        expand — развернуть повторяющиеся занятия (RRULE/RDATE/EXDATE),
+        window — (первый день, день после последнего): только занятия в этом окне.
+        """
+        if fast:
+            try:
+                return list(iter_events(ical_data, expand=expand, window=window))
+            except UnsupportedCalendar:
+                pass
+        return list(cls.iter_ical(ical_data, expand=expand, window=window))
+
+    @classmethod
+    def iter_ical(cls, ical_data, expand=False, window=None):
+        """Разбор через icalendar: выдаёт занятия по одному, без промежуточного списка"""
         calendar = Calendar.from_ical(ical_data)
-        events = []
+        if expand or window:
+            vevents = (cls._vevent_properties(component) for component in calendar.walk("VEVENT"))
+            yield from expand_events(vevents, expand=expand, window=window)
+            return
 
         for component in calendar.walk():
             if component.name == "VEVENT":  # Берём только события (пары и мета-инфу)
@@ -61,6 +330,20 @@ class ScheduleService:
 
                 # Фильтруем события: оставляем только занятия с X-META-DISCIPLINE
                 if event["discipline"]:
-                    events.append(event)
+                    yield event
+
+    @classmethod
+    def parse_ical_table(cls, ical_data, fast=False, expand=False, window=None):
+        """Разбирает iCalendar (.ics) в компактную EventTable (параметры — как у parse_ical)"""
+        if fast:
+            try:
+                # Без промежуточного списка словарей
+                return EventTable(iter_events(ical_data, expand=expand, window=window))
+            except UnsupportedCalendar:
+                pass
+        return EventTable(cls.iter_ical(ical_data, expand=expand, window=window))
+
 
-        return events
+# Дочерние процессы (пул billiard, prefork-воркеры Celery) открывают свои соединения
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ScheduleService.reset_session)
@@ -0,0 +1,159 @@
+import random
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+
+class SyntheticSchedule:
+    """Синтетическое расписание университета для бенчмарков.
+
+    Календари групп в формате МИРЭА (?includeMeta=true): занятия с X-META-TEACHER,
+    X-META-GROUP и X-META-DISCIPLINE. У каждой группы своя недельная сетка, которая
+    повторяется weeks недель. Преподаватели и аудитории общие, поэтому встречаются окна,
+    переходы между кампусами и конфликты. Результат зависит только от параметров и seed.
+    """
+
+    SLOTS = ((9, 0), (10, 40), (12, 40), (14, 20), (16, 20), (18, 0))  # Начала пар
+    PAIR_LENGTH = timedelta(minutes=90)
+    SHIFT = timedelta(minutes=5)  # Сдвиг начала перенесённой пары: перерыв сокращается до 5 минут
+    CAMPUSES = ("В-78", "В-86", "С-20", "МП-1", "СГ-22")
+    BUILDINGS = "АБВГДИ"
+    PREFIXES = ("ИКБО", "ИВБО", "ИНБО", "КМБО", "БСБО", "ЭФБО")
+    KINDS = ("ЛК", "ПР", "ЛАБ")
+    DISCIPLINES = (
+        "Математический анализ", "Линейная алгебра", "Физика", "Программирование", "Базы данных",
+        "Операционные системы", "Компьютерные сети", "История России", "Иностранный язык",
+        "Дискретная математика", "Теория вероятностей", "Философия", "Физическая культура",
+    )
+    INITIALS = "АБВГДЕИКЛМНОПРСТ"
+    SURNAMES = ("Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев",
+                "Козлов", "Новиков", "Морозов", "Волков", "Алексеев", "Павлов", "Семенов")
+    TIMEZONE = ZoneInfo("Europe/Moscow")
+    FOLD = 75  # Максимальная длина строки в октетах UTF-8 без CRLF (RFC 5545)
+
+    def __init__(self, groups=100, teachers=300, rooms=200, weeks=16, pairs_per_day=(2, 5),
+                 start=date(2025, 2, 10), seed=0, recurring=False, shifted=0.05):
+        """start — неделя начала, recurring — сетка через RRULE вместо отдельных занятий,
+        shifted — доля пар, начинающихся раньше на SHIFT (невозможные переходы)
+        """
+        self.groups = groups
+        self.weeks = weeks
+        self.pairs_per_day = pairs_per_day
+        self.start = start - timedelta(days=start.weekday())
+        self.seed = seed
+        self.recurring = recurring
+        self.shifted = shifted
+
+        shared = random.Random(seed)
+        names = {}  # Уникальные ФИО: число преподавателей не меняется из-за совпадений
+        while len(names) < teachers:
+            surname = self.SURNAMES[len(names) % len(self.SURNAMES)]
+            names.setdefault(f"{surname} {shared.choice(self.INITIALS)}.{shared.choice(self.INITIALS)}.")
+        self.teachers = list(names)
+        self.rooms = [
+            f"{shared.choice(self.BUILDINGS)}-{100 + index} ({self.CAMPUSES[index % len(self.CAMPUSES)]})"
+            for index in range(rooms)
+        ]
+
+    def group_name(self, index):
+        prefix = self.PREFIXES[index % len(self.PREFIXES)]
+        number = index // len(self.PREFIXES) % 99 + 1
+        year = 25 - index // (len(self.PREFIXES) * 99) % 5
+        return f"{prefix}-{number:02d}-{year}"
+
+    def week_template(self, index):
+        """Недельная сетка группы: [(день недели, номер пары, сдвиг, вид, дисциплина, преподаватель, аудитория)]"""
+        rng = random.Random(f"{self.seed}:{index}")
+        template = []
+        for weekday in range(6):
+            count = rng.randint(*self.pairs_per_day)
+            # Пары подряд с редкими пропусками: так получаются и обычные дни, и окна
+            first = rng.randrange(len(self.SLOTS) - count + 1)
+            slots = sorted(rng.sample(range(first, len(self.SLOTS)), count))
+            for slot in slots:
+                shift = self.SHIFT if slot and rng.random() < self.shifted else timedelta(0)
+                template.append((weekday, slot, shift, rng.choice(self.KINDS), rng.choice(self.DISCIPLINES),
+                                 rng.choice(self.teachers), rng.choice(self.rooms)))
+        return template
+
+    def events(self, index):
+        """Занятия группы в формате ScheduleService.parse_ical"""
+        group = self.group_name(index)
+        events = []
+        for week in range(1 if self.recurring else self.weeks):
+            for weekday, slot, shift, kind, discipline, teacher, room in self.week_template(index):
+                day = self.start + timedelta(weeks=week, days=weekday)
+                start = datetime(day.year, day.month, day.day, *self.SLOTS[slot], tzinfo=self.TIMEZONE) - shift
+                events.append({
+                    "summary": f"{kind} {discipline}",
+                    "start": start,
+                    "end": start + self.PAIR_LENGTH,
+                    "location": room,
+                    "teacher": teacher,
+                    "group": group,
+                    "discipline": discipline,
+                })
+        return events
+
+    def calendar(self, index):
+        """iCal-календарь группы"""
+        return self.render(self.group_name(index), self.events(index), uid=index)
+
+    def teacher_events(self, teacher):
+        """Занятия преподавателя во всех группах (как в его календаре МИРЭА)"""
+        return sorted(
+            (event for index in range(self.groups) for event in self.events(index) if event["teacher"] == teacher),
+            key=lambda event: (event["start"], event["group"]),
+        )
+
+    def teacher_calendar(self, teacher):
+        """iCal-календарь преподавателя"""
+        return self.render(teacher, self.teacher_events(teacher), uid=f"t{self.teachers.index(teacher)}")
+
+    def render(self, title, events, uid):
+        """iCal-календарь с названием title из занятий events"""
+        lines = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//mirea_scheduler//synthetic//RU",
+            f"X-WR-CALNAME:{title}",
+        ]
+        for number, event in enumerate(events):
+            lines.extend((
+                "BEGIN:VEVENT",
+                f"UID:{uid}-{number}@synthetic",
+                f"DTSTART;TZID=Europe/Moscow:{event['start']:%Y%m%dT%H%M%S}",
+                f"DTEND;TZID=Europe/Moscow:{event['end']:%Y%m%dT%H%M%S}",
+            ))
+            if self.recurring:
+                lines.append(f"RRULE:FREQ=WEEKLY;COUNT={self.weeks}")
+            lines.extend((
+                f"SUMMARY:{event['summary']}",
+                f"LOCATION:{event['location']}",
+                f"X-META-TEACHER:{event['teacher']}",
+                f"X-META-GROUP:{event['group']}",
+                f"X-META-DISCIPLINE:{event['discipline']}",
+                "END:VEVENT",
+            ))
+        lines.append("END:VCALENDAR")
+        return "".join(self.fold(line) + "\r\n" for line in lines)
+
+    def calendars(self):
+        """Выдаёт (группа, iCal) по всем группам"""
+        for index in range(self.groups):
+            yield self.group_name(index), self.calendar(index)
+
+    @classmethod
+    def fold(cls, line):
+        """Перенос по FOLD октетов UTF-8 (кириллица — 2 октета на символ), символы не разрываются"""
+        if len(line.encode()) <= cls.FOLD:
+            return line
+        parts, part, size, limit = [], [], 0, cls.FOLD
+        for char in line:
+            length = len(char.encode())
+            if size + length > limit:
+                parts.append("".join(part))
+                part, size, limit = [], 0, cls.FOLD - 1  # Строка продолжения начинается с пробела
+            part.append(char)
+            size += length
+        parts.append("".join(part))
+        return "\r\n ".join(parts)
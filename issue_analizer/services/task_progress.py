@@ -0,0 +1,73 @@
+import json
+import time
+
+import redis
+
+
+class TaskProgress:
+    """События хода задачи обновления через Redis pub/sub (для /api/schedule/process/<id>/events).
+
+    Каждое событие получает номер seq, публикуется в канал задачи и сохраняется в историю:
+    подключившийся позже клиент сначала получает историю, затем — новые события.
+    Ошибки Redis не прерывают задачу: события просто не доставляются.
+    """
+
+    KEY_PREFIX = "schedule_task:"
+    TTL = 3600  # Сколько хранится история событий после последнего
+    INTERVAL = 0.5  # Минимальный интервал между событиями progress, с
+    FINAL = ("done", "failed")  # События завершения задачи
+
+    def __init__(self, redis_client, task_id=None, ttl=None):
+        """task_id=None — события никуда не отправляются"""
+        self.redis = redis_client
+        self.task_id = task_id
+        self.ttl = ttl or self.TTL
+        self._sent_at = 0.0
+        self._failed = False
+
+    @classmethod
+    def channel(cls, task_id):
+        return f"{cls.KEY_PREFIX}{task_id}:events"
+
+    @classmethod
+    def history_key(cls, task_id):
+        return f"{cls.KEY_PREFIX}{task_id}:history"
+
+    @classmethod
+    def seq_key(cls, task_id):
+        return f"{cls.KEY_PREFIX}{task_id}:seq"
+
+    def publish(self, event, **data):
+        """Отправляет событие (started, fetched, analyzed, committed, done, failed...)"""
+        if not self.task_id or self._failed:
+            return
+        try:
+            seq = self.redis.incr(self.seq_key(self.task_id))
+            message = json.dumps({"seq": seq, "event": event, "time": time.time(), **data},
+                                 ensure_ascii=False, default=str)
+            with self.redis.pipeline() as pipe:
+                pipe.rpush(self.history_key(self.task_id), message)
+                pipe.expire(self.history_key(self.task_id), self.ttl)
+                pipe.expire(self.seq_key(self.task_id), self.ttl)
+                pipe.publish(self.channel(self.task_id), message)
+                pipe.execute()
+            self._sent_at = time.monotonic()
+        except redis.RedisError as e:
+            self._failed = True
+            print(f"⚠️ Не удалось отправить событие задачи: {e}")
+
+    def progress(self, **data):
+        """Промежуточный счётчик (например, загружено календарей): не чаще раза в INTERVAL"""
+        if time.monotonic() - self._sent_at >= self.INTERVAL:
+            self.publish("progress", **data)
+
+    @staticmethod
+    def decode(raw_events, after=0):
+        """События из истории (LRANGE history_key) с seq больше after"""
+        events = (json.loads(raw) for raw in raw_events)
+        return [event for event in events if event["seq"] > after]
+
+    @staticmethod
+    def sse(event):
+        """Событие в формате Server-Sent Events"""
+        return f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
@@ -0,0 +1,102 @@
+import time
+
+import numpy as np
+
+from .event_table import IssueRef
+from .rule_engine import check_days
+
+
+def _first_seen_rank(keys):
+    """Для каждого элемента — индекс первого появления его значения в массиве"""
+    _, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first_index[inverse]
+
+
+def _column(table, field):
+    column = getattr(table, field)
+    return np.frombuffer(column, dtype=np.int64 if column.typecode == "q" else column.typecode)
+
+
+class PairColumns:
+    """Соседние занятия после сортировки по дням групп: поля первого и второго занятия пары.
+
+    Пара p — занятия order[p] и order[p + 1]; gap — перерыв между ними, с.
+    Колонки полей строятся при первом обращении.
+    """
+
+    def __init__(self, table, order, gap):
+        self.table = table
+        self.order = order
+        self.gap = gap
+        self._sorted = {}
+
+    def _sorted_column(self, field):
+        if field not in self._sorted:
+            self._sorted[field] = _column(self.table, field)[self.order]
+        return self._sorted[field]
+
+    def first(self, field):
+        return self._sorted_column(field)[:-1]
+
+    def second(self, field):
+        return self._sorted_column(field)[1:]
+
+
+def iter_day_refs(table, pair_rules, day_rules, timings):
+    """Векторизованный RuleEngine.iter_day_refs: одна сортировка, правила PAIR проверяются масками.
+
+    Результат и порядок проблем совпадают с движком python: группы и дни в порядке
+    первого появления, занятия дня — по времени начала, при совпадении — по порядку правил.
+    Правила без mask и правила DAY проверяются в Python по отобранным дням.
+    """
+    if not len(table):
+        return
+
+    group = _column(table, "group").astype(np.int64)
+    day = _column(table, "day").astype(np.int64)
+    start = _column(table, "start")
+    end = _column(table, "end")
+
+    # Одна сортировка: группа → день (в порядке первого появления) → начало; lexsort устойчив
+    group_day = group * (day.max() - day.min() + 1) + (day - day.min())
+    order = np.lexsort((start, _first_seen_rank(group_day), _first_seen_rank(group)))
+    group_day = group_day[order]
+
+    # Соседние занятия одного дня группы
+    same_day = group_day[1:] == group_day[:-1]
+    gap = start[order][1:] - end[order][:-1]
+    pairs = PairColumns(table, order, gap)
+
+    found = []  # (позиция первого занятия в сортировке, номер правила, IssueRef)
+    for rule_index, rule in enumerate(pair_rules):
+        started = time.perf_counter()
+        mask = rule.mask(pairs)
+        if mask is None:
+            positions = [
+                position for position in np.flatnonzero(same_day).tolist()
+                if rule.matches(table, int(order[position]), int(order[position + 1]), int(gap[position]))
+            ]
+            positions = np.array(positions, dtype=np.int64)
+        else:
+            positions = np.flatnonzero(same_day & mask)
+
+        # Материализуем только отмеченные пары (переводя их в списки Python один раз)
+        flagged = zip(positions.tolist(), order[positions].tolist(), order[positions + 1].tolist(),
+                      gap[positions].tolist())
+        category, describe = rule.category, rule.describe
+        found.extend(
+            (position, rule_index, IssueRef(category, first, second, describe(table, first, second, pair_gap)))
+            for position, first, second, pair_gap in flagged
+        )
+        timings[rule.name] += time.perf_counter() - started
+
+    if day_rules:
+        day_starts = [0] + (np.flatnonzero(~same_day) + 1).tolist()
+        for day_start, day_end in zip(day_starts, day_starts[1:] + [len(order)]):
+            rows = order[day_start:day_end].tolist()
+            for position, rule_index, ref in check_days(table, rows, day_rules, timings, len(pair_rules)):
+                found.append((day_start + position, rule_index, ref))
+
+    found.sort(key=lambda item: (item[0], item[1]))
+    for _, _, ref in found:
+        yield ref
@@ -1,120 +1,627 @@
 import redis
-import hashlib
+import time
+import uuid
+from datetime import date, timedelta
+from urllib.parse import urlencode
 from celery import shared_task
-from django.utils.timezone import now
-from django.db import transaction
+from celery.exceptions import Retry
+from celery.result import AsyncResult
 from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
 
-from .models import ScheduleIssue, ScheduleEvent, IssueCategory
-from .services.schedule_service import ScheduleService
+from .models import ScheduleIssue
+from .services.schedule_service import FetchResult, ScheduleService
 from .services.schedule_analyzer import ScheduleAnalyzer
-from issue_analizer.serializers import IssueSerializer
+from .services.ical_cache import ICalCache
+from .services.issue_writer import IssueWriter
+from .services.issue_stats import IssueStats
+from .services.event_table import EventTable, event_groups, select_groups
+from .services.parallel_analyzer import ParallelAnalyzer
+from .services.response_cache import IssueListCache
+from .services.refresh_coordinator import RefreshCoordinator
+from .services.refresh_planner import RefreshPlanner
+from .services.refresh_metrics import RefreshMetrics
+from .services.rule_engine import DAY, OVERLAP, PAIR, RuleEngine
+from .services.schedule_catalog import ScheduleCatalog
+from .services.task_progress import TaskProgress
 
 # Подключаем Redis
 redis_client = redis.StrictRedis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
 
-# Ключи в Redis
-REDIS_ACTIVE_TASK_KEY = "active_schedule_task"
-REDIS_QUERY_HASH_KEY = "query_task_map"
 
+def refresh_coordinator(scope=None):
+    """Координатор обновлений: одно глобальное обновление на все одновременные запросы.
 
-@shared_task(bind=True)
-def update_schedule_task(self, group=None, teacher=None):
+    scope — блокировка точечного (refresh_scope) или горячего (HOT_REFRESH_SCOPE) обновления,
+    отдельная от глобальной.
+    """
+    return RefreshCoordinator(redis_client, ttl=settings.SCHEDULE_REFRESH_LOCK_TTL, scope=scope)
+
+
+HOT_REFRESH_SCOPE = "hot"  # Блокировка горячего обновления: к нему не присоединяются запросы API
+
+
+def refresh_scope(group=None, teacher=None):
+    """Ключ точечного обновления: одинаковые запросы объединяются в одну задачу"""
+    return urlencode({"group": (group or "").strip().upper(), "teacher": (teacher or "").strip().casefold()})
+
+
+def schedule_catalog():
+    return ScheduleCatalog(redis_client, ttl=settings.SCHEDULE_CATALOG_TTL, api_url=settings.SCHEDULE_API_URL or None)
+
+
+@shared_task(bind=True, max_retries=None)  # Повторы — только ожидание частичных обновлений (ограничено TTL их блокировок)
+def update_schedule_task(self, group=None, teacher=None, incremental=None, streaming=None):
     """Фоновая задача обновления расписания с безопасным обновлением БД"""
+    if incremental is None:
+        incremental = settings.SCHEDULE_INCREMENTAL
+    if streaming is None:
+        streaming = settings.SCHEDULE_STREAMING
 
-    # Формируем уникальный ключ запроса
-    query_string = f"group={group}&teacher={teacher}"
-    query_hash = hashlib.md5(query_string.encode()).hexdigest()
+    # Точечные и горячее обновления пишут проблемы тех же групп: ждём их завершения, не занимая
+    # воркер (глобальная блокировка остаётся за задачей). Новые при ней не запускаются (см. start_refresh)
+    scoped = refresh_coordinator().scoped(is_finished=lambda task_id: AsyncResult(task_id).ready())
+    if scoped and self.request.is_eager:
+        # Без брокера отложить задачу нельзя, а результаты eager-задач не хранятся (их блокировки
+        # не отличить от зависших): обновляем сразу
+        print(f"⚠️ Идут частичные обновления ({len(scoped)}), eager-режим — глобальное не откладывается")
+    elif scoped:
+        print(f"⏳ Идут частичные обновления ({len(scoped)}), глобальное отложено")
+        try:
+            raise self.retry(countdown=settings.SCHEDULE_SCOPED_WAIT)
+        except Retry:
+            raise
+        except Exception:
+            # Повтор не поставлен (например, брокер недоступен) — блокировка не должна остаться за задачей
+            refresh_coordinator().release(self.request.id)
+            raise
 
+    query_string = f"group={group}&teacher={teacher}"
     print(f"🔄 Начало обработки запроса: {query_string}")
+    metrics = RefreshMetrics()
+    progress = task_progress(self.request.id)
+    progress.publish("started", mode="full")
+    started = time.monotonic()
 
     try:
         print("📥 Загружаем новые данные...")
-        new_issues = []  # Список новых записей
-
-        # Загружаем расписание
-        schedule_data = []
-        for schedule in ScheduleService.fetch_schedule():
-            schedule_data.extend(ScheduleService.fetch_ical(schedule["iCalLink"]))
-
-        # Анализируем неудобства
-        issues = ScheduleAnalyzer.find_issues(schedule_data)
-
-        # Готовим новые объекты (но пока не сохраняем)
-        for issue in issues:
-            category, _ = IssueCategory.objects.get_or_create(name=issue["category"])
-
-            related_event = ScheduleEvent.objects.create(
-                summary=truncate_text(issue["summary"], 255),
-                start_time=issue["start"],
-                end_time=issue["end"],
-                location=truncate_text(issue["location"], 255),
-                teacher=truncate_text(issue["teacher"], 255),
-                group=truncate_text(issue["group"], 255),
-                discipline=truncate_text(issue["discipline"], 255),
-            )
-
-            related_event_2 = ScheduleEvent.objects.create(
-                summary=truncate_text(issue["related_summary_2"], 255),
-                start_time=issue["related_start_2"],
-                end_time=issue["related_end_2"],
-                location=truncate_text(issue["related_location_2"], 255),
-                teacher=truncate_text(issue["related_teacher_2"], 255),
-                group=truncate_text(issue["related_group_2"], 255),
-                discipline=truncate_text(issue["related_discipline_2"], 255),
-            )
-
-            new_issues.append(ScheduleIssue(
-                issue_type=category,
-                related_event=related_event,
-                related_event_2=related_event_2,
-                description=truncate_text(issue["description"], 255),
-                last_updated=now()
-            ))
-
-        #  Безопасное обновление БД
-        with transaction.atomic():
-            temp_issues = ScheduleIssue.objects.bulk_create(new_issues)  # Создаём новые данные
-            if temp_issues:  # Если новые данные успешно добавлены
-                ScheduleIssue.objects.exclude(id__in=[issue.id for issue in temp_issues]).delete()  # Удаляем старые
-            else:
-                print("⚠️ Новые данные не загружены, старые не удаляем!")
-
-        print("✅ База данных обновлена!")
-
-        # Фильтрация по параметрам
-        print(f"🔎 Всего записей в БД перед фильтрацией: {ScheduleIssue.objects.count()}")
-        queryset = ScheduleIssue.objects.all()
 
-        if group:
-            queryset = queryset.filter(related_event__group__icontains=group)
-            print(f"🔎 После фильтрации по группе ({group}): {queryset.count()} записей")
+        if streaming:
+            created, deleted = stream_schedule_update(incremental, metrics=metrics, progress=progress)
+        else:
+            created, deleted = rebuild_schedule(incremental, metrics=metrics, progress=progress)
+        print(f"💾 Добавлено проблем: {created}, удалено: {deleted}")
+        progress.publish("committed", created=created, deleted=deleted)
+        refreshed = time.monotonic()
+        with metrics.measure("publish"):
+            generation = publish_issues()
+        RefreshPlanner(redis_client).decay()
 
-        if teacher:
-            queryset = queryset.filter(related_event__teacher__icontains=teacher)
-            print(f"🔎 После фильтрации по преподавателю ({teacher}): {queryset.count()} записей")
+        print("✅ База данных обновлена!")
+        metrics.add("total", time.monotonic() - started)
+        save_metrics(metrics)
 
-        if queryset.count() == 0:
+        # Сводка по фильтру вместо самих проблем: их отдаёт постраничный API
+        summary = issue_summary(group, teacher)
+        summary.update({
+            "generation": generation,
+            "created": created,
+            "deleted": deleted,
+            "timings": {
+                "refresh": round(refreshed - started, 3),
+                "total": round(time.monotonic() - started, 3),
+            },
+            "metrics": metrics.as_dict(),
+        })
+        if not summary["total"]:
             print("⚠️ Внимание: после фильтрации данных не осталось!")
-
-        result_data = IssueSerializer(queryset, many=True).data
+        print(f"🔎 Проблем по запросу: {summary['total']} {summary['categories']}")
         print("✅ Запрос обработан успешно.")
+        progress.publish("done", **final_event(summary))
 
-        return result_data
+        return summary
 
     except Exception as e:
         print(f"❌ Ошибка во время обработки запроса: {e}")
+        metrics.add("total", time.monotonic() - started)
+        save_metrics(metrics, status="failed")
+        progress.publish("failed", error=str(e))
         raise
 
     finally:
-        # Очистка Redis после выполнения задачи
-        redis_client.delete(REDIS_ACTIVE_TASK_KEY)
-        redis_client.hdel(REDIS_QUERY_HASH_KEY, query_hash)
+        # Снимаем блокировку обновления: следующий запрос запустит новое
+        refresh_coordinator().release(self.request.id)
 
         print(f"🗑 Очистка Redis после завершения задачи: {query_string}")
 
-def truncate_text(text, max_length=255):
-    text = str(text)
-    if len(text) > max_length:
-        return text[:max_length]
-    return text
+def save_metrics(metrics, mode="full", status="ok"):
+    """Сохраняет метрики обновления в Redis (ошибка сохранения не прерывает обновление)"""
+    for stage, values in metrics.as_dict().items():
+        counts = ", ".join(f"{name}={value}" for name, value in values.items() if not name.endswith("seconds"))
+        print(f"📊 {stage}: {values['seconds']} с" + (f" ({counts})" if counts else ""))
+    try:
+        metrics.save(redis_client, mode=mode, status=status)
+    except redis.RedisError as e:
+        print(f"⚠️ Не удалось сохранить метрики обновления: {e}")
+
+
+def task_progress(task_id=None):
+    """События хода задачи для клиентов /api/schedule/process/<id>/events"""
+    return TaskProgress(redis_client, task_id, ttl=settings.SCHEDULE_TASK_EVENTS_TTL)
+
+
+def final_event(summary):
+    """Итог задачи для события done: без метрик, их отдаёт /api/schedule/metrics"""
+    return {key: value for key, value in summary.items() if key not in ("metrics", "filters")}
+
+
+def start_refresh(query="", group=None, teacher=None):
+    """Запускает обновление или присоединяется к идущему. Возвращает (task_id, позиция, запущено ли).
+
+    С group или teacher (и SCHEDULE_TARGETED_REFRESH) запускается точечное обновление,
+    если не идёт глобальное: иначе запрос присоединяется к глобальному. Глобальное ждёт
+    завершения уже идущих точечных, поэтому проблемы одних групп не пишутся одновременно.
+    """
+    is_finished = lambda active_id: AsyncResult(active_id).ready()
+    task, kwargs, coordinator = update_schedule_task, {}, refresh_coordinator()
+    if settings.SCHEDULE_TARGETED_REFRESH and (group or teacher):
+        active = coordinator.active()
+        if not active or is_finished(active):
+            task, kwargs = targeted_refresh_task, {"group": group, "teacher": teacher}
+            coordinator = refresh_coordinator(refresh_scope(group, teacher))
+
+    task_id, position, started = coordinator.request(str(uuid.uuid4()), query, is_finished=is_finished)
+    if started and task is targeted_refresh_task and refresh_coordinator().active():
+        # Глобальное обновление началось между проверкой и захватом — присоединяемся к нему
+        coordinator.release(task_id)
+        task, kwargs, coordinator = update_schedule_task, {}, refresh_coordinator()
+        task_id, position, started = coordinator.request(str(uuid.uuid4()), query, is_finished=is_finished)
+    if started:
+        try:
+            task.apply_async(task_id=task_id, kwargs=kwargs)
+        except Exception:
+            coordinator.release(task_id)
+            raise
+    return task_id, position, started
+
+
+def data_age():
+    """Сколько секунд прошло с последнего полного обновления (None — обновления ещё не было)"""
+    refreshed_at = IssueListCache(redis_client).refreshed_at()
+    return None if refreshed_at is None else max(0.0, time.time() - refreshed_at)
+
+
+@shared_task(bind=True)
+def periodic_refresh_task(self):
+    """Плановое обновление (celery beat).
+
+    Если данные старше SCHEDULE_FRESHNESS_TARGET — полное обновление через общий координатор.
+    Иначе обновляются самые приоритетные календари групп: часто меняющиеся и популярные в API.
+    """
+    age = data_age()
+    if age is None or age >= settings.SCHEDULE_FRESHNESS_TARGET:
+        task_id, _, started = start_refresh()
+        print(f"⏰ Данные устарели ({'нет' if age is None else f'{age:.0f} с'}), полное обновление: {task_id}")
+        return {"mode": "full", "task_id": task_id, "started": started, "data_age": age}
+
+    if not settings.SCHEDULE_HOT_CALENDARS:
+        return {"mode": "skip", "data_age": age}
+
+    # Своя блокировка: POST /api/schedule/process во время горячего обновления запускает
+    # полное, а не присоединяется к частичному
+    coordinator = refresh_coordinator(HOT_REFRESH_SCOPE)
+    if not coordinator.claim(self.request.id) or refresh_coordinator().active():
+        coordinator.release(self.request.id)
+        print("⏰ Идёт другое обновление, горячее обновление пропущено")
+        return {"mode": "busy", "data_age": age}
+
+    metrics = RefreshMetrics()
+    started = time.monotonic()
+    status = "failed"
+    try:
+        catalog = [
+            schedule for schedule in schedule_catalog().refresh(metrics)
+            if ScheduleService.is_group_schedule(schedule)
+        ]
+        popular = IssueListCache(redis_client).popular(settings.SCHEDULE_HOT_CALENDARS, with_scores=True)
+        links = RefreshPlanner(redis_client).rank(catalog, settings.SCHEDULE_HOT_CALENDARS, popular)
+        print(f"⏰ Горячее обновление: календарей {len(links)} из {len(catalog)}")
+
+        created, deleted = stream_schedule_update(True, links=links, metrics=metrics) if links else (0, 0)
+        generation = None
+        if created or deleted:
+            with metrics.measure("publish"):
+                generation = publish_issues(full=False)
+        status = "ok"
+        return {"mode": "hot", "calendars": len(links), "created": created, "deleted": deleted,
+                "generation": generation, "data_age": age, "metrics": metrics.as_dict()}
+    finally:
+        coordinator.release(self.request.id)
+        metrics.add("total", time.monotonic() - started)
+        save_metrics(metrics, mode="hot", status=status)
+
+
+@shared_task(bind=True)
+def targeted_refresh_task(self, group=None, teacher=None):
+    """Точечное обновление: загружаются и анализируются только календари группы или преподавателя.
+
+    Календари находятся по закэшированному каталогу. Для преподавателя обновляются
+    календари групп из его расписания: окна и переходы считаются по дням групп.
+    Конфликты по времени требуют всего расписания и остаются до полного обновления.
+    """
+    query_string = f"group={group}&teacher={teacher}"
+    print(f"🎯 Точечное обновление: {query_string}")
+    metrics = RefreshMetrics()
+    progress = task_progress(self.request.id)
+    progress.publish("started", mode="targeted")
+    started = time.monotonic()
+    status = "failed"
+    try:
+        links = targeted_links(group, teacher, metrics)
+        print(f"🎯 Календарей для обновления: {len(links)}")
+        created, deleted = (
+            stream_schedule_update(False, links=links, metrics=metrics, progress=progress) if links else (0, 0)
+        )
+        print(f"💾 Добавлено проблем: {created}, удалено: {deleted}")
+        progress.publish("committed", created=created, deleted=deleted)
+        generation = None
+        if created or deleted:
+            with metrics.measure("publish"):
+                generation = publish_issues(full=False)
+
+        summary = issue_summary(group, teacher)
+        summary.update({
+            "mode": "targeted",
+            "calendars": len(links),
+            "generation": generation,
+            "created": created,
+            "deleted": deleted,
+            "timings": {"total": round(time.monotonic() - started, 3)},
+            "metrics": metrics.as_dict(),
+        })
+        if not links:
+            print("⚠️ В каталоге нет календарей по запросу")
+        status = "ok"
+        progress.publish("done", **final_event(summary))
+        return summary
+    except Exception as e:
+        progress.publish("failed", error=str(e))
+        raise
+    finally:
+        refresh_coordinator(refresh_scope(group, teacher)).release(self.request.id)
+        metrics.add("total", time.monotonic() - started)
+        save_metrics(metrics, mode="targeted", status=status)
+
+
+def targeted_links(group=None, teacher=None, metrics=None):
+    """Ссылки на календари групп для точечного обновления (пересечение, если заданы оба фильтра)"""
+    catalog = schedule_catalog()
+    links = None
+    if group:
+        links = [schedule["iCalLink"] for schedule in catalog.find(group, ScheduleService.GROUP_TARGET, metrics)]
+    if teacher:
+        # Группы преподавателя — из его календаря
+        teacher_links = [schedule["iCalLink"] for schedule in catalog.find(teacher, ScheduleService.TEACHER_TARGET, metrics)]
+        groups = set()
+        for result in ScheduleService.fetch_icals(teacher_links, **fetch_options()):
+            metrics.record_fetch(result)
+            if not result.ok:
+                raise RuntimeError(f"Не удалось загрузить календарь преподавателя {result.url}: {result.error}")
+            groups.update(event_groups(result.events))
+            save_ical_cache([result])  # Проблемы по календарю преподавателя не записываются
+        group_links = catalog.group_links(groups, metrics)
+        links = group_links if links is None else [link for link in links if link in set(group_links)]
+    return links or []
+
+
+def rebuild_schedule(incremental, metrics=None, progress=None):
+    """Загружает все календари целиком, анализирует и синхронизирует проблемы. Возвращает (created, deleted)"""
+    metrics = metrics or RefreshMetrics()
+    progress = progress or task_progress()
+    # Загружаем расписание; проблемы групп, чьи календари не загрузились, остаются как есть
+    results, failed_groups, group_links = load_schedule_results(metrics)
+    progress.publish("fetched", calendars=len(results), failed=len(failed_groups))
+
+    # В инкрементальном режиме заново анализируем только группы из изменившихся календарей
+    groups = None
+    if incremental and ScheduleIssue.objects.exists():
+        groups = changed_groups(results)
+    # Дни групп — только из календарей групп, как в потоковом режиме; остальные календари нужны конфликтам
+    schedule_data = merge_events(result for result in results if result.url in group_links)
+    other_results = [result for result in results if result.url not in group_links]
+    # Записи кэша сохраняются после записи проблем; занятия результатов больше не нужны
+    cached = [FetchResult(result.url, [], cache_payload=result.cache_payload) for result in results]
+    del results
+    if groups is not None:
+        # Проблемы групп, пропавших из каталога, удаляются: их календари больше не загружаются
+        vanished = IssueWriter.vanished_groups(event_groups(schedule_data), failed_groups)
+        groups |= vanished
+        print(f"♻️ Инкрементальное обновление: затронуто групп {len(groups)}, пропало {len(vanished)}")
+
+    # Анализируем неудобства
+    rules = analysis_rules()
+    group_data = schedule_data if groups is None else select_groups(schedule_data, groups)
+    analyzed = time.monotonic()
+    if settings.SCHEDULE_PARALLEL_PROCESSES > 1:
+        issues = ParallelAnalyzer.find_issues(
+            group_data, settings.SCHEDULE_PARALLEL_PROCESSES, engine=settings.SCHEDULE_ANALYZER_ENGINE, rules=rules
+        )
+    else:
+        issues = ScheduleAnalyzer.find_issues(group_data, engine=settings.SCHEDULE_ANALYZER_ENGINE, rules=rules)
+    metrics.add("analyze", time.monotonic() - analyzed, items=len(issues))
+
+    # Конфликты затрагивают разные группы, поэтому ищутся по всему расписанию (если оно менялось)
+    conflicts = None
+    if settings.SCHEDULE_DETECT_CONFLICTS and (groups is None or groups):
+        schedule_data = merge_events(other_results, schedule_data)
+        analyzed = time.monotonic()
+        conflicts = ScheduleAnalyzer.find_conflicts(schedule_data, rules=rules)
+        metrics.add("analyze", time.monotonic() - analyzed, items=len(conflicts))
+        print(f"⏱ Найдено конфликтов по времени: {len(conflicts)}")
+    metrics.record_rules(rules.timings)
+    progress.publish("analyzed", issues=len(issues), conflicts=len(conflicts or ()))
+
+    #  Безопасное обновление БД: пишем только разницу
+    writer = IssueWriter(batch_size=settings.SCHEDULE_WRITE_BATCH_SIZE, metrics=metrics)
+    if groups is None:
+        issues.extend(conflicts or [])
+        if not issues:
+            print("⚠️ Новые данные не загружены, старые не удаляем!")
+            return 0, 0
+        created, deleted = writer.sync(issues, keep_groups=failed_groups)
+        save_ical_cache(cached)
+        return created, deleted
+
+    created, deleted = writer.sync(issues, groups, categories=rules.categories(PAIR, DAY), keep_groups=failed_groups)
+    if conflicts is not None:
+        conflicts_created, conflicts_deleted = writer.sync(conflicts, categories=rules.categories(OVERLAP),
+                                                           keep_groups=failed_groups)
+        created, deleted = created + conflicts_created, deleted + conflicts_deleted
+    # Проблемы неизменившихся календарей тоже подтверждены этим обновлением. Конфликты — только если
+    # их поиск включён: иначе они не проверялись (без изменений в расписании они остаются верными)
+    confirmed = rules.categories(PAIR, DAY)
+    if settings.SCHEDULE_DETECT_CONFLICTS:
+        confirmed += rules.categories(OVERLAP)
+    writer.touch(failed_groups, categories=confirmed)
+    save_ical_cache(cached)
+    return created, deleted
+
+
+def stream_schedule_update(incremental, links=None, metrics=None, progress=None):
+    """Потоковое обновление: календари групп загружаются, анализируются и записываются по одному.
+
+    В памяти находится не больше одного календаря и одной пачки записи. links — только эти
+    календари групп (по умолчанию все из каталога). Дни групп берутся из тех же календарей,
+    что и в rebuild_schedule; конфликты по времени требуют всего расписания и здесь не ищутся.
+    Возвращает (created, deleted).
+    """
+    metrics = metrics or RefreshMetrics()
+    progress = progress or task_progress()
+    catalog = None  # Весь каталог: обновление полное
+    if links is None:
+        catalog = [
+            schedule for schedule in schedule_catalog().refresh(metrics)
+            if ScheduleService.is_group_schedule(schedule)
+        ]
+        links = [schedule["iCalLink"] for schedule in catalog]
+    planner = RefreshPlanner(redis_client)
+    rules = analysis_rules()
+    skip_unchanged = incremental and ScheduleIssue.objects.exists()
+    stats = {"loaded": 0, "failed": 0, "changed": 0}
+    seen_groups, failed_links = set(), set()
+    pending = []  # Календари, проблемы которых ещё не записаны: их записи кэша ждут save_ical_cache
+
+    def chunks():
+        for result in ScheduleService.iter_icals(links, **fetch_options()):
+            metrics.record_fetch(result)
+            progress.progress(calendars=stats["loaded"] + stats["failed"] + 1, total=len(links))
+            if not result.ok:
+                stats["failed"] += 1
+                failed_links.add(result.url)
+                print(f"⚠️ Не удалось загрузить {result.url}: {result.error}")
+                continue
+            stats["loaded"] += 1
+            planner.record([result])
+            pending.append(FetchResult(result.url, [], cache_payload=result.cache_payload))
+            result.cache_payload = None
+            if catalog is not None:
+                seen_groups.update(event_groups(result.events))
+            if result.changed:
+                stats["changed"] += 1
+            elif skip_unchanged:
+                continue
+
+            groups = event_groups(result.events) | result.previous_groups
+            issues = ScheduleAnalyzer.iter_issues(result.events, engine=settings.SCHEDULE_ANALYZER_ENGINE, rules=rules)
+            yield groups, metrics.timed("analyze", issues)
+
+    # Время ожидания календарей (fetch) и анализа (analyze) учитывается отдельно от записи
+    writer = IssueWriter(batch_size=settings.SCHEDULE_WRITE_BATCH_SIZE, metrics=metrics)
+    def committed():
+        # Пачка записана: календари, выданные до неё, можно отметить в кэше
+        save_ical_cache(pending)
+        pending.clear()
+
+    created, deleted = writer.sync_chunks(metrics.timed("fetch", chunks()), categories=rules.categories(PAIR, DAY),
+                                          on_sync=committed)
+    committed()
+    metrics.record_rules(rules.timings)
+    print(f"📥 Загружено календарей: {stats['loaded']}/{len(links)}, изменилось: {stats['changed']}")
+    progress.publish("fetched", calendars=stats["loaded"], failed=stats["failed"], changed=stats["changed"])
+    progress.publish("analyzed", issues=metrics.as_dict().get("analyze", {}).get("items", 0))
+    if links and not stats["loaded"]:
+        raise RuntimeError("Не удалось загрузить ни одного календаря")
+
+    if catalog is not None:
+        # Полное обновление: удаляем проблемы групп, пропавших из каталога, остальные подтверждаем.
+        # Конфликты по времени здесь не ищутся, поэтому их last_updated не трогаем
+        keep_groups = failed_groups(catalog, failed_links)
+        vanished = IssueWriter.vanished_groups(seen_groups, keep_groups)
+        if vanished:
+            print(f"♻️ Пропало групп: {len(vanished)}")
+            vanished_created, vanished_deleted = writer.sync([], vanished, categories=rules.categories(PAIR, DAY))
+            created, deleted = created + vanished_created, deleted + vanished_deleted
+        writer.touch(keep_groups, categories=rules.categories(PAIR, DAY))
+    return created, deleted
+
+
+def issue_summary(group=None, teacher=None):
+    """Число проблем по категориям для фильтра (один агрегирующий запрос) и ссылка на список"""
+    filters = {key: value for key, value in (("group", group), ("teacher", teacher)) if value}
+    rows = (ScheduleIssue.objects.for_filters(group, teacher)
+            .values("issue_type__name").annotate(count=Count("id")).order_by("issue_type__name"))
+    categories = {row["issue_type__name"]: row["count"] for row in rows}
+    return {
+        "filters": filters,
+        "total": sum(categories.values()),
+        "categories": categories,
+        "results": "/api/issueslist" + (f"?{urlencode(filters)}" if filters else ""),
+    }
+
+
+def issue_list_cache():
+    """Кэш ответов списка проблем или None, если он отключён"""
+    if not settings.SCHEDULE_RESPONSE_CACHE:
+        return None
+    return IssueListCache(redis_client, ttl=settings.SCHEDULE_RESPONSE_CACHE_TTL)
+
+
+def publish_issues(full=True):
+    """Пересчитывает статистику проблем, объявляет новое поколение данных (старые ответы
+    из кэша больше не отдаются) и прогревает кэш.
+
+    full — завершилось полное обновление: от него отсчитывается возраст данных.
+    Возвращает номер поколения.
+    """
+    print(f"🧮 Статистика проблем пересчитана: строк {IssueStats.rebuild()}")
+    cache = IssueListCache(redis_client, ttl=settings.SCHEDULE_RESPONSE_CACHE_TTL)
+    generation = cache.bump(refreshed_at=time.time() if full else None)
+    print(f"🧊 Поколение данных: {generation}")
+
+    if settings.SCHEDULE_RESPONSE_CACHE and settings.SCHEDULE_PREWARM_FILTERS:
+        from .views import prewarm_issue_list  # views импортирует tasks
+        try:
+            warmed = prewarm_issue_list(cache, cache.popular(settings.SCHEDULE_PREWARM_FILTERS))
+            print(f"🔥 Прогрето популярных запросов: {warmed}")
+        except Exception as e:
+            print(f"⚠️ Не удалось прогреть кэш ответов: {e}")
+    return generation
+
+
+def analysis_rules():
+    """Правила анализа и их пороги из настроек"""
+    return RuleEngine(settings.SCHEDULE_RULES or None, params={
+        "long_window": {"min_gap": timedelta(minutes=settings.SCHEDULE_LONG_WINDOW_MINUTES)},
+        "impossible_transition": {"min_travel": timedelta(minutes=settings.SCHEDULE_MIN_TRAVEL_MINUTES)},
+    })
+
+
+def fetch_options():
+    """Параметры параллельной загрузки календарей из настроек"""
+    return {
+        "workers": settings.SCHEDULE_FETCH_WORKERS,
+        "per_host": settings.SCHEDULE_FETCH_PER_HOST,
+        "timeout": settings.SCHEDULE_FETCH_TIMEOUT,
+        "retries": settings.SCHEDULE_FETCH_RETRIES,
+        "compact": settings.SCHEDULE_COMPACT_EVENTS,
+        "fast_parser": settings.SCHEDULE_FAST_PARSER,
+        "expand": settings.SCHEDULE_EXPAND_RECURRENCE,
+        "window": analysis_window(),
+        "cache": ical_cache(),
+        "defer_cache": True,  # Записи кэша сохраняет save_ical_cache после записи проблем
+    }
+
+
+def ical_cache():
+    """Кэш iCal-календарей или None, если он отключён"""
+    if not settings.SCHEDULE_ICAL_CACHE:
+        return None
+    return ICalCache(redis_client, ttl=settings.SCHEDULE_ICAL_CACHE_TTL)
+
+
+def save_ical_cache(results):
+    """Сохраняет записи кэша загруженных календарей (fetch_options откладывает их до записи в БД).
+
+    Вызывается только после того, как проблемы календарей записаны: если обновление упадёт
+    раньше, следующее инкрементальное снова увидит календари изменившимися.
+    """
+    cache = ical_cache()
+    for result in results:
+        if cache and result.cache_payload is not None:
+            cache.store(result.url, result.cache_payload)
+        result.cache_payload = None
+
+
+def analysis_window():
+    """Окно анализа из настроек: (первый день, день после последнего) или None — весь календарь"""
+    if settings.SCHEDULE_WINDOW_START and settings.SCHEDULE_WINDOW_END:
+        return (date.fromisoformat(settings.SCHEDULE_WINDOW_START),
+                date.fromisoformat(settings.SCHEDULE_WINDOW_END) + timedelta(days=1))
+    if settings.SCHEDULE_WINDOW_DAYS:
+        today = timezone.localdate()
+        return today, today + timedelta(days=settings.SCHEDULE_WINDOW_DAYS)
+    return None
+
+
+def load_schedule_results(metrics=None):
+    """Параллельно загружает все календари.
+
+    Возвращает (успешные FetchResult, группы незагруженных календарей групп, ссылки на календари
+    групп). Проблемы незагруженных групп при синхронизации не трогаются, иначе временная
+    ошибка загрузки стёрла бы их.
+    """
+    metrics = metrics or RefreshMetrics()
+    catalog = schedule_catalog().refresh(metrics)
+    links = [schedule["iCalLink"] for schedule in catalog]
+    with metrics.measure("fetch"):
+        if settings.SCHEDULE_PARALLEL_PROCESSES > 1:
+            results = ParallelAnalyzer.fetch_icals(links, settings.SCHEDULE_PARALLEL_PROCESSES, **fetch_options())
+        else:
+            results = ScheduleService.fetch_icals(links, **fetch_options())
+    for result in results:
+        metrics.record_fetch(result)
+
+    RefreshPlanner(redis_client).record(results)
+    failed = [result for result in results if not result.ok]
+    changed = sum(1 for result in results if result.ok and result.changed)
+    print(f"📥 Загружено календарей: {len(results) - len(failed)}/{len(results)}, изменилось: {changed}")
+    for result in failed:
+        print(f"⚠️ Не удалось загрузить {result.url}: {result.error}")
+    if results and len(failed) == len(results):
+        raise RuntimeError("Не удалось загрузить ни одного календаря")
+
+    group_links = {schedule["iCalLink"] for schedule in catalog if ScheduleService.is_group_schedule(schedule)}
+    return ([result for result in results if result.ok], failed_groups(catalog, {result.url for result in failed}),
+            group_links)
+
+
+def failed_groups(catalog, failed_links):
+    """Группы, календари которых не загрузились (по названиям в каталоге)"""
+    return {
+        schedule["targetTitle"] for schedule in catalog
+        if schedule["iCalLink"] in failed_links and ScheduleService.is_group_schedule(schedule)
+    }
+
+
+def merge_events(results, events=None):
+    """Объединяет занятия календарей (events — дополнить уже собранные занятия)"""
+    if settings.SCHEDULE_COMPACT_EVENTS:
+        table = EventTable() if events is None else events
+        for result in results:
+            table.extend(result.events)
+        return table
+    events = [] if events is None else events
+    for result in results:
+        events.extend(result.events)
+    return events
+
+
+def changed_groups(results):
+    """Группы, расписание которых могло измениться: из новой и прошлой версии изменившихся календарей"""
+    groups = set()
+    for result in results:
+        if result.changed:
+            groups.update(event_groups(result.events))
+            groups.update(result.previous_groups)
+    return groups
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from issue_analizer.services.ical_parser import UnsupportedCalendar, iter_events
+from issue_analizer.services.schedule_service import ScheduleService
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "ical"
+
+
+def fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+class FastParserTest(SimpleTestCase):
+    """Построчный парсер (SCHEDULE_FAST_PARSER) даёт то же, что разбор через icalendar.
+
+    Календари в fixtures/ical — в формате ленты МИРЭА (?includeMeta=true): перенос строк
+    по 75 октетов, экранирование, TZID, RRULE, EXDATE, RECURRENCE-ID, даты без времени.
+    """
+
+    MODES = (
+        {},
+        {"expand": True},
+        {"expand": True, "window": (date(2025, 2, 17), date(2025, 3, 3))},
+        {"window": (date(2025, 2, 10), date(2025, 2, 12))},
+    )
+
+    def test_fixtures_exist(self):
+        self.assertGreaterEqual(len(list(FIXTURES.glob("*.ics"))), 3)
+
+    def test_fast_equals_icalendar(self):
+        for path in sorted(FIXTURES.glob("*.ics")):
+            data = path.read_text(encoding="utf-8")
+            for options in self.MODES:
+                with self.subTest(fixture=path.name, **{key: str(value) for key, value in options.items()}):
+                    self.assertEqual(ScheduleService.parse_ical(data, fast=True, **options),
+                                     ScheduleService.parse_ical(data, fast=False, **options))
+
+    def test_fast_table_equals_icalendar(self):
+        for path in sorted(FIXTURES.glob("*.ics")):
+            data = path.read_text(encoding="utf-8")
+            with self.subTest(fixture=path.name):
+                self.assertEqual(list(ScheduleService.parse_ical_table(data, fast=True)),
+                                 ScheduleService.parse_ical(data, fast=False))
+
+    def test_fast_parser_handles_fixtures(self):
+        """Фикстуры разбираются самим построчным парсером, а не запасным путём через icalendar"""
+        for path in sorted(FIXTURES.glob("*.ics")):
+            with self.subTest(fixture=path.name):
+                try:
+                    list(iter_events(path.read_text(encoding="utf-8"), expand=True))
+                except UnsupportedCalendar as e:
+                    self.fail(f"{path.name}: {e}")
+
+    def test_folding_and_escapes(self):
+        events = ScheduleService.parse_ical(fixture("group_recurring.ics"), fast=True)
+        self.assertEqual(events[1]["location"], "ИВЦ-105, компьютерный класс (В-78)")
+        self.assertEqual(events[2]["discipline"],
+                         "Основы проектирования информационных систем и баз данных; лабораторный практикум")
+
+        events = ScheduleService.parse_ical(fixture("group_utc.ics"), fast=True)
+        self.assertEqual(events[0]["teacher"], "Алексеев Алексей Алексеевич")  # Перенос с табуляцией
+        self.assertEqual(events[1]["summary"], "ПР Иностранный язык\nАнглийский")
+        self.assertEqual(events[1]["location"], "Онлайн\\СДО")
+        self.assertEqual(events[0]["start"].utcoffset(), timedelta(0))
+
+        events = ScheduleService.parse_ical(fixture("teacher.ics"), fast=True)
+        self.assertEqual(events[0]["group"].split(", ")[-1], "ИКБО-06-23")
+
+    def test_recurrence(self):
+        events = ScheduleService.parse_ical(fixture("group_recurring.ics"), fast=True, expand=True)
+        lectures = sorted(event["start"] for event in events if event["summary"] == "ЛК Математический анализ")
+        days = [moment.date() for moment in lectures]
+        self.assertEqual(lectures[0].utcoffset(), timedelta(hours=3))
+        self.assertNotIn(date(2025, 2, 24), days)  # EXDATE
+        self.assertNotIn(date(2025, 3, 10), days)
+        self.assertEqual(days.count(date(2025, 2, 17)), 1)  # Перенесено через RECURRENCE-ID
+        self.assertEqual(lectures[days.index(date(2025, 2, 17))].hour, 10)
+        self.assertEqual(days[-1], date(2025, 5, 19))  # UNTIL
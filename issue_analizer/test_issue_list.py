@@ -0,0 +1,43 @@
+import json
+
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from issue_analizer.models import ScheduleIssue
+from issue_analizer.serializers import IssueSerializer, IssueValuesSerializer
+from issue_analizer.services.issue_writer import IssueWriter
+from issue_analizer.services.schedule_analyzer import ScheduleAnalyzer
+from issue_analizer.test_schedule_analyzer import synthetic_events
+
+
+def render(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+class IssueValuesSerializerTest(TestCase):
+    """IssueValuesSerializer (values() и сборка словарей) отдаёт тот же JSON, что IssueSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        events = synthetic_events(groups=4, weeks=1)
+        IssueWriter().create(ScheduleAnalyzer.find_issues(events) + ScheduleAnalyzer.find_conflicts(events))
+
+    def test_same_json(self):
+        queryset = ScheduleIssue.objects.order_by("id")
+        self.assertTrue(queryset.exists())
+        expected = render(IssueSerializer(
+            queryset.select_related("issue_type", "related_event", "related_event_2"), many=True
+        ).data)
+        self.assertEqual(render(IssueValuesSerializer.serialize(queryset)), expected)
+
+    def test_filtered_page(self):
+        group = ScheduleIssue.objects.values_list("related_event__group", flat=True).first()
+        queryset = ScheduleIssue.objects.for_filters(group=group.lower()).order_by("-id")[:5]
+        rows = list(IssueValuesSerializer.values(queryset))
+        self.assertEqual(render(IssueValuesSerializer.serialize(rows)),
+                         render(IssueSerializer(queryset, many=True).data))
+
+    def test_single_query(self):
+        queryset = ScheduleIssue.objects.order_by("id")
+        with self.assertNumQueries(1):
+            IssueValuesSerializer.serialize(queryset)
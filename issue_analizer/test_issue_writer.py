@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from issue_analizer.models import ScheduleEvent, ScheduleIssue
+from issue_analizer.services.issue_writer import IssueWriter
+from issue_analizer.services.schedule_analyzer import ScheduleAnalyzer
+from issue_analizer.test_schedule_analyzer import synthetic_events
+
+
+def fingerprints(**filters):
+    return set(ScheduleIssue.objects.filter(**filters).values_list("fingerprint", flat=True))
+
+
+class IssueWriterSyncTest(TestCase):
+    """IssueWriter.sync пишет только разницу по отпечаткам: новые проблемы создаются, исчезнувшие удаляются"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.issues = ScheduleAnalyzer.find_issues(synthetic_events(groups=4, weeks=1))
+        cls.expected = {ScheduleAnalyzer.fingerprint(issue) for issue in cls.issues}
+        cls.groups = sorted({issue["group"] for issue in cls.issues})
+
+    def setUp(self):
+        self.writer = IssueWriter(batch_size=7)  # Несколько пачек даже на маленьких данных
+
+    def test_full_sync(self):
+        self.assertEqual(self.writer.sync(self.issues), (len(self.expected), 0))
+        self.assertEqual(fingerprints(), self.expected)
+        self.assertEqual(self.writer.sync(self.issues), (0, 0))
+        self.assertEqual(ScheduleIssue.objects.count(), len(self.expected))
+
+    def test_vanished_issues_are_deleted(self):
+        self.writer.sync(self.issues)
+        kept = self.issues[::2]
+        kept_fingerprints = {ScheduleAnalyzer.fingerprint(issue) for issue in kept}
+        self.assertEqual(self.writer.sync(kept), (0, len(self.expected - kept_fingerprints)))
+        self.assertEqual(fingerprints(), kept_fingerprints)
+        # Занятия удалённых проблем тоже удалены
+        self.assertFalse(ScheduleEvent.objects.filter(related_event__isnull=True, related_event_2__isnull=True).exists())
+
+    def test_scoped_sync(self):
+        self.writer.sync(self.issues)
+        group, other = self.groups[0], self.groups[1]
+        # Проблемы группы исчезли: сравнение только в пределах groups, другие группы не трогаются
+        self.writer.sync([], groups={group})
+        self.assertFalse(fingerprints(related_event__group=group))
+        self.assertEqual(fingerprints(related_event__group=other),
+                         {ScheduleAnalyzer.fingerprint(issue) for issue in self.issues if issue["group"] == other})
+
+        restored = [issue for issue in self.issues if issue["group"] == group]
+        self.assertEqual(self.writer.sync(restored, groups={group}), (len(restored), 0))
+        self.assertEqual(fingerprints(), self.expected)
+
+    def test_keep_groups(self):
+        self.writer.sync(self.issues)
+        group = self.groups[0]
+        # Календарь группы не загрузился: её проблемы остаются, новые для неё не пишутся
+        self.writer.sync([], keep_groups={group})
+        self.assertEqual(fingerprints(),
+                         {ScheduleAnalyzer.fingerprint(issue) for issue in self.issues if issue["group"] == group})
+
+    def test_stale_fingerprint_is_replaced(self):
+        self.writer.sync(self.issues)
+        issue = ScheduleIssue.objects.first()
+        ScheduleIssue.objects.filter(pk=issue.pk).update(fingerprint="0" * 40)  # Устаревший отпечаток
+        self.assertEqual(self.writer.sync(self.issues), (1, 1))
+        self.assertEqual(fingerprints(), self.expected)
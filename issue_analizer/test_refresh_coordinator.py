@@ -0,0 +1,85 @@
+import threading
+import unittest
+import uuid
+
+import redis
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from issue_analizer.services.refresh_coordinator import RefreshCoordinator
+
+
+class RefreshCoordinatorTest(SimpleTestCase):
+    """Захват и снятие блокировки обновления в Redis из CELERY_BROKER_URL.
+
+    Каждый тест работает со своим scope, поэтому блокировки приложения не затрагиваются.
+    Без Redis тесты пропускаются.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.redis = redis.StrictRedis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+        try:
+            cls.redis.ping()
+        except redis.RedisError as e:
+            raise unittest.SkipTest(f"Redis недоступен: {e}")
+
+    def setUp(self):
+        self.scope = f"test-{uuid.uuid4().hex}"
+        self.coordinator = RefreshCoordinator(self.redis, ttl=60, scope=self.scope)
+        self.addCleanup(self.redis.delete, self.coordinator.active_key, self.coordinator.waiters_key)
+
+    def test_claim_and_release(self):
+        self.assertTrue(self.coordinator.claim("first"))
+        self.assertFalse(self.coordinator.claim("second"))
+        self.assertEqual(self.coordinator.active(), "first")
+
+        self.assertFalse(self.coordinator.release("second"))  # Чужую блокировку не снять
+        self.assertEqual(self.coordinator.active(), "first")
+        self.assertTrue(self.coordinator.release("first"))
+        self.assertIsNone(self.coordinator.active())
+        self.assertTrue(self.coordinator.claim("second"))
+
+    def test_requests_join_active_refresh(self):
+        self.assertEqual(self.coordinator.request("first", "group=A"), ("first", 0, True))
+        self.assertEqual(self.coordinator.request("second", "group=B"), ("first", 1, False))
+        self.assertEqual(self.coordinator.request("third"), ("first", 2, False))
+        self.assertEqual(self.coordinator.waiters(), ["group=B", ""])
+
+        # Новое обновление начинается с пустой очереди
+        self.coordinator.release("first")
+        self.assertEqual(self.coordinator.depth(), 0)
+        self.assertEqual(self.coordinator.request("fourth"), ("fourth", 0, True))
+        self.assertEqual(self.coordinator.depth(), 0)
+
+    def test_finished_task_is_replaced(self):
+        self.coordinator.claim("finished")
+        task_id, position, start = self.coordinator.request("next", is_finished=lambda task: task == "finished")
+        self.assertEqual((task_id, position, start), ("next", 0, True))
+
+    def test_scoped_lists_own_scope(self):
+        self.coordinator.claim("first")
+        scoped = RefreshCoordinator(self.redis).scoped()
+        self.assertEqual(scoped.get(self.scope), "first")
+        RefreshCoordinator(self.redis).scoped(is_finished=lambda task: task == "first")
+        self.assertIsNone(self.coordinator.active())
+
+    def test_concurrent_requests_start_one_refresh(self):
+        results = []
+        barrier = threading.Barrier(10)
+
+        def request(index):
+            barrier.wait()
+            results.append(self.coordinator.request(f"task-{index}"))
+
+        threads = [threading.Thread(target=request, args=(index,)) for index in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        started = [task_id for task_id, _, start in results if start]
+        self.assertEqual(len(started), 1)
+        self.assertEqual({task_id for task_id, _, _ in results}, set(started))
+        self.assertEqual(sorted(position for _, position, _ in results), list(range(10)))
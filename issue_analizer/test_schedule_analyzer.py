@@ -0,0 +1,67 @@
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from issue_analizer.services.event_table import EventTable
+from issue_analizer.services.parallel_analyzer import ParallelAnalyzer
+from issue_analizer.services.schedule_analyzer import ScheduleAnalyzer
+from issue_analizer.services.schedule_service import ScheduleService
+from issue_analizer.services.synthetic_schedule import SyntheticSchedule
+
+
+def synthetic_events(**params):
+    schedule = SyntheticSchedule(**{"groups": 8, "teachers": 12, "rooms": 6, "weeks": 2, "seed": 3, **params})
+    return [event for _, calendar in schedule.calendars() for event in ScheduleService.parse_ical(calendar, fast=True)]
+
+
+class AnalyzerEngineTest(SimpleTestCase):
+    """Движки анализа (SCHEDULE_ANALYZER_ENGINE) находят одни и те же проблемы в одном порядке.
+
+    Данные — синтетическое расписание (SyntheticSchedule), как в benchmark_schedule.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.events = synthetic_events()
+        cls.expected = ScheduleAnalyzer.find_issues(cls.events, engine="python")
+
+    def test_dataset_has_issues(self):
+        self.assertTrue(self.expected)
+
+    def test_numpy_equals_python(self):
+        for events in (self.events, EventTable(self.events)):
+            with self.subTest(source=type(events).__name__):
+                self.assertEqual(ScheduleAnalyzer.find_issues(events, engine="numpy"), self.expected)
+
+    def test_python_table_equals_rows(self):
+        self.assertEqual(ScheduleAnalyzer.find_issues(EventTable(self.events), engine="python"), self.expected)
+
+    def test_window(self):
+        first = min(event["start"] for event in self.events).date()
+        window = (first, date.fromordinal(first.toordinal() + 7))
+        expected = ScheduleAnalyzer.find_issues(self.events, engine="python", window=window)
+        self.assertLess(len(expected), len(self.expected))
+        self.assertEqual(ScheduleAnalyzer.find_issues(self.events, engine="numpy", window=window), expected)
+
+
+class ParallelAnalyzerTest(SimpleTestCase):
+    """Анализ в нескольких процессах (SCHEDULE_PARALLEL_PROCESSES) совпадает с последовательным, включая порядок"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.events = synthetic_events()
+        cls.expected = ScheduleAnalyzer.find_issues(cls.events, engine="python")
+
+    def test_shards_cover_groups_once(self):
+        shards = ParallelAnalyzer.shard_groups(self.events, 3)
+        groups = [group for shard in shards for group in shard]
+        self.assertEqual(len(shards), 3)
+        self.assertCountEqual(groups, {event["group"] for event in self.events})
+
+    def test_parallel_equals_sequential(self):
+        for engine in ("python", "numpy"):
+            for events in (self.events, EventTable(self.events)):
+                with self.subTest(engine=engine, source=type(events).__name__):
+                    self.assertEqual(ParallelAnalyzer.find_issues(events, 2, engine=engine), self.expected)
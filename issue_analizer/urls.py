@@ -1,13 +1,21 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import IssueAPIView, ScheduleProcessingView, TaskStatusView
+from .views import (
+    IssueAPIView, IssueExportView, IssueStatsView, ScheduleMetricsView, ScheduleProcessingView, TaskEventsView,
+    TaskStatusView,
+)
 
 router = DefaultRouter()
 
 urlpatterns = [
     path('issueslist', IssueAPIView.as_view()),
+    path('issueslist/export.<str:export_format>', IssueExportView.as_view()),  # Выгрузка: ndjson или csv
+    path('issues/stats', IssueStatsView.as_view()),  # Статистика проблем по разрезам
     path('schedule/process', ScheduleProcessingView.as_view()),  # Запуск обработки
     path('schedule/process/<str:task_id>/', TaskStatusView.as_view()),  # Проверка статуса
+    path('schedule/process/<str:task_id>/events', TaskEventsView.as_view()),  # Ход задачи (Server-Sent Events)
+    path('schedule/metrics', ScheduleMetricsView.as_view()),  # Метрики этапов обновления (JSON)
+    path('schedule/metrics/prometheus', ScheduleMetricsView.as_view(), {"prometheus": True}),
 ]
 urlpatterns += router.urls
@@ -1,99 +1,216 @@
+import json
+import time
 import redis
-import hashlib
+from asgiref.sync import sync_to_async
+from datetime import datetime
+from redis import asyncio as aioredis
+from urllib.parse import parse_qs, urlencode, urlsplit
 from celery.result import AsyncResult
 
 from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from django.utils.timezone import now
-from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.timezone import get_current_timezone
+from django.views import View
 from django.conf import settings
 
-from .tasks import update_schedule_task
-from issue_analizer.models import ScheduleIssue, ScheduleEvent, IssueCategory
-from issue_analizer.serializers import IssueSerializer
-from issue_analizer.services.schedule_service import ScheduleService
-from issue_analizer.services.schedule_analyzer import ScheduleAnalyzer
+from .tasks import (
+    issue_list_cache, issue_summary, refresh_coordinator, start_refresh, data_age, refresh_scope,
+)
+from issue_analizer.models import ScheduleIssue
+from issue_analizer.serializers import IssueSerializer, IssueValuesSerializer
+from issue_analizer.services.issue_export import IssueExporter
+from issue_analizer.services.issue_stats import IssueStats
+from issue_analizer.services.response_cache import IssueListCache
+from issue_analizer.services.refresh_metrics import RefreshMetrics
+from issue_analizer.services.task_progress import TaskProgress
 
 
 
 
+class IssueCursorPagination(CursorPagination):
+    """Курсорная (keyset) пагинация по id: без COUNT(*) и OFFSET на дальних страницах"""
+    ordering = "id"
+
+    def first_page(self, queryset):
+        """Первая страница без HTTP-запроса (прогрев кэша) — то же, что paginate_queryset без курсора.
+
+        Ссылки на соседние страницы тогда содержат только курсор (см. cursor_of).
+        """
+        self.base_url = ""
+        self.ordering = self.get_ordering(None, queryset, None)
+        self.cursor = None
+        results = list(queryset.order_by(*self.ordering)[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        self.has_previous = False
+        self.has_next = len(results) > len(self.page)
+        if self.has_next:
+            self.next_position = self._get_position_from_instance(results[-1], self.ordering)
+        return self.page
+
+    def cursor_of(self, link):
+        """Курсор из ссылки на страницу (None — страницы нет)"""
+        return parse_qs(urlsplit(link).query)[self.cursor_query_param][0] if link else None
+
+
 class IssueAPIView(ListAPIView):
     """API-контроллер для получения списка ошибок в расписании"""
     serializer_class = IssueSerializer
+    pagination_class = IssueCursorPagination
 
     def get_queryset(self):
-        """Перед выдачей данных проверяет их актуальность и обновляет при необходимости"""
-        queryset = ScheduleIssue.objects.all()
-        group = self.request.query_params.get("group")
-        teacher = self.request.query_params.get("teacher")
-
-        if group:
-            queryset = queryset.filter(related_event__group__icontains=group)
-        if teacher:
-            queryset = queryset.filter(related_event__teacher__icontains=teacher)
-
-        return queryset
-
-    def is_data_fresh(self):
-        """Проверяет, обновлялись ли данные за последние 24 часа"""
-        last_issue = ScheduleIssue.objects.order_by("-last_updated").first()
-        return last_issue and (now() - last_issue.last_updated).total_seconds() < 86400  # 24 часа
-
-    def update_schedule(self):
-        """Обновляет данные расписания и ошибки в БД"""
-        print("🗑 Очищаем старые данные...")
-        ScheduleIssue.objects.all().delete()
-
-        # Загружаем расписание
-        schedule_data = []
-        for schedule in ScheduleService.fetch_schedule():
-            schedule_data.extend(ScheduleService.fetch_ical(schedule["iCalLink"]))
-
-        # Анализируем неудобства
-        issues = ScheduleAnalyzer.find_issues(schedule_data)
-
-        # Сохраняем в БД
-        with transaction.atomic():
-            for issue in issues:
-                category, _ = IssueCategory.objects.get_or_create(name=issue["category"])
-
-                related_event = ScheduleEvent.objects.create(
-                    summary=truncate_text(issue["summary"], 255),
-                    start_time=issue["start"],
-                    end_time=issue["end"],
-                    location=truncate_text(issue["location"], 255),
-                    teacher=truncate_text(issue["teacher"], 255),
-                    group=truncate_text(issue["group"], 255),
-                    discipline=truncate_text(issue["discipline"], 255),
-                )
-
-                related_event_2 = ScheduleEvent.objects.create(
-                    summary=truncate_text(issue["related_summary_2"], 255),
-                    start_time=issue["related_start_2"],
-                    end_time=issue["related_end_2"],
-                    location=truncate_text(issue["related_location_2"], 255),
-                    teacher=truncate_text(issue["related_teacher_2"], 255),
-                    group=truncate_text(issue["related_group_2"], 255),
-                    discipline=truncate_text(issue["related_discipline_2"], 255),
-                )
-
-                # 🔹 Создаём запись об ошибке и привязываем оба события
-                issue_obj = ScheduleIssue.objects.create(
-                    issue_type=category,
-                    related_event=related_event,
-                    related_event_2=related_event_2,
-                    description=truncate_text(issue["description"], 255),
-                    last_updated=now()
-                )
-
-
-def truncate_text(text, max_length=255):
-    text = str(text)
-    if len(text) > max_length:
-        return text[:max_length]
-    return text
+        """Проблемы по фильтрам group и teacher запроса"""
+        return self.issues(self.request.query_params.get("group"), self.request.query_params.get("teacher"))
+
+    @staticmethod
+    def issues(group=None, teacher=None):
+        """Проблемы по фильтрам (нормализуются так же, как в ключе кэша ответов)"""
+        group, teacher = IssueListCache.normalize(group, teacher)
+        queryset = ScheduleIssue.objects.for_filters(group=group, teacher=teacher)
+        return queryset.select_related("issue_type", "related_event", "related_event_2")
+
+    def list(self, request, *args, **kwargs):
+        """Страница проблем из кэша ответов, при промахе — из БД с сохранением в кэш.
+
+        Чтение никогда не запускает обновление: возраст данных отдаётся в заголовках
+        X-Data-Age и X-Data-Refreshed-At, а обновление выполняет celery beat.
+        """
+        cache = issue_list_cache()
+        if cache is None or request.accepted_renderer.format != "json":
+            refreshed_at = self.refreshed_at()
+            response = self.get_paginated_response(self.page_results())
+            response.data["refreshed_at"] = self.format_refreshed_at(refreshed_at)
+            return self.with_data_age(response, refreshed_at)
+
+        filters = IssueListCache.filters(request.query_params.get("group"), request.query_params.get("teacher"))
+        cursor = request.query_params.get(self.paginator.cursor_query_param)
+        generation, refreshed_at, page = cache.get(filters, cursor)
+        if page is None:
+            page = self.cached_page(self.paginator, self.page_results(), refreshed_at)
+            cache.set(generation, filters, cursor, page)
+        return self.with_data_age(HttpResponse(self.render_page(page), content_type="application/json"), refreshed_at)
+
+    @classmethod
+    def cached_page(cls, paginator, results, refreshed_at):
+        """Страница для кэша ответов: курсоры соседних страниц и JSON без ссылок.
+
+        Ссылки зависят от адреса запроса (хост, лишние параметры), поэтому строятся при выдаче.
+        """
+        # Время обновления не меняется внутри поколения, поэтому его можно кэшировать в теле
+        body = {"results": results, "refreshed_at": cls.format_refreshed_at(refreshed_at)}
+        return {
+            "next": paginator.cursor_of(paginator.get_next_link()),
+            "previous": paginator.cursor_of(paginator.get_previous_link()),
+            "body": JSONRenderer().render(body).decode(),
+        }
+
+    def render_page(self, page):
+        """JSON страницы из кэша со ссылками на соседние страницы для текущего запроса"""
+        url = self.request.build_absolute_uri()
+        cursor_param = self.paginator.cursor_query_param
+        links = {
+            name: replace_query_param(url, cursor_param, page[name]) if page[name] else None
+            for name in ("next", "previous")
+        }
+        # Склеиваем готовые строки, не разбирая закэшированный JSON
+        return JSONRenderer().render(links).decode()[:-1] + "," + page["body"][1:]
+
+    @staticmethod
+    def refreshed_at():
+        """Время последнего полного обновления (None, если его не было или Redis недоступен)"""
+        try:
+            return IssueListCache(redis_client).refreshed_at()
+        except redis.RedisError:
+            return None
+
+    @staticmethod
+    def format_refreshed_at(refreshed_at):
+        if refreshed_at is None:
+            return None
+        return datetime.fromtimestamp(refreshed_at, tz=get_current_timezone()).isoformat()
+
+    def with_data_age(self, response, refreshed_at):
+        """Заголовки с возрастом данных (секунды с последнего полного обновления)"""
+        if refreshed_at is not None:
+            response["X-Data-Age"] = str(max(0, int(time.time() - refreshed_at)))
+            response["X-Data-Refreshed-At"] = self.format_refreshed_at(refreshed_at)
+        return response
+
+    def page_results(self):
+        """Страница проблем: один запрос с JOIN через values() и лёгкая сериализация"""
+        rows = self.paginate_queryset(IssueValuesSerializer.values(self.get_queryset()))
+        return IssueValuesSerializer.serialize(rows)
+
+
+class IssueExportView(APIView):
+    """Выгрузка всех проблем по фильтру одним запросом: NDJSON или CSV, с gzip"""
+
+    def get(self, request, export_format):
+        if export_format not in IssueExporter.CONTENT_TYPES:
+            return Response({"error": f"Формат должен быть одним из: {', '.join(IssueExporter.CONTENT_TYPES)}"},
+                            status=400)
+
+        exporter = IssueExporter(export_format)
+        queryset = ScheduleIssue.objects.for_filters(
+            group=request.query_params.get("group"),
+            teacher=request.query_params.get("teacher"),
+        )
+        compress = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+        response = StreamingHttpResponse(exporter.stream(queryset, compress=compress),
+                                         content_type=exporter.content_type)
+        response["Content-Disposition"] = f'attachment; filename="issues.{export_format}"'
+        response["Vary"] = "Accept-Encoding"
+        if compress:
+            response["Content-Encoding"] = "gzip"
+        return response
+
+
+class IssueStatsView(APIView):
+    """Статистика проблем по категориям, группам, преподавателям, корпусам и неделям.
+
+    Читает материализованную таблицу IssueStat (пересчитывается при каждом обновлении).
+    Параметры: by — разрез, category — только эта категория, q — подстрока значения,
+    order — count или key, limit — число значений (до MAX_LIMIT).
+    """
+
+    MAX_LIMIT = 1000
+
+    def get(self, request):
+        by = request.query_params.get("by", "category")
+        order = request.query_params.get("order", "count")
+        if by not in IssueStats.DIMENSIONS:
+            return Response({"error": f"Разрез должен быть одним из: {', '.join(IssueStats.DIMENSIONS)}"}, status=400)
+        if order not in IssueStats.ORDERINGS:
+            return Response({"error": f"Порядок должен быть одним из: {', '.join(IssueStats.ORDERINGS)}"}, status=400)
+        try:
+            limit = min(max(int(request.query_params.get("limit", 100)), 1), self.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit должен быть числом"}, status=400)
+
+        category = request.query_params.get("category", "")
+        stats = IssueStats.top(by, category=category, search=request.query_params.get("q"), order=order, limit=limit)
+        return Response({"by": by, "category": category or None, **stats})
+
+
+def prewarm_issue_list(cache, filters):
+    """Заполняет кэш ответов первыми страницами запросов (после смены поколения данных).
+
+    filters — строки фильтров (IssueListCache.filters). Страницы строятся напрямую из
+    запроса к БД, без обработки HTTP-запроса.
+    """
+    generation, refreshed_at = cache.generation(), cache.refreshed_at()
+    for value in filters:
+        paginator = IssueCursorPagination()
+        rows = paginator.first_page(IssueValuesSerializer.values(IssueAPIView.issues(*cache.parse_filters(value))))
+        page = IssueAPIView.cached_page(paginator, IssueValuesSerializer.serialize(rows), refreshed_at)
+        cache.set(generation, value, None, page)
+    return len(filters)
 
 
 # Подключаем Redis
@@ -101,59 +218,145 @@ redis_client = redis.StrictRedis.from_url(settings.CELERY_BROKER_URL, decode_res
 
 
 class ScheduleProcessingView(APIView):
-    """API для запуска фоновой обработки расписания с очередью и уникальными запросами"""
-
-    REDIS_ACTIVE_TASK_KEY = "active_schedule_task"
-    REDIS_QUERY_HASH_KEY = "query_task_map"
+    """API для запуска фоновой обработки расписания: одновременные запросы объединяются в одно обновление"""
 
     def post(self, request):
-        """Запускаем обработку расписания (с управлением очередью и учётом параметров)"""
+        """Запускает обновление (глобальное или точечное по фильтру) или присоединяет запрос к уже идущему"""
 
-        # Получаем query параметры
+        # С фильтром обновляются только календари группы или преподавателя (если не идёт глобальное обновление)
         group = request.query_params.get("group", "")
         teacher = request.query_params.get("teacher", "")
+        query = urlencode({key: value for key, value in (("group", group), ("teacher", teacher)) if value})
+
+        task_id, position, started = start_refresh(query, group=group, teacher=teacher)
+        coordinator = refresh_coordinator()
+        if coordinator.active() != task_id:
+            coordinator = refresh_coordinator(refresh_scope(group, teacher))  # Точечное обновление
+
+        return Response({
+            "task_id": task_id,
+            "status": "STARTED" if started else "IN_QUEUE",
+            "position": position,
+            "queue_depth": coordinator.depth(),
+            "result": f"/api/schedule/process/{task_id}/" + (f"?{query}" if query else ""),
+            "events": f"/api/schedule/process/{task_id}/events",  # Ход задачи без опроса (Server-Sent Events)
+        }, status=201 if started else 202)
 
-        # Формируем уникальный ключ для запроса
-        query_string = f"group={group}&teacher={teacher}"
-        query_hash = hashlib.md5(query_string.encode()).hexdigest()
-
-        # Проверяем, есть ли уже активная задача
-        active_task_id = redis_client.get(self.REDIS_ACTIVE_TASK_KEY)
-
-        if active_task_id:
-            task_result = AsyncResult(active_task_id)
-
-            if task_result.state in ["PENDING", "STARTED"]:
-                # Проверяем, есть ли уже созданный task_id для этого запроса
-                existing_task_id = redis_client.hget(self.REDIS_QUERY_HASH_KEY, query_hash)
-                if existing_task_id:
-                    return Response({
-                        "task_id": existing_task_id,
-                        "status": "IN_QUEUE"
-                    }, status=202)
-
-        # Если новый запрос, создаём новую задачу
-        task = update_schedule_task.delay(group=group, teacher=teacher)
+    def get(self, request):
+        """Статус текущего обновления и очереди"""
+        coordinator = refresh_coordinator()
+        task_id = coordinator.active()
+        broker_queue = redis_client.llen(settings.CELERY_TASK_DEFAULT_QUEUE)
+        if not task_id:
+            return Response({"status": "NO_ACTIVE_TASK", "broker_queue": broker_queue}, status=404)
 
-        # Сохраняем новую задачу в Redis
-        redis_client.set(self.REDIS_ACTIVE_TASK_KEY, task.id, ex=3600)  # 1 час TTL
-        redis_client.hset(self.REDIS_QUERY_HASH_KEY, query_hash, task.id)  # Привязываем параметры к task_id
+        result = AsyncResult(task_id)
+        return Response({
+            "task_id": task_id,
+            "status": result.status,
+            "queue_depth": coordinator.depth(),
+            "broker_queue": broker_queue,  # Задачи в очереди Celery, ещё не взятые воркером
+        })
 
-        return Response({"task_id": task.id, "status": "STARTED"}, status=201)
 
-    def get(self, request):
-        """Проверяем статус задачи"""
+class ScheduleMetricsView(APIView):
+    """Метрики этапов обновления: последний запуск и накопленные итоги (JSON или формат Prometheus)"""
 
-        task_id = redis_client.get(self.REDIS_ACTIVE_TASK_KEY)
-        if not task_id:
-            return Response({"status": "NO_ACTIVE_TASK"}, status=404)
+    def get(self, request, prometheus=False):
+        data = RefreshMetrics.load(redis_client)
+        if prometheus:
+            return HttpResponse(RefreshMetrics.prometheus(data), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-        result = AsyncResult(task_id)
-        return Response({"task_id": task_id, "status": result.status, "result": result.result})
+        coordinator = refresh_coordinator()
+        data["active_task"] = coordinator.active()
+        data["queue_depth"] = coordinator.depth()
+        data["data_age"] = data_age()
+        return Response(data)
 
 
 class TaskStatusView(APIView):
-    """API для получения статуса Celery-задачи"""
+    """API для получения статуса Celery-задачи (и сводки по фильтру после обновления)"""
     def get(self, request, task_id):
         result = AsyncResult(task_id)
-        return Response({"task_id": task_id, "status": result.status, "result": result.result})
+        data = {"task_id": task_id, "status": result.status}
+
+        if result.successful():
+            summary = result.result
+            group = request.query_params.get("group")
+            teacher = request.query_params.get("teacher")
+            if isinstance(summary, dict) and (group or teacher):
+                # Запрос присоединился к глобальному обновлению — сводка по его фильтру
+                summary = {**summary, **issue_summary(group, teacher)}
+            data["result"] = summary
+        elif result.failed():
+            data["result"] = str(result.result)
+        else:
+            coordinator = refresh_coordinator()
+            if coordinator.active() == task_id:
+                data["queue_depth"] = coordinator.depth()
+            data["result"] = None
+        return Response(data)
+
+
+def finished_event(task_id, seq):
+    """Событие завершения по результату Celery (если задача завершилась, а событий нет) или None"""
+    result = AsyncResult(task_id)
+    if not result.ready():
+        return None
+    return {"seq": seq, "event": "done" if result.successful() else "failed", "status": result.status}
+
+
+class TaskEventsView(View):
+    """Ход задачи обновления как Server-Sent Events: одно соединение вместо опроса TaskStatusView.
+
+    Сначала отдаётся история событий (при переподключении — после Last-Event-ID), затем
+    новые события из Redis pub/sub. Поток закрывается после done или failed. Асинхронное
+    представление: под ASGI (mirea_scheduler.asgi) соединение не занимает поток.
+    """
+
+    KEEPALIVE = 15  # Интервал комментариев-пингов, пока событий нет, с
+
+    async def get(self, request, task_id):
+        last_event_id = request.headers.get("Last-Event-ID", "")
+        after = int(last_event_id) if last_event_id.isdigit() else 0
+        response = StreamingHttpResponse(self.events(task_id, after), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx не должен буферизовать поток
+        return response
+
+    async def events(self, task_id, after):
+        client = aioredis.StrictRedis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+        pubsub = client.pubsub()
+        deadline = time.monotonic() + settings.SCHEDULE_TASK_EVENTS_TIMEOUT
+        try:
+            # Подписка до чтения истории: события между ними не теряются, повторы отсекаются по seq
+            await pubsub.subscribe(TaskProgress.channel(task_id))
+            history = await client.lrange(TaskProgress.history_key(task_id), 0, -1)
+            events = TaskProgress.decode(history, after)
+            if not events:
+                event = await sync_to_async(finished_event)(task_id, after + 1)
+                events = [event] if event else []
+
+            while True:
+                for event in events:
+                    if event["seq"] <= after:
+                        continue
+                    after = event["seq"]
+                    yield TaskProgress.sse(event)
+                    if event["event"] in TaskProgress.FINAL:
+                        return
+                if time.monotonic() >= deadline:
+                    return
+
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.KEEPALIVE)
+                if message is not None:
+                    events = [json.loads(message["data"])]
+                    continue
+                # Событий нет: задача могла завершиться, не отправив их (например, при сбое Redis)
+                event = await sync_to_async(finished_event)(task_id, after + 1)
+                events = [event] if event else []
+                if not events:
+                    yield ": keepalive\n\n"
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
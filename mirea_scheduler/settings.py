@@ -110,8 +110,93 @@ CELERY_RESULT_BACKEND = "redis://redis:6379/0"
 
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
 
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 50
-}
\ No newline at end of file
+}
+
+# Параллельная загрузка iCal-календарей
+SCHEDULE_FETCH_WORKERS = env.int("SCHEDULE_FETCH_WORKERS", default=16)
+SCHEDULE_FETCH_PER_HOST = env.int("SCHEDULE_FETCH_PER_HOST", default=8)
+SCHEDULE_FETCH_TIMEOUT = env.float("SCHEDULE_FETCH_TIMEOUT", default=30)
+SCHEDULE_FETCH_RETRIES = env.int("SCHEDULE_FETCH_RETRIES", default=3)
+
+# Кэш iCal-календарей в Redis (условные запросы ETag/Last-Modified + хэш содержимого)
+SCHEDULE_ICAL_CACHE = env.bool("SCHEDULE_ICAL_CACHE", default=True)
+SCHEDULE_ICAL_CACHE_TTL = env.int("SCHEDULE_ICAL_CACHE_TTL", default=7 * 24 * 3600)
+
+# Инкрементальное обновление: повторно анализируются только группы из изменившихся календарей
+SCHEDULE_INCREMENTAL = env.bool("SCHEDULE_INCREMENTAL", default=True)
+
+# Размер пачки bulk_create при записи проблем и занятий
+SCHEDULE_WRITE_BATCH_SIZE = env.int("SCHEDULE_WRITE_BATCH_SIZE", default=2000)
+
+# Потоковый режим: календари групп обрабатываются по одному, память ограничена одним календарём и пачкой записи.
+# Окна и переходы — те же, что и в обычном режиме, но конфликты по времени не ищутся
+SCHEDULE_STREAMING = env.bool("SCHEDULE_STREAMING", default=False)
+
+# Компактное колоночное представление занятий (EventTable) между разбором и анализом
+SCHEDULE_COMPACT_EVENTS = env.bool("SCHEDULE_COMPACT_EVENTS", default=True)
+
+# Движок анализа: "numpy" (векторизованный) или "python"; результаты совпадают
+SCHEDULE_ANALYZER_ENGINE = env("SCHEDULE_ANALYZER_ENGINE", default="numpy")
+
+# Поиск конфликтов по времени (преподаватель, аудитория, наложение занятий группы)
+SCHEDULE_DETECT_CONFLICTS = env.bool("SCHEDULE_DETECT_CONFLICTS", default=True)
+
+# Число процессов для разбора календарей и анализа групп (1 — без распараллеливания)
+SCHEDULE_PARALLEL_PROCESSES = env.int("SCHEDULE_PARALLEL_PROCESSES", default=1)
+
+# Быстрый построчный разбор iCal вместо icalendar (неподдерживаемые календари разбираются через icalendar)
+SCHEDULE_FAST_PARSER = env.bool("SCHEDULE_FAST_PARSER", default=True)
+
+# Разворачивать повторяющиеся занятия (RRULE/RDATE/EXDATE) в отдельные занятия
+SCHEDULE_EXPAND_RECURRENCE = env.bool("SCHEDULE_EXPAND_RECURRENCE", default=False)
+
+# Окно анализа: ближайшие N дней (0 — весь календарь) или явные даты YYYY-MM-DD, например семестр
+SCHEDULE_WINDOW_DAYS = env.int("SCHEDULE_WINDOW_DAYS", default=0)
+SCHEDULE_WINDOW_START = env("SCHEDULE_WINDOW_START", default="")
+SCHEDULE_WINDOW_END = env("SCHEDULE_WINDOW_END", default="")
+
+# Кэш ответов /api/issueslist в Redis (сбрасывается сменой поколения после каждого обновления)
+SCHEDULE_RESPONSE_CACHE = env.bool("SCHEDULE_RESPONSE_CACHE", default=True)
+SCHEDULE_RESPONSE_CACHE_TTL = env.int("SCHEDULE_RESPONSE_CACHE_TTL", default=3600)
+# Сколько самых частых запросов прогревать после обновления (0 — без прогрева)
+SCHEDULE_PREWARM_FILTERS = env.int("SCHEDULE_PREWARM_FILTERS", default=20)
+
+# Максимальное время удержания блокировки глобального обновления, с
+SCHEDULE_REFRESH_LOCK_TTL = env.int("SCHEDULE_REFRESH_LOCK_TTL", default=3600)
+# Через сколько секунд глобальное обновление повторно проверяет, закончились ли точечные
+SCHEDULE_SCOPED_WAIT = env.float("SCHEDULE_SCOPED_WAIT", default=2)
+
+# Плановое обновление (celery beat): целевой возраст данных и период проверки, с
+SCHEDULE_FRESHNESS_TARGET = env.int("SCHEDULE_FRESHNESS_TARGET", default=6 * 3600)
+SCHEDULE_REFRESH_CHECK_INTERVAL = env.int("SCHEDULE_REFRESH_CHECK_INTERVAL", default=900)
+# Сколько самых часто меняющихся и популярных календарей обновлять между полными обновлениями (0 — не обновлять)
+SCHEDULE_HOT_CALENDARS = env.int("SCHEDULE_HOT_CALENDARS", default=50)
+
+# Правила анализа (имена из реестра, например long_window,room_conflict; пусто — все) и их пороги, мин
+SCHEDULE_RULES = env.list("SCHEDULE_RULES", default=[])
+SCHEDULE_LONG_WINDOW_MINUTES = env.int("SCHEDULE_LONG_WINDOW_MINUTES", default=120)
+SCHEDULE_MIN_TRAVEL_MINUTES = env.int("SCHEDULE_MIN_TRAVEL_MINUTES", default=10)
+
+# Точечное обновление по фильтру group/teacher: только календари группы или преподавателя
+SCHEDULE_TARGETED_REFRESH = env.bool("SCHEDULE_TARGETED_REFRESH", default=True)
+# Срок хранения каталога расписаний в Redis, с (перезаписывается при каждом полном обновлении)
+SCHEDULE_CATALOG_TTL = env.int("SCHEDULE_CATALOG_TTL", default=24 * 3600)
+
+# События хода задач (/api/schedule/process/<id>/events): срок хранения истории и максимальная длительность потока, с
+SCHEDULE_TASK_EVENTS_TTL = env.int("SCHEDULE_TASK_EVENTS_TTL", default=3600)
+SCHEDULE_TASK_EVENTS_TIMEOUT = env.int("SCHEDULE_TASK_EVENTS_TIMEOUT", default=3600)
+
+# Адрес каталога расписаний (пусто — API МИРЭА), например локальной замены из load_test_schedule
+SCHEDULE_API_URL = env("SCHEDULE_API_URL", default="")
+
+CELERY_BEAT_SCHEDULE = {
+    "refresh-schedule": {
+        "task": "issue_analizer.tasks.periodic_refresh_task",
+        "schedule": SCHEDULE_REFRESH_CHECK_INTERVAL,
+    },
+}